@@ -19,6 +19,9 @@ DATA_FILES = [
 RAW_DATA_FOLDER = os.path.join(data_folder, "client_side/raw_data/")
 CLEAN_DATA_FOLDER = os.path.join(data_folder, "client_side/clean_data_for_testing/")
 
+# seconds to wait for the ingestion system to answer a post
+REQUEST_TIMEOUT = 20
+
 
 class ClientSimulator:
     def __init__(self):
@@ -27,6 +30,10 @@ class ClientSimulator:
 
         self.scenario_type = scenario["type"]
         self.ingestion_system_url = scenario['ingestion_system_url']
+        # batch_size > 1 sends the records in batches to the /run_batch endpoint
+        self.batch_size = scenario.get("batch_size", 1)
+        self.ingestion_system_batch_url = scenario.get("ingestion_system_batch_url")
+        self.request_timeout = scenario.get("request_timeout", REQUEST_TIMEOUT)
         self.repetitions = scenario["repetitions"]
         self.required_rows = scenario["required_rows"]
         self.testing = scenario["testing"]
@@ -72,6 +79,30 @@ class ClientSimulator:
                 print("done notify")
         #  --- print("done receive_message")
 
+    def send_records(self, records):
+        if self.batch_size <= 1:
+            for record in records:
+                try:
+                    requests.post(self.ingestion_system_url, json=record, timeout=self.request_timeout)
+                except requests.exceptions.RequestException as ex:
+                    print(ex)
+            return
+
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) == self.batch_size:
+                self.send_batch(batch)
+                batch = []
+        if batch:
+            self.send_batch(batch)
+
+    def send_batch(self, batch):
+        try:
+            requests.post(self.ingestion_system_batch_url, json=batch, timeout=self.request_timeout)
+        except requests.exceptions.RequestException as ex:
+            print(ex)
+
     def send_raw_data(self):
         datasets = []
         for csv_file_path in DATA_FILES:
@@ -82,13 +113,10 @@ class ClientSimulator:
 
         max_rows = max(len(dataset) for dataset in datasets)
 
-        for i in range(max_rows):
-            for dataset in datasets:
-                if i < len(dataset):
-                    try:
-                        requests.post(self.ingestion_system_url, json=dataset[i])
-                    except requests.exceptions.RequestException as ex:
-                        print(ex)
+        self.send_records(dataset[i]
+                          for i in range(max_rows)
+                          for dataset in datasets
+                          if i < len(dataset))
 
     def test_development(self, csv_results_path):
         datasets = []
@@ -99,19 +127,20 @@ class ClientSimulator:
                 datasets.append([row for row in csv_reader])
 
         max_row = len(datasets[0])
-        for i in range(self.required_rows):
-            for dataset in datasets:
-                row = i % max_row
-                rep = '-r' + str(i // max_row)
-                json_to_send = dataset[row]
-                # print(f'{json_to_send}')
-                json_to_send['UUID'] = json_to_send['UUID'] + rep
 
-                try:
-                    requests.post(self.ingestion_system_url, json=json_to_send)
-                except requests.exceptions.RequestException as ex:
-                    print(ex)
-            print(f'test_development : {i} of {self.required_rows}')
+        def records():
+            for i in range(self.required_rows):
+                for dataset in datasets:
+                    row = i % max_row
+                    rep = '-r' + str(i // max_row)
+                    # copy: batched records are sent after the next ones are built
+                    json_to_send = dict(dataset[row])
+                    # print(f'{json_to_send}')
+                    json_to_send['UUID'] = json_to_send['UUID'] + rep
+                    yield json_to_send
+                print(f'test_development : {i} of {self.required_rows}')
+
+        self.send_records(records())
 
         # Wait before next iteration
         print("wait before next iteration")
@@ -135,16 +164,14 @@ class ClientSimulator:
         time_beginning = time.time_ns()
         time_returned = 0
         for i in range(self.required_rows):
+            session = []
             for dataset in datasets:
                 row = i % max_row
                 rep = '-r' + str(i // max_row)
-                json_to_send = dataset[row]
+                json_to_send = dict(dataset[row])
                 json_to_send['UUID'] = json_to_send['UUID'] + rep
-
-                try:
-                    requests.post(self.ingestion_system_url, json=json_to_send)
-                except requests.exceptions.RequestException as ex:
-                    print(ex)
+                session.append(json_to_send)
+            self.send_records(session)
 
             # Wait before next iteration
             with self.cv:
@@ -4,6 +4,7 @@ To be used, the API has to be added as a resource to Flask application
 """
 
 import os
+from typing import Callable
 from flask import request, abort
 from flask_restful import Resource
 
@@ -14,12 +15,15 @@ class FileReceptionAPI(Resource):
     """
     This API allows other nodes to send files to the REST server.
     """
-    def __init__(self, filename):
+    def __init__(self, filename, handler: Callable[[str], object] = None):
         """
         Initialize API
         :param filename: path where to save received file
+        :param handler: optional function to call with the path of the file, after it has been saved.
+                        If it returns something other than None, it is used as response of the request
         """
         self.filepath = os.path.join(data_folder, filename)
+        self.handle_file = handler
 
     def post(self):
         """
@@ -36,4 +40,10 @@ class FileReceptionAPI(Resource):
         file = request.files['file']
         file.save(self.filepath)
 
+        # Execute the handler function if it was specified
+        if self.handle_file is not None:
+            response = self.handle_file(self.filepath)
+            if response is not None:
+                return response
+
         return 'File received', 201
@@ -17,12 +17,13 @@ class ReceiveJsonApi(Resource):
     """
     def __init__(self,
                  json_schema_path: str = None,
-                 handler: Callable[[dict], None] = None):
+                 handler: Callable[[dict], object] = None):
         """
         Initialize the API.
         :param json_schema_path !!! <relative to the data folder>
         :param handler: optional function to call after the json has been saved in the filesystem.
-                        The handler function should not take too much time to return (consider threading)
+                        The handler function should not take too much time to return (consider threading).
+                        If it returns something other than None, it is used as response of the request
         """
         self.json_schema_path = json_schema_path
         self.handle_request = handler
@@ -44,6 +45,9 @@ class ReceiveJsonApi(Resource):
             return 'JSON validation failed', 400
         # Execute the handler function if it was specified
         if self.handle_request is not None:
-            self.handle_request(received_json)
+            # a handler can refuse the json by returning its own response (e.g. 429 when busy)
+            response = self.handle_request(received_json)
+            if response is not None:
+                return response
         #  --- print("about to return 201")
         return 'JSON correctly received', 201  # request success -> resources created.
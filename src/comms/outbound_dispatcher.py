@@ -0,0 +1,186 @@
+"""
+This module offers a dispatcher which sends json to other nodes in background,
+so that the caller (typically a Flask request handler) does not wait for the destination.
+"""
+import queue
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+# status codes meaning that the destination is overloaded or unavailable: the post is retried
+RETRY_STATUS_CODES = (429, 503)
+
+# seconds a Retry-After can make a worker wait at least, see OutboundDispatcher.max_retry_after
+MAX_RETRY_AFTER = 60.0
+
+
+class _Destination:
+    """
+    Bounded queue of the json waiting to be sent to one url, and the workers that send them.
+    """
+    def __init__(self, url: str, batch_size: int, queue_size: int):
+        self.url = url
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = []
+
+
+class OutboundDispatcher:
+    """
+    Sends json to other nodes from background worker threads.
+    Each destination url has its own bounded queue, so a slow node only delays its own messages.
+    Every worker keeps a requests.Session (keep-alive connection pooling), retries failed posts
+    with exponential backoff (or after the Retry-After of a 429/503 response, capped) and, if the destination accepts them, sends the json in batches (lists).
+    """
+
+    def __init__(self, queue_size: int = 1000, workers: int = 1, timeout: float = 5.0,
+                 retries: int = 3, backoff: float = 0.5):
+        """
+        Initialize the dispatcher.
+        :param queue_size: maximum number of json waiting for each destination
+        :param workers: number of worker threads for each destination (1 preserves the sending order)
+        :param timeout: timeout in seconds of each post
+        :param retries: number of retries of a failed post before dropping it
+        :param backoff: seconds to wait before the first retry, doubled at each retry
+        """
+        self.queue_size = queue_size
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # a Retry-After longer than this (e.g. a day) would stall every message to the destination
+        self.max_retry_after = max(backoff * 2 ** retries, MAX_RETRY_AFTER)
+        self.stats = {"sent": 0, "failed": 0, "dropped": 0}
+        self._destinations = {}
+        self._lock = threading.Lock()
+
+    def add_destination(self, url: str, batch_size: int = 1) -> None:
+        """
+        Register a destination. Destinations not registered are created on the first send, with batch size 1.
+        :param url: url to post to
+        :param batch_size: maximum number of json sent in a single post; with batch_size > 1
+                           the body of the post is always a list
+        """
+        with self._lock:
+            self.__destination(url, batch_size)
+
+    def __destination(self, url: str, batch_size: int = 1) -> _Destination:
+        destination = self._destinations.get(url)
+        if destination is None:
+            destination = _Destination(url, batch_size, self.queue_size)
+            for _ in range(self.workers):
+                worker = threading.Thread(target=self.__worker, args=(destination,), daemon=True)
+                worker.start()
+                destination.workers.append(worker)
+            self._destinations[url] = destination
+        return destination
+
+    def send(self, url: str, json_data, timeout: float = None) -> bool:
+        """
+        Queue a json to be sent to url.
+        :param url: destination
+        :param json_data: json to send
+        :param timeout: seconds to wait if the queue of the destination is full (None = do not wait)
+        :return: True if the json has been queued, False if it was dropped because the queue is full
+        """
+        with self._lock:
+            destination = self.__destination(url)
+        try:
+            destination.queue.put(json_data, block=timeout is not None, timeout=timeout)
+            return True
+        except queue.Full:
+            self.__count("dropped")
+            print(f'[ERROR] queue for {url} is full, message dropped')
+            return False
+
+    def full(self) -> bool:
+        """
+        :return: True if the queue of at least one destination is full
+        """
+        with self._lock:
+            return any(destination.queue.full() for destination in self._destinations.values())
+
+    def pending(self) -> int:
+        """
+        :return: number of json queued and not yet sent
+        """
+        with self._lock:
+            return sum(destination.queue.qsize() for destination in self._destinations.values())
+
+    def flush(self) -> None:
+        """
+        Wait until every json queued so far has been sent (or dropped after the retries).
+        """
+        with self._lock:
+            destinations = list(self._destinations.values())
+        for destination in destinations:
+            destination.queue.join()
+
+    def __count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def __worker(self, destination: _Destination) -> None:
+        session = requests.Session()
+        while True:
+            batch = [destination.queue.get()]
+            while len(batch) < destination.batch_size:
+                try:
+                    batch.append(destination.queue.get_nowait())
+                except queue.Empty:
+                    break
+            body = batch if destination.batch_size > 1 else batch[0]
+            try:
+                self.__post(session, destination.url, body)
+            except Exception as ex:  # pylint: disable=W0718
+                # any failure only loses this batch, the worker keeps draining the queue
+                self.__count("failed")
+                print(f'[ERROR] sending to {destination.url} failed: {ex!r}')
+            finally:
+                for _ in batch:
+                    destination.queue.task_done()
+
+    def __post(self, session: requests.Session, url: str, body) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                response = session.post(url, json=body, timeout=self.timeout)
+                if response.status_code < 400:
+                    self.__count("sent")
+                    return
+                if response.status_code < 500 and response.status_code not in RETRY_STATUS_CODES:
+                    # the destination refused the message: retrying would not help
+                    self.__count("failed")
+                    print(f'[ERROR] {url} refused the message: {response.status_code}')
+                    return
+                error = f'status code {response.status_code}'
+                retry_after = _retry_after(response)
+                if retry_after is not None:
+                    retry_after = min(retry_after, self.max_retry_after)
+            except requests.exceptions.RequestException as ex:
+                error = ex
+                retry_after = None
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt if retry_after is None else retry_after)
+        self.__count("failed")
+        print(f'[ERROR] sending to {url} failed after {self.retries + 1} attempts: {error}')
+
+
+def _retry_after(response: requests.Response):
+    """
+    :param response: response of a failed post
+    :return: seconds to wait before retrying, from the Retry-After header (seconds or http date),
+             None if the header is missing or invalid
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -3,28 +3,232 @@ This module offers classes to set up and deploy a sqlite3 database.
 """
 
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 """
     sqlite3 Error : sqlite_[errorcode/errorname] require sqlite3 version 3.11
     https://docs.python.org/3/library/sqlite3.html#sqlite3.Error.sqlite_errorcode
 """
 
+# seconds a connection waits for a lock held by another connection
+CONNECTION_TIMEOUT = 15
+
+# max number of connections kept open by a pooled DatabaseController
+DEFAULT_POOL_SIZE = 8
+
+# pragmas applied to every new pooled connection,
+# see : https://www.sqlite.org/pragma.html
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",      # readers do not block the writer
+    "synchronous": "NORMAL",    # fsync only at checkpoints, safe in WAL mode
+    "cache_size": -16000,       # negative value is in KiB -> 16 MiB of page cache
+    "mmap_size": 268435456,     # 256 MiB of memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+
 
 class DatabaseController:
     """
     Class that covers all low-level accesses to the database.
     This class does not implement any sanity check on queries.
+
+    By default connections are pooled: they are opened once, tuned with DEFAULT_PRAGMAS
+    and handed out to one thread at a time, instead of opening a new connection per call.
+    Use close() (or the controller as a context manager) to release them.
     """
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str,
+                 pooled: bool = True,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 pragmas: dict = None):
         """
         :param db_path: path where the sqlite3 will be created,
             Use value ":memory:" to create an SQLite database existing only in memory .
             Give a <pathLike> object, i.e. str or bytes. test
             Can use os.fspath(path) when passing this parameter.
+        :param pooled: if False, a new connection is opened (and closed) for every call.
+        :param pool_size: max number of connections kept open in pooled mode.
+            An in-memory database always uses a single connection.
+        :param pragmas: pragmas applied to new pooled connections, default DEFAULT_PRAGMAS.
         """
         self.__database_path = db_path
+        self.__pooled = pooled
+        self.__in_memory = os.fsdecode(db_path) == ":memory:"
+        self.__pool_size = 1 if self.__in_memory else max(1, pool_size)
+        self.__pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        if self.__in_memory:
+            # WAL is not available for in-memory databases
+            self.__pragmas.pop("journal_mode", None)
+        self.__pool_lock = threading.Lock()
+        self.__local = threading.local()  # connection pinned by transaction()
+        self.__generation = 0
+        self.__reset_pool()
+
+    def __getstate__(self):
+        """
+        Only the configuration is pickled: locks, thread-local state and open connections
+        cannot cross a process boundary (e.g. with the spawn start method).
+        An unpickled controller opens its own connections; an in-memory database starts empty.
+        """
+        return {
+            "db_path": self.__database_path,
+            "pooled": self.__pooled,
+            "pool_size": self.__pool_size,
+            "pragmas": self.__pragmas,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __reset_pool(self):
+        """
+        Forget every pooled connection, e.g. after a fork (sqlite3 connections
+        must not be shared between processes) or after close().
+        """
+        self.__idle = queue.LifoQueue()
+        self.__opened = 0
+        self.__known_tables = set()
+        self.__generation += 1
+        self.__pid = os.getpid()
+
+    def __new_connection(self) -> sqlite3.Connection:
+        """
+        Open a new connection to the database, applying the configured pragmas in pooled mode.
+        """
+        if not self.__pooled:
+            return sqlite3.connect(self.__database_path, timeout=CONNECTION_TIMEOUT)
+        db_connection = sqlite3.connect(self.__database_path,
+                                        timeout=CONNECTION_TIMEOUT,
+                                        check_same_thread=False)
+        for pragma, value in self.__pragmas.items():
+            db_connection.execute(f"PRAGMA {pragma}={value};")
+        return db_connection
+
+    @contextmanager
+    def _connection(self):
+        """
+        Borrow a connection for the duration of the with block.
+        In pooled mode the connection goes back to the pool afterwards,
+        otherwise it is closed.
+        Inside transaction() the connection of the transaction is returned.
+        """
+        pinned = getattr(self.__local, "connection", None)
+        if pinned is not None:
+            yield pinned
+            return
+
+        if not self.__pooled:
+            db_connection = self.__new_connection()
+            try:
+                yield db_connection
+            finally:
+                db_connection.close()
+            return
+
+        db_connection = None
+        while db_connection is None:
+            with self.__pool_lock:
+                if self.__pid != os.getpid():
+                    self.__reset_pool()
+                generation = self.__generation
+                idle = self.__idle
+                try:
+                    db_connection = idle.get_nowait()
+                except queue.Empty:
+                    if self.__opened < self.__pool_size:
+                        self.__opened += 1
+                        try:
+                            db_connection = self.__new_connection()
+                        except sqlite3.Error:
+                            self.__opened -= 1
+                            raise
+            if db_connection is None:
+                # pool exhausted, wait for another thread to give one back
+                # (or for close() to reset the pool)
+                try:
+                    db_connection = idle.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+        try:
+            yield db_connection
+        finally:
+            if db_connection.in_transaction:
+                db_connection.rollback()
+            with self.__pool_lock:
+                stale = generation != self.__generation
+            if stale:
+                db_connection.close()
+            else:
+                idle.put(db_connection)
+
+    def in_transaction(self) -> bool:
+        """
+        :return: True if the calling thread is inside transaction().
+        """
+        return getattr(self.__local, "connection", None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group every call made by this thread inside the with block in a single transaction,
+        committed (one fsync) when the block exits, or rolled back if it raises.
+        Nested calls join the outer transaction.
+        Inside the block a failing statement raises sqlite3.Error instead of returning False,
+        so a batch is never partially applied.
+
+        with db.transaction():
+            db.delete("DELETE FROM a WHERE UUID=?", [uuid])
+            db.delete("DELETE FROM b WHERE UUID=?", [uuid])
+
+        :return: the controller itself
+        """
+        if self.in_transaction():
+            yield self
+            return
+        with self._connection() as db_connection:
+            db_connection.execute("BEGIN")
+            self.__local.connection = db_connection
+            try:
+                yield self
+            except BaseException:
+                db_connection.rollback()
+                raise
+            else:
+                db_connection.commit()
+            finally:
+                self.__local.connection = None
+
+    def __commit(self, db_connection: sqlite3.Connection) -> None:
+        """
+        Commit, unless the connection belongs to a transaction() that will commit on exit.
+        """
+        if not self.in_transaction():
+            db_connection.commit()
+
+    def close(self) -> None:
+        """
+        Close every idle pooled connection. Connections in use by other threads
+        are closed as soon as they are given back.
+        The controller can still be used afterwards: connections are reopened on demand.
+        """
+        with self.__pool_lock:
+            idle = self.__idle
+            self.__reset_pool()
+        while True:
+            try:
+                idle.get_nowait().close()
+            except queue.Empty:
+                break
 
     def __execute_commit_query(self, query: str, params: list):
         """
@@ -33,21 +237,43 @@ class DatabaseController:
             A sequence if unnamed placeholders are used.
             See https://docs.python.org/3/library/sqlite3.html#sqlite3-placeholders .
         :return: False if any error occurs, else True.
+        :raises sqlite3.Error: inside transaction(), so that the whole transaction is rolled back.
         """
+        if params is None:
+            params = []
         try:
-            db_connection = sqlite3.connect(self.__database_path)
-            cursor = db_connection.cursor()
-            cursor.execute(query, params)
-            db_connection.commit()
+            with self._connection() as db_connection:
+                cursor = db_connection.cursor()
+                cursor.execute(query, params)
+                self.__commit(db_connection)
         except sqlite3.Error as er:
             print(er.sqlite_errorcode)  # Prints 275
             print(er.sqlite_errorname)  # Prints SQLITE_CONSTRAINT_CHECK
+            if self.in_transaction():
+                raise
             return False
         return True
-        # with sqlite3.connect(self.__database_path) as db_connection:
-        #     cursor = db_connection.cursor()
-        #     cursor.execute(sql=query, parameters=params)
-        #     db_connection.commit()
+
+    def __execute_many_commit_query(self, query: str, seq_of_params) -> int:
+        """
+        :param query: single SQL statement, executed once for every parameter sequence
+        :param seq_of_params: iterable of sequences of Python values to bind to placeholders.
+            See https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.executemany .
+        :return: number of affected rows, -1 if any error occurs.
+        :raises sqlite3.Error: inside transaction(), so that the whole transaction is rolled back.
+        """
+        try:
+            with self._connection() as db_connection:
+                cursor = db_connection.cursor()
+                cursor.executemany(query, seq_of_params)
+                self.__commit(db_connection)
+        except sqlite3.Error as er:
+            print(er.sqlite_errorcode)
+            print(er.sqlite_errorname)
+            if self.in_transaction():
+                raise
+            return -1
+        return cursor.rowcount
 
     def create_table(self, query: str, params: list) -> bool:
         """
@@ -58,6 +284,41 @@ class DatabaseController:
             return False
         return self.__execute_commit_query(query, params)
 
+    def create_index(self, table: str, columns, unique: bool = False, name: str = None) -> bool:
+        """
+        Creates (if not exists) an index on the given columns of table.
+        :param table: str name of the indexed table.
+        :param columns: names of the indexed columns, in order.
+        :param unique: if True a UNIQUE index is created.
+        :param name: name of the index, default idx_<table>_<columns>.
+        :return: False if any error occurs, else True.
+        """
+        columns = list(columns)
+        if name is None:
+            name = "idx_" + "_".join([table] + columns)
+        query = f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" ' \
+                f'ON "{table}" (' + ", ".join(f'"{column}"' for column in columns) + ")"
+        return self.__execute_commit_query(query, [])
+
+    def query_plan(self, query: str, params=None) -> list:
+        """
+        Reads the plan SQLite would use for query, see : https://www.sqlite.org/eqp.html .
+        :param query: str SQL statement, it is not executed.
+        :param params: Parameters to bind to the query (default is None).
+        :return: list of str, one detail line per plan step.
+        """
+        rows = self.fetch_rows("EXPLAIN QUERY PLAN " + query, params)
+        return [row[-1] for row in rows]
+
+    def full_scans(self, query: str, params=None) -> list:
+        """
+        :param query: str SQL statement, it is not executed.
+        :param params: Parameters to bind to the query (default is None).
+        :return: plan steps of query that read a whole table (or index) instead of searching it.
+        """
+        return [step for step in self.query_plan(query, params)
+                if step.startswith("SCAN") and step != "SCAN CONSTANT ROW"]
+
     def update(self, query: str, params: list) -> bool:
         """
         Executes query of table update, with given parameters if any.
@@ -76,22 +337,81 @@ class DatabaseController:
             return False
         return self.__execute_commit_query(query, params)
 
+    def execute_many(self, query: str, seq_of_params) -> bool:
+        """
+        Executes the same statement for every parameter sequence, with a single commit.
+        :return: False if any error occurs, else True.
+        """
+        return self.__execute_many_commit_query(query, seq_of_params) >= 0
+
+    def execute_many_count(self, query: str, seq_of_params) -> int:
+        """
+        Executes the same statement for every parameter sequence, with a single commit.
+        :return: number of affected rows (e.g. the rows actually inserted by an INSERT OR IGNORE),
+            -1 if any error occurs.
+        """
+        return self.__execute_many_commit_query(query, seq_of_params)
+
+    def delete_many(self, query: str, seq_of_params) -> bool:
+        """
+        Executes query of table delete once for every parameter sequence, with a single commit.
+        e.g. db.delete_many("DELETE FROM labels WHERE UUID=?", [[uuid] for uuid in uuids])
+        :return: False if any error occurs, else True.
+        """
+        if "DELETE" not in query:
+            return False
+        return self.__execute_many_commit_query(query, seq_of_params) >= 0
+
+    def insert_many(self, table: str, columns, rows) -> bool:
+        """
+        Insert rows into table with a single executemany and a single commit.
+        :param table: str name of SQL table in target db.
+        :param columns: names of the columns the values of each row refer to.
+        :param rows: iterable of sequences of values, one sequence per row.
+        :return: False if any error occurs, else True (also when rows is empty).
+        """
+        columns = list(columns)
+        query = f'INSERT INTO "{table}" (' + \
+                ", ".join(f'"{column}"' for column in columns) + \
+                ") VALUES (" + ", ".join("?" for _ in columns) + ")"
+        return self.__execute_many_commit_query(query, rows) >= 0
+
     def insert_dataframe(self, dataframe: pd.DataFrame, table: str) -> bool:
         """
-        Insert dataframe into table using pandas.DataFrame.to_sql,
+        Insert dataframe into table with insert_many.
+        If the table does not exist yet it is created by pandas.DataFrame.to_sql,
             see : https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.to_sql.html .
         :param dataframe: dataframe that is to be uploaded to a table in target db.
         :param table: str name of SQL table in target db where dataframe shall be uploaded.
-        :return: True if any row was affected, False otherwise.
+        :return: False if any error occurs, else True.
         """
+        # numpy scalars cannot be bound by sqlite3, and NaN must become NULL
+        values = dataframe.astype(object).where(dataframe.notna(), None)
+        rows = values.itertuples(index=False, name=None)
+        if self.in_transaction() or self.__table_exists(table):
+            return self.insert_many(table, dataframe.columns, rows)
         try:
-            db_connection = sqlite3.connect(self.__database_path, timeout=15)
-            res = dataframe.to_sql(table, db_connection, if_exists="append", index=False)
+            with self._connection() as db_connection:
+                dataframe.to_sql(table, db_connection, if_exists="append", index=False)
         except sqlite3.Error as er:
             print(er.sqlite_errorcode)  # Prints 275
             print(er.sqlite_errorname)  # Prints SQLITE_CONSTRAINT_CHECK
             return False
-        return bool(res)
+        return True
+
+    def __table_exists(self, table: str) -> bool:
+        """
+        :return: True if table exists in the database, tables found are remembered.
+        """
+        if table in self.__known_tables:
+            return True
+        with self._connection() as db_connection:
+            found = db_connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", [table]
+            ).fetchone() is not None
+        if found:
+            self.__known_tables.add(table)
+        return found
 
     def read_sql(self, query: str, params=None):
         """
@@ -103,9 +423,54 @@ class DatabaseController:
         """
         if params is None:
             params = []  # Default is an empty list if no parameters are provided
-        with sqlite3.connect(self.__database_path, timeout=15) as db_connection:
+        with self._connection() as db_connection:
             return pd.read_sql(query, db_connection, params=params)
 
+    def fetch_rows(self, query: str, params=None) -> list:
+        """
+        Reads the result of query as plain tuples, without building a DataFrame.
+        :param query: str SQL query to be executed.
+        :param params: Parameters to bind to the query (default is None).
+        :return: list of row tuples.
+        """
+        if params is None:
+            params = []
+        with self._connection() as db_connection:
+            return db_connection.execute(query, params).fetchall()
+
+    def fetch_scalar(self, query: str, params=None, default=None):
+        """
+        Reads the first column of the first row of the result of query,
+            e.g. db.fetch_scalar("SELECT COUNT(*) FROM labels") .
+        :param query: str SQL query to be executed.
+        :param params: Parameters to bind to the query (default is None).
+        :param default: value returned if query returns no rows.
+        :return: single value.
+        """
+        if params is None:
+            params = []
+        with self._connection() as db_connection:
+            row = db_connection.execute(query, params).fetchone()
+        return default if row is None else row[0]
+
+    def fetch_columns(self, query: str, params=None) -> dict:
+        """
+        Reads the result of query column by column, as NumPy arrays.
+        Numeric columns containing NULL become float64 arrays with NaN,
+        other columns containing NULL keep None in an object array.
+        :param query: str SQL query to be executed.
+        :param params: Parameters to bind to the query (default is None).
+        :return: dict {column name: np.ndarray}, in the order of the query.
+        """
+        if params is None:
+            params = []
+        with self._connection() as db_connection:
+            cursor = db_connection.execute(query, params)
+            rows = cursor.fetchall()
+            names = [description[0] for description in cursor.description]
+        columns = zip(*rows) if rows else [()] * len(names)
+        return {name: _to_array(values) for name, values in zip(names, columns)}
+
     def drop_table(self, table: str) -> bool:
         """
         :param table: str name of Table to drop_if_exists from db.
@@ -116,9 +481,28 @@ class DatabaseController:
     def drop_database(self) -> None:
         """
         Drop database (knows its location since __init__).
+        Pooled connections are closed first, and WAL side files are removed too.
         :return:
         """
-        try:
-            os.remove(self.__database_path)
-        except FileNotFoundError:
+        self.close()
+        if self.__in_memory:
             return
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(os.fsdecode(self.__database_path) + suffix)
+            except FileNotFoundError:
+                continue
+
+
+def _to_array(values) -> np.ndarray:
+    """
+    Convert a column of values read from sqlite3 to a NumPy array.
+    :param values: sequence of int, float, str, bytes or None
+    :return: np.ndarray
+    """
+    array = np.array(values)
+    if array.dtype == object and \
+            all(value is None or isinstance(value, (int, float)) for value in values):
+        # NULLs among numbers -> NaN
+        return np.array(values, dtype=np.float64)
+    return array
@@ -0,0 +1,154 @@
+"""
+Unit tests for the DatabaseController class.
+"""
+# pylint: disable=E0401
+
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import unittest
+from db_sqlite3 import DatabaseController
+
+TABLE = "CREATE TABLE labels (id INTEGER PRIMARY KEY, UUID TEXT NOT NULL, LABEL TEXT)"
+
+
+class TestDatabaseController(unittest.TestCase):
+    """
+    Unit tests for the connection pool, transaction() and the bulk writes.
+    """
+
+    def setUp(self):
+        """
+        Create the labels table in a database file of a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db = DatabaseController(os.path.join(self.tmp_dir.name, "test.db"), pool_size=2)
+        self.addCleanup(self.db.close)
+        self.assertTrue(self.db.create_table(TABLE, []))
+
+    def count(self):
+        """
+        Returns the number of rows of the labels table.
+        """
+        return self.db.fetch_scalar("SELECT COUNT(*) FROM labels")
+
+    def test_pool_reuses_connections(self):
+        """
+        Test that a pooled connection is reused, tuned with the pragmas, and reopened after close().
+        """
+        with self.db._connection() as first:  # pylint: disable=W0212
+            pass
+        with self.db._connection() as second:  # pylint: disable=W0212
+            self.assertIs(first, second)
+            self.assertEqual(second.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.db.close()
+        with self.db._connection() as third:  # pylint: disable=W0212
+            self.assertIsNot(first, third)
+
+    def test_pool_size(self):
+        """
+        Test that threads share at most pool_size connections.
+        """
+        connections = set()
+        barrier = threading.Barrier(4)
+
+        def borrow():
+            barrier.wait()
+            for _ in range(20):
+                with self.db._connection() as db_connection:  # pylint: disable=W0212
+                    connections.add(id(db_connection))
+                    db_connection.execute("SELECT 1").fetchone()
+
+        threads = [threading.Thread(target=borrow) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(len(connections), 2)
+
+    def test_transaction_commit(self):
+        """
+        Test that the statements of a transaction are visible to other threads only after the commit.
+        """
+        counts = []
+        with self.db.transaction():
+            self.assertTrue(self.db.in_transaction())
+            self.db.insert_many("labels", ["UUID"], [["1"], ["2"]])
+            reader = threading.Thread(target=lambda: counts.append(self.count()))
+            reader.start()
+            reader.join()
+        self.assertFalse(self.db.in_transaction())
+        self.assertEqual(counts, [0])
+        self.assertEqual(self.count(), 2)
+
+    def test_transaction_rollback(self):
+        """
+        Test that an exception raised in the with block rolls back the whole transaction.
+        """
+        with self.assertRaises(KeyError):
+            with self.db.transaction():
+                self.db.insert_many("labels", ["UUID"], [["1"]])
+                raise KeyError("1")
+        self.assertEqual(self.count(), 0)
+
+    def test_transaction_failing_statement(self):
+        """
+        Test that a failing statement inside a transaction raises, so the statements before it are rolled back.
+        """
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.db.transaction():
+                self.assertTrue(self.db.insert_many("labels", ["UUID"], [["1"]]))
+                self.db.insert_many("labels", ["UUID"], [["2"], [None]])
+        self.assertEqual(self.count(), 0)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            with self.db.transaction():
+                self.db.insert_many("labels", ["UUID"], [["1"]])
+                self.db.delete("DELETE FROM missing WHERE UUID=?", ["1"])
+        self.assertEqual(self.count(), 0)
+
+    def test_failing_statement_outside_transaction(self):
+        """
+        Test that outside a transaction a failing statement returns False.
+        """
+        self.assertFalse(self.db.insert_many("labels", ["UUID"], [["1"], [None]]))
+        self.assertFalse(self.db.delete("DELETE FROM missing WHERE UUID=?", ["1"]))
+        self.assertFalse(self.db.execute_many("INSERT INTO missing VALUES (?)", [[1]]))
+        self.assertEqual(self.count(), 0)
+
+    def test_insert_many(self):
+        """
+        Test insert_many with some rows and with no rows.
+        """
+        self.assertTrue(self.db.insert_many("labels", ["UUID", "LABEL"], [("1", "high"), ("2", None)]))
+        self.assertEqual(self.db.fetch_rows("SELECT UUID, LABEL FROM labels ORDER BY id"),
+                         [("1", "high"), ("2", None)])
+        # Inserting nothing is not an error
+        self.assertTrue(self.db.insert_many("labels", ["UUID"], []))
+        with self.db.transaction():
+            self.assertTrue(self.db.insert_many("labels", ["UUID"], iter([])))
+        self.assertEqual(self.count(), 2)
+
+    def test_delete_many(self):
+        """
+        Test that delete_many deletes the rows of every parameter sequence.
+        """
+        self.db.insert_many("labels", ["UUID"], [["1"], ["2"], ["3"]])
+        self.assertTrue(self.db.delete_many("DELETE FROM labels WHERE UUID=?", [["1"], ["3"]]))
+        self.assertEqual(self.db.fetch_rows("SELECT UUID FROM labels"), [("2",)])
+        self.assertFalse(self.db.delete_many("SELECT 1", []))
+
+    def test_pickle(self):
+        """
+        Test that a pickled controller opens its own connections to the same database.
+        """
+        self.db.insert_many("labels", ["UUID"], [["1"]])
+        copy = pickle.loads(pickle.dumps(self.db))
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.fetch_scalar("SELECT COUNT(*) FROM labels"), 1)
+
+if __name__ == '__main__':
+    unittest.main()
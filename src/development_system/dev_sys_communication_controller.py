@@ -8,7 +8,8 @@ import requests
 
 from comms import ServerREST
 from comms.json_transfer_api import ReceiveJsonApi
-from utility.json_validation import validate_json_data_file
+from comms.file_transfer_api import FileReceptionAPI
+from utility.json_validation import validate_json_data_file, preload_schemas
 
 
 class DevSysCommunicationController:
@@ -32,14 +33,23 @@ class DevSysCommunicationController:
         self.ip_address = conf_json['ip_address']
         self.port = conf_json['port']
         self.production_system_url = conf_json['production_system_url']
+        # format of the classifier sent to Production System: sklearn model or NumPy arrays
+        self.model_format = conf_json.get('model_format', 'joblib')
 
-    def start_rest_server(self, json_schema_path: dict, handler: Callable[[dict], None]) -> None:
+    def start_rest_server(self, json_schema_path: dict, handler: Callable[[dict], None],
+                          file_path: str = None, file_handler: Callable[[str], object] = None) -> None:
         """
         Starts rest server for json file reception
+        and, if file_handler is given, for the reception of learning sets as .npz file at /learning_sets
         :param json_schema_path: schema for json validation
         :param handler: handler function
+        :param file_path: path where the received file is saved
+        :param file_handler: handler function of the received file, called with its path
         :return:
         """
+        # compile the schema before receiving, validation must not read it from disk
+        if json_schema_path is not None:
+            preload_schemas(json_schema_path)
         server = ServerREST()
         server.api.add_resource(
             ReceiveJsonApi,
@@ -48,6 +58,14 @@ class DevSysCommunicationController:
                 'json_schema_path': json_schema_path,
                 'handler': handler
             })
+        if file_handler is not None:
+            server.api.add_resource(
+                FileReceptionAPI,
+                "/learning_sets",
+                resource_class_kwargs={
+                    'filename': file_path,
+                    'handler': file_handler
+                })
         server.run(host=self.ip_address, port=self.port, debug=False)
 
     def send_model_to_production(self, model_file_path: str):
@@ -7,7 +7,6 @@ import time
 import json
 import sys
 import threading
-import pandas as pd
 import joblib
 
 from utility import data_folder
@@ -17,6 +16,9 @@ from development_system.dev_sys_communication_controller import DevSysCommunicat
 from development_system.training_orchestrator import TrainingOrchestrator
 from development_system.validation_orchestrator import ValidationOrchestrator
 from development_system.testing_orchestrator import TestingOrchestrator
+from development_system.model_export import export_mlp
+from development_system.learning_sets_loader import is_learning_sets_npz, \
+    load_learning_sets_npz, load_learning_sets_json
 
 # Json Schemas
 COMM_CONFIG_SCHEMA_PATH = "development_system/json_schemas/comm_config_schema.json"
@@ -39,6 +41,9 @@ STATUS_FILE_PATH = os.path.join(data_folder, "development_system/internal/status
 # Learning sets file
 RECEIVED_DATA_PATH = os.path.join(data_folder, "development_system/internal/received_data.json")
 LEARNING_SETS_PATH = os.path.join(data_folder, "development_system/internal/learning_sets.json")
+# Learning sets received as NumPy arrays
+RECEIVED_NPZ_PATH = os.path.join(data_folder, "development_system/internal/received_data.npz")
+LEARNING_SETS_NPZ_PATH = os.path.join(data_folder, "development_system/internal/learning_sets.npz")
 
 # Classifier models folder
 CLASSIFIER_FOLDER = os.path.join(data_folder, "development_system/classifiers/")
@@ -107,6 +112,51 @@ class DevelopmentSystemOrchestrator:
             self.status.update_status({"phase": "Ready"})
             self.cv.notify()
 
+    def handle_file(self, received_path: str):
+        """
+        Handler for receiving learning sets as NumPy arrays (.npz file)
+        :param received_path: path of the received file
+        :return: response 400 if the file does not contain the learning sets, None otherwise
+        """
+        if not is_learning_sets_npz(received_path):
+            os.remove(received_path)
+            return 'Learning sets file is not valid', 400
+        with self.cv:
+            print("Received learning set (NumPy arrays)")
+
+            if TESTING:
+                self.start_time = time.time_ns()
+
+            # Notify main thread
+            self.status.update_status({"phase": "Ready"})
+            self.cv.notify()
+        return None
+
+    @staticmethod
+    def save_learning_sets():
+        """
+        Keeps the last received learning sets, in the format they were received,
+        removing the learning sets saved in the other format
+        :return:
+        """
+        for received_path, saved_path, other_path in [
+                (RECEIVED_DATA_PATH, LEARNING_SETS_PATH, LEARNING_SETS_NPZ_PATH),
+                (RECEIVED_NPZ_PATH, LEARNING_SETS_NPZ_PATH, LEARNING_SETS_PATH)]:
+            if os.path.isfile(received_path):
+                os.replace(received_path, saved_path)
+                if os.path.isfile(other_path):
+                    os.remove(other_path)
+
+    @staticmethod
+    def load_learning_sets() -> dict:
+        """
+        Loads the saved learning sets, with the features of each set as a DataFrame
+        :return: dictionary set name -> {'features': DataFrame, 'labels': labels}
+        """
+        if os.path.isfile(LEARNING_SETS_NPZ_PATH):
+            return load_learning_sets_npz(LEARNING_SETS_NPZ_PATH)
+        return load_learning_sets_json(LEARNING_SETS_PATH)
+
     @staticmethod
     def retrieve_classifier_data(model_index: int) -> dict:
         """
@@ -214,6 +264,11 @@ class DevelopmentSystemOrchestrator:
                 best_classifier_data = self.status.get_best_classifier_data()
                 cl_id = best_classifier_data['index']
                 model_path = os.path.join(CLASSIFIER_FOLDER, f'model_{cl_id}.sav')
+                if self.communication_controller.model_format == 'npz':
+                    # Production System runs the forward pass with NumPy only
+                    npz_path = os.path.join(CLASSIFIER_FOLDER, f'model_{cl_id}.npz')
+                    export_mlp(joblib.load(model_path), npz_path)
+                    model_path = npz_path
                 self.communication_controller.send_model_to_production(model_path)
                 print("Development completed")
 
@@ -247,7 +302,7 @@ class DevelopmentSystemOrchestrator:
             to = TrainingOrchestrator()
             to.set_parameters(self.status.get_training_params())
             to.generate_learning_curve(
-                pd.DataFrame.from_dict(self.learning_sets['training_set']['features']),
+                self.learning_sets['training_set']['features'],
                 self.learning_sets['training_set']['labels'],
                 LEARNING_CURVE_PATH
             )
@@ -289,9 +344,9 @@ class DevelopmentSystemOrchestrator:
         )
         # Grid search
         validation_orchestrator.grid_search(
-            pd.DataFrame.from_dict(self.learning_sets['training_set']['features']),
+            self.learning_sets['training_set']['features'],
             self.learning_sets['training_set']['labels'],
-            pd.DataFrame.from_dict(self.learning_sets['validation_set']['features']),
+            self.learning_sets['validation_set']['features'],
             self.learning_sets['validation_set']['labels']
         )
 
@@ -360,7 +415,7 @@ class DevelopmentSystemOrchestrator:
         testing_orchestrator.test_classifier(
             model,
             best_classifier_data,
-            pd.DataFrame.from_dict(self.learning_sets['test_set']['features']),
+            self.learning_sets['test_set']['features'],
             self.learning_sets['test_set']['labels'],
         )
 
@@ -461,7 +516,8 @@ class DevelopmentSystemOrchestrator:
             print("Starting REST Server...")
             flask_thread = threading.Thread(
                 target=self.communication_controller.start_rest_server,
-                args=(LEARNING_SET_SCHEMA_PATH, self.handle_message)
+                args=(LEARNING_SET_SCHEMA_PATH, self.handle_message,
+                      RECEIVED_NPZ_PATH, self.handle_file)
             )
             self.status.update_status({"phase": "Waiting"})
             flask_thread.daemon = True
@@ -472,11 +528,10 @@ class DevelopmentSystemOrchestrator:
             while self.status.get_phase() == "Waiting":
                 self.cv.wait()
             # Save learning set
-            os.replace(RECEIVED_DATA_PATH, LEARNING_SETS_PATH)
+            self.save_learning_sets()
 
         # load learning_sets
-        with open(LEARNING_SETS_PATH, "r", encoding="UTF-8") as file:
-            self.learning_sets = json.load(file)
+        self.learning_sets = self.load_learning_sets()
 
         # Start main flow of execution
         self.execute_development()
@@ -0,0 +1,89 @@
+"""
+This module loads the learning sets received from the Segregation System,
+either as JSON or as NumPy arrays (.npz file)
+"""
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+
+# Learning sets, in the order they are sent
+SET_NAMES = ("training_set", "validation_set", "test_set")
+
+# Arrays of the .npz file: the names of the features and, for each set,
+# the features as a float32 matrix (a row for each session) and the labels as int8
+NPZ_KEYS = ["feature_names"] + [f'{set_name}_{part}'
+                                for set_name in SET_NAMES
+                                for part in ("features", "labels")]
+
+
+def _check_set(set_name: str, features: np.ndarray, labels: np.ndarray, num_features: int) -> None:
+    """
+    Checks that the arrays of a learning set have matching shapes and numerical values
+    :param set_name: name of the learning set
+    :param features: matrix of the features, a row for each session
+    :param labels: labels, one for each session
+    :param num_features: number of feature names
+    :return: nothing, raises ValueError if the arrays are not valid
+    """
+    if labels.ndim != 1 or features.shape != (len(labels), num_features):
+        raise ValueError(f'{set_name}: {features.shape} features for {labels.shape} labels')
+    if not (np.issubdtype(features.dtype, np.number) and np.issubdtype(labels.dtype, np.number)):
+        raise ValueError(f'{set_name}: features and labels must be numerical')
+
+
+def is_learning_sets_npz(file_path: str) -> bool:
+    """
+    Checks that a file is an .npz file with all the arrays of the learning sets,
+    with the shapes expected by load_learning_sets_npz
+    :param file_path: path to the file
+    :return: True if the file contains the learning sets
+    """
+    try:
+        with np.load(file_path, allow_pickle=False) as archive:
+            if not all(key in archive.files for key in NPZ_KEYS):
+                return False
+            feature_names = archive["feature_names"]
+            if feature_names.ndim != 1:
+                return False
+            for set_name in SET_NAMES:
+                _check_set(set_name, archive[f'{set_name}_features'],
+                           archive[f'{set_name}_labels'], len(feature_names))
+        return True
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return False
+
+
+def load_learning_sets_npz(file_path: str) -> dict:
+    """
+    Loads the learning sets from an .npz file.
+    The features of each set are wrapped in a DataFrame without copying the loaded matrix.
+    :param file_path: path to the .npz file
+    :return: dictionary set name -> {'features': DataFrame, 'labels': array}
+    """
+    learning_sets = {}
+    with np.load(file_path, allow_pickle=False) as archive:
+        columns = [str(name) for name in archive["feature_names"]]
+        for set_name in SET_NAMES:
+            features = archive[f'{set_name}_features']
+            labels = archive[f'{set_name}_labels']
+            _check_set(set_name, features, labels, len(columns))
+            learning_sets[set_name] = {
+                "features": pd.DataFrame(features, columns=columns, copy=False),
+                "labels": labels
+            }
+    return learning_sets
+
+
+def load_learning_sets_json(file_path: str) -> dict:
+    """
+    Loads the learning sets from a JSON file, building the DataFrame of the features of each set once
+    :param file_path: path to the JSON file
+    :return: dictionary set name -> {'features': DataFrame, 'labels': list}
+    """
+    with open(file_path, "r", encoding="UTF-8") as file:
+        learning_sets = json.load(file)
+    for set_name in SET_NAMES:
+        learning_sets[set_name]["features"] = \
+            pd.DataFrame.from_dict(learning_sets[set_name]["features"])
+    return learning_sets
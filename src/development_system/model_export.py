@@ -0,0 +1,34 @@
+"""
+This module exports a fitted MLP classifier to a compact NumPy archive,
+which the Production System can use without sklearn
+"""
+import numpy as np
+from sklearn.neural_network import MLPClassifier
+
+
+def export_mlp(classifier: MLPClassifier, filepath: str) -> None:
+    """
+    Saves weights, biases, activations and classes of a fitted MLP classifier in an .npz file.
+    Weights and biases of all the layers are stored in a single flat array (for each layer the
+    weight matrix in row-major order, then the bias vector): few uncompressed arrays keep the load fast.
+    :param classifier: fitted MLPClassifier
+    :param filepath: path of the .npz file
+    :return: None
+    """
+    layer_sizes = [classifier.coefs_[0].shape[0]] + [coef.shape[1] for coef in classifier.coefs_]
+    weights = np.concatenate([
+        array.ravel()
+        for coef, intercept in zip(classifier.coefs_, classifier.intercepts_)
+        for array in (coef, intercept)
+    ])
+    arrays = {
+        'layer_sizes': np.array(layer_sizes),
+        'weights': weights,
+        'activations': np.array([classifier.activation, classifier.out_activation_]),
+        'classes': np.asarray(classifier.classes_),
+    }
+    if hasattr(classifier, 'feature_names_in_'):
+        arrays['feature_names'] = np.asarray(classifier.feature_names_in_, dtype=str)
+    # a file object keeps np.savez from appending a second .npz extension
+    with open(filepath, 'wb') as file:
+        np.savez(file, **arrays)
@@ -0,0 +1,91 @@
+"""
+    Unit tests for the learning_sets_loader module
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from development_system.learning_sets_loader import is_learning_sets_npz, load_learning_sets_npz, \
+    SET_NAMES
+
+FEATURE_NAMES = ["mean_abs_diff_ts", "median_long", "median_targetIP"]
+
+
+def learning_sets_arrays(num_sessions=(4, 2, 3)):
+    """
+    Arrays of a valid .npz file of learning sets
+    """
+    arrays = {"feature_names": np.array(FEATURE_NAMES, dtype=str)}
+    for set_name, sessions in zip(SET_NAMES, num_sessions):
+        arrays[f'{set_name}_features'] = \
+            np.arange(sessions * len(FEATURE_NAMES), dtype=np.float32).reshape(sessions, len(FEATURE_NAMES))
+        arrays[f'{set_name}_labels'] = np.arange(sessions, dtype=np.int8) % 3
+    return arrays
+
+
+class TestLearningSetsNpz(unittest.TestCase):
+    """
+        Unit tests for the validation and the loading of the learning sets as NumPy arrays
+    """
+
+    def setUp(self):
+        """
+            Use a temporary directory for the files of every test
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "learning_sets.npz")
+
+    def save(self, **changes):
+        """
+            Saves the valid arrays, replaced or removed (None) as given
+        """
+        arrays = learning_sets_arrays()
+        arrays.update(changes)
+        with open(self.path, "wb") as file:
+            np.savez(file, **{name: array for name, array in arrays.items() if array is not None})
+        return self.path
+
+    def test_valid_file(self):
+        """
+            A valid file is accepted and loaded with the features as DataFrames
+        """
+        self.assertTrue(is_learning_sets_npz(self.save()))
+
+        learning_sets = load_learning_sets_npz(self.path)
+
+        arrays = learning_sets_arrays()
+        for set_name in SET_NAMES:
+            features = learning_sets[set_name]["features"]
+            self.assertEqual(list(features.columns), FEATURE_NAMES)
+            np.testing.assert_array_equal(features.to_numpy(), arrays[f'{set_name}_features'])
+            np.testing.assert_array_equal(learning_sets[set_name]["labels"], arrays[f'{set_name}_labels'])
+
+    def test_invalid_files(self):
+        """
+            Files which load_learning_sets_npz could not load are refused
+        """
+        invalid = {
+            "missing array": {"test_set_labels": None},
+            "fewer labels": {"training_set_labels": np.zeros(3, dtype=np.int8)},
+            "fewer features": {"validation_set_features": np.zeros((2, 2), dtype=np.float32)},
+            "labels matrix": {"test_set_labels": np.zeros((3, 1), dtype=np.int8)},
+            "features vector": {"test_set_features": np.zeros(3, dtype=np.float32)},
+            "text features": {"training_set_features": np.full((4, 3), "a")},
+            "names matrix": {"feature_names": np.array([FEATURE_NAMES], dtype=str)},
+            "pickled object": {"test_set_labels": np.array([0, 1, None], dtype=object)},
+        }
+        for case, changes in invalid.items():
+            with self.subTest(case=case):
+                self.assertFalse(is_learning_sets_npz(self.save(**changes)))
+
+        with open(self.path, "wb") as file:
+            file.write(b"not a zip file")
+        self.assertFalse(is_learning_sets_npz(self.path))
+        self.assertFalse(is_learning_sets_npz(os.path.join(self.tmp_dir.name, "missing.npz")))
+
+
+if __name__ == '__main__':
+    unittest.main()
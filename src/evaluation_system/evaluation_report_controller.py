@@ -2,10 +2,10 @@
     Module providing the Evaluation Report Controller class
 """
 import json
-from itertools import groupby
 from datetime import datetime
 from time import time_ns
 import os
+import pandas as pd
 from utility import data_folder
 
 from evaluation_system.eval_ambient_flags_loader import DEBUGGING, TIMING, PRINT_LABELS_DF
@@ -78,73 +78,38 @@ class EvaluationReportController:
         if DEBUGGING:
             print(f'DBG, report reads : {report_dict}')
 
-    def populate_conflicts_array(self, conf_array: list):
+    def generate_window_report(self,
+                               min_labels_opinionated: int,
+                               max_conflicting_labels_threshold: int,
+                               max_consecutive_conflicting_labels_threshold: int,
+                               window: dict):
         """
-        Populates a conflict array depending on opinionated labels value
-        :param conf_array:
-        :return:
-        """
-        for row in self.labels.index:
-            expert_label = self.labels["expertValue"][row]
-            classifier_label = self.labels["classifierValue"][row]
-            conf_array.append(expert_label != classifier_label)
-
-    def generate_report(self,
-                        min_labels_opinionated: int,
-                        max_conflicting_labels_threshold: int,
-                        max_consecutive_conflicting_labels_threshold: int,
-                        label_dataframe):
-        """
-        Analyzes incoming dataframe of labels, checks mis-evaluations
-        and generates report
+        Generates the report of a window of pairs from the LabelPairingIndex,
+        whose conflicts have already been counted incrementally
         :param min_labels_opinionated: batch size
         :param max_conflicting_labels_threshold: max error count
         :param max_consecutive_conflicting_labels_threshold:
             max consecutive errors count
-        :param label_dataframe: df of opinionated labels, of batch size
+        :param window: pairs, number of conflicting pairs and longest conflict streak
         :return:
         """
-        if DEBUGGING:
-            print(f'DBG, received labels df : {label_dataframe}')
-
         self.count_report += 1
-        self.labels = label_dataframe
-
-        if self.labels is not None:
-            # we can do the evaluation properly !
-            conflicts_array = []
-            self.populate_conflicts_array(conflicts_array)
-
-            self.num_compared_labels = len(conflicts_array)
-
-            if self.num_compared_labels != min_labels_opinionated:
-                print(f'Num_labels_confArray:{self.num_compared_labels}; '
-                      f'Min_labels:{min_labels_opinionated}')
-
-            self.num_conflicting_labels = sum(conflicts_array)
-
-            # find longest subsequence of conflicts
-            safe_list = ["noConflictingLabels"]
-            group_labels_df = groupby(conflicts_array, bool)
-            longest_conflict = max((list(seq) for val, seq in group_labels_df if val is True),
-                                   key=len,
-                                   default=safe_list)
-
-            if DEBUGGING:
-                print(f'longest conflict streak : {longest_conflict}')
-
-            if longest_conflict == safe_list:
-                longest_conflict = []
-
-            self.measured_max_consecutive_conflicting_labels = len(longest_conflict)
-
-            # self.num_compared_labels  # DONE here
-            # self.num_conflicting_labels  # DONE here
-            # self.measured_max_consecutive_conflicting_labels  # DONE here
-            self.threshold_conflicting_labels = \
-                max_conflicting_labels_threshold  # from config
-            self.threshold_max_consecutive_conflicting_labels = \
-                max_consecutive_conflicting_labels_threshold  # from config
-
-            # generate report as json
-            self.generate_report_json()
+        self.labels = None
+        if PRINT_LABELS_DF:
+            # one row per pair, with the values of both sources
+            self.labels = pd.DataFrame(window['pairs'],
+                                       columns=["session_id", "expertValue", "classifierValue"])
+
+        self.num_compared_labels = len(window['pairs'])
+        if self.num_compared_labels != min_labels_opinionated:
+            print(f'Num_labels_window:{self.num_compared_labels}; '
+                  f'Min_labels:{min_labels_opinionated}')
+        self.num_conflicting_labels = window['num_conflicting']
+        self.measured_max_consecutive_conflicting_labels = window['max_consecutive_conflicting']
+        self.threshold_conflicting_labels = \
+            max_conflicting_labels_threshold  # from config
+        self.threshold_max_consecutive_conflicting_labels = \
+            max_consecutive_conflicting_labels_threshold  # from config
+
+        # generate report as json
+        self.generate_report_json()
@@ -3,12 +3,13 @@
 """
 import json
 import logging
-import threading
 import os
 import utility
-from utility.json_validation import validate_json_data_file
+from utility.json_validation import validate_json_data_file, preload_schemas
 from utility.ip_validation import ipv4_tester
 from evaluation_system.label_store_controller import LabelStoreController
+from evaluation_system.label_store import AUDIT_TABLE
+from evaluation_system.label_queue import LabelQueue, LabelQueueStatsApi
 from comms import ServerREST
 from comms.json_transfer_api import ReceiveJsonApi
 
@@ -19,6 +20,11 @@ IP_PATH_REL = "evaluation_system/configs/eval_ip_config.json"
 IP_PATH_SCHEMA_REL = "evaluation_system/schemas/eval_ip_config_schema.json"
 
 LABEL_PATH_SCHEMA_REL = "evaluation_system/schemas/eval_label_input_schema.json"
+LABEL_BATCH_PATH_SCHEMA_REL = "evaluation_system/schemas/eval_label_batch_schema.json"
+
+# Default capacity of the label queue, and maximum labels stored in one transaction
+LABEL_QUEUE_SIZE = 10000
+LABEL_BATCH_SIZE = 500
 
 
 class EvaluationSystemOrchestrator:
@@ -32,6 +38,7 @@ class EvaluationSystemOrchestrator:
         self.label_store_controller = LabelStoreController()
         self.config = None
         self.ip_config = None
+        self.label_queue = None
 
     def load_config(self):
         """
@@ -75,41 +82,76 @@ class EvaluationSystemOrchestrator:
 
     def create_tables(self):
         """
-        Creates DB tables for expertLabels and classifierLabels
+        Creates the DB table of the audit log of all the received labels
+        (the labels are paired in memory, see LabelPairingIndex)
         :return:
         """
         logging.info("Create tables (if not exists) for label storage")
-        query = "CREATE TABLE if not exists expertLabelTable" \
-                "(session_id TEXT, value TEXT)"
-        self.label_store_controller.store.ls_create_table(query, [])
-        query = "CREATE TABLE if not exists classifierLabelTable" \
-                "(session_id TEXT, value TEXT)"
+        query = f"CREATE TABLE if not exists {AUDIT_TABLE}" \
+                "(id INTEGER PRIMARY KEY, session_id TEXT, source TEXT, " \
+                "value TEXT, received_at INTEGER)"
         self.label_store_controller.store.ls_create_table(query, [])
 
     def handle_message(self, incoming_label_json):
         """
-        Message handler, generates a thread to serve the incoming label
+        Message handler, queues the incoming label for the label store writer
         :param incoming_label_json:
-        :return:
+        :return: None if the label has been queued, response 429 if the queue is full
         """
         if not validate_json_data_file(incoming_label_json, LABEL_PATH_SCHEMA_REL):
             logging.error("Input label is badly formatted")
             print("label was badly formatted")
             raise ValueError("Evaluation System received badly formatted label")
-        # When the system receives a message,
-        # generate a new thread to manage label store and report generation!
-        logging.info("Received label, creating new thread")
-        thread = threading.Thread(target=self.label_store_controller.store_label,
-                                  args=(self.config["min_labels_opinionated"],
-                                        self.config["max_conflicting_labels_threshold"],
-                                        self.config["max_consecutive_conflicting_labels_threshold"],
-                                        incoming_label_json))
-        thread.start()
+        logging.info("Received label, queueing it")
+        return self.queue_labels([incoming_label_json])
+
+    def handle_batch(self, incoming_labels_json):
+        """
+        Batch message handler, queues the whole batch for the label store writer.
+        The batch is already validated against its schema by the API.
+        :param incoming_labels_json: list of labels
+        :return: None if the labels have been queued, response 429 if the queue is full
+        """
+        logging.info("Received batch of %d labels, queueing it", len(incoming_labels_json))
+        return self.queue_labels(incoming_labels_json)
+
+    def queue_labels(self, labels):
+        """
+        Queue labels for the single writer, which stores them in batches
+        :param labels: list of labels
+        :return: None if the labels have been queued, response 429 if the queue is full
+        """
+        if self.label_queue is None:
+            self.start_label_queue()
+        if not self.label_queue.put(labels):
+            logging.warning("Label queue is full, %d labels refused", len(labels))
+            return 'Evaluation System is busy, retry later', 429
+        return None
+
+    def start_label_queue(self):
+        """
+        Starts the single writer draining the label queue
+        :return:
+        """
+        def store_labels(labels):
+            self.label_store_controller.store_labels(
+                self.config["min_labels_opinionated"],
+                self.config["max_conflicting_labels_threshold"],
+                self.config["max_consecutive_conflicting_labels_threshold"],
+                labels)
+        self.label_queue = LabelQueue(store_labels,
+                                      self.config.get("label_queue_size", LABEL_QUEUE_SIZE),
+                                      self.config.get("label_batch_size", LABEL_BATCH_SIZE))
 
     def start_server(self):
         """Start the REST server, at the given IPv4 and Port, and assigns handler"""
         trg_ip_listen_on = self.ip_config["ipv4_address"]
         trg_port_listen_on = self.ip_config["port"]
+        # Compile the label schemas once, before the first label arrives
+        preload_schemas(LABEL_PATH_SCHEMA_REL, LABEL_BATCH_PATH_SCHEMA_REL)
+        # Single writer for the label store, started before the first label arrives
+        if self.label_queue is None:
+            self.start_label_queue()
         # Instantiate server
         logging.info("Start server for receiving labels")
         server = ServerREST()
@@ -118,6 +160,20 @@ class EvaluationSystemOrchestrator:
                                 resource_class_kwargs={
                                     'handler': self.handle_message
                                 })
+        # many labels in a single POST (json array), validated with the compiled batch schema
+        server.api.add_resource(ReceiveJsonApi,
+                                "/batch",
+                                endpoint="label_batch",
+                                resource_class_kwargs={
+                                    'json_schema_path': LABEL_BATCH_PATH_SCHEMA_REL,
+                                    'handler': self.handle_batch
+                                })
+        # depth, drain rate and counters of the label queue
+        server.api.add_resource(LabelQueueStatsApi,
+                                "/stats",
+                                resource_class_kwargs={
+                                    'label_queue': self.label_queue
+                                })
         server.run(debug=False, host=trg_ip_listen_on, port=trg_port_listen_on)
 
     def run(self):
@@ -0,0 +1,94 @@
+"""
+    LabelPairingIndex module: in-memory matching of expert and classifier labels,
+    with incremental conflict tracking
+"""
+from collections import deque
+
+# Maximum number of sessions of each source waiting for their counterpart
+MAX_PENDING = 100000
+
+
+class LabelPairingIndex:
+    """
+        Index of the labels waiting for the opinion of the other source, keyed by session_id.
+        When a label finds its counterpart the pair is added to the current window,
+        updating conflict count and consecutive conflict streak in O(1).
+        A label whose counterpart never arrives would wait forever: beyond max_pending
+        sessions per source, the oldest waiting session is evicted
+    """
+    SOURCES = ('expert', 'classifier')
+
+    def __init__(self, max_pending: int = MAX_PENDING):
+        """
+        Empty index and empty window
+        :param max_pending: maximum number of sessions of each source waiting for their counterpart
+        """
+        # source -> session_id -> values waiting for the other source (arrival order)
+        self.pending = {source: {} for source in self.SOURCES}
+        self.max_pending = max_pending
+        self.evicted = 0
+        self.pairs = []
+        self.num_conflicting = 0
+        self.current_streak = 0
+        self.max_streak = 0
+
+    def add(self, session_id: str, source: str, value: str) -> bool:
+        """
+        Add a label to the index
+        :param session_id: label uuid
+        :param source: label source (classifier / expert)
+        :param value: label value
+        :return: True if the label completed a pair (added to the window), False if it is waiting
+        """
+        other = 'classifier' if source == 'expert' else 'expert'
+        waiting = self.pending[other].get(session_id)
+        if not waiting:
+            pending = self.pending[source]
+            pending.setdefault(session_id, deque()).append(value)
+            if len(pending) > self.max_pending:
+                # dicts keep insertion order: the first key is the session waiting the longest
+                self.evicted += len(pending.pop(next(iter(pending))))
+            return False
+        other_value = waiting.popleft()
+        if not waiting:
+            del self.pending[other][session_id]
+        expert_value, classifier_value = (value, other_value) if source == 'expert' \
+            else (other_value, value)
+        self.pairs.append((session_id, expert_value, classifier_value))
+        if expert_value != classifier_value:
+            self.num_conflicting += 1
+            self.current_streak += 1
+            self.max_streak = max(self.max_streak, self.current_streak)
+        else:
+            self.current_streak = 0
+        return True
+
+    def window_size(self) -> int:
+        """
+        :return: number of pairs in the current window
+        """
+        return len(self.pairs)
+
+    def num_pending(self, source: str) -> int:
+        """
+        :param source: label source (classifier / expert)
+        :return: number of labels of the source waiting for their counterpart
+        """
+        return sum(len(values) for values in self.pending[source].values())
+
+    def pop_window(self) -> dict:
+        """
+        Close the current window and start a new one
+        :return: the pairs of the window (session_id, expertValue, classifierValue),
+                 number of conflicting pairs and longest conflict streak
+        """
+        window = {
+            'pairs': self.pairs,
+            'num_conflicting': self.num_conflicting,
+            'max_consecutive_conflicting': self.max_streak
+        }
+        self.pairs = []
+        self.num_conflicting = 0
+        self.current_streak = 0
+        self.max_streak = 0
+        return window
@@ -0,0 +1,140 @@
+"""
+    LabelQueue module: bounded queue between the REST server and the label store,
+    drained in batches by a single writer thread
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+from flask_restful import Resource
+
+
+class LabelQueue:
+    """
+        Bounded queue of incoming labels, with a single consumer thread
+        storing them in batches (one DB transaction per batch)
+    """
+    def __init__(self,
+                 store_labels: Callable[[list], None],
+                 max_size: int = 10000,
+                 max_batch: int = 500):
+        """
+        Initialize the queue and start the consumer thread
+        :param store_labels: function storing a list of labels
+        :param max_size: maximum number of labels waiting to be stored
+        :param max_batch: maximum number of labels stored in a single call of store_labels
+        """
+        self.store_labels = store_labels
+        self.max_size = max_size
+        self.max_batch = max_batch
+        self.__labels = deque()
+        self.__condition = threading.Condition()
+        self.__busy = False
+        self.__start_time = time.monotonic()
+        self.__stats = {
+            "received": 0,
+            "rejected": 0,
+            "stored": 0,
+            "failed": 0,
+            "batches": 0,
+            "drain_rate": 0.0
+        }
+        self.__consumer = threading.Thread(target=self.__drain, daemon=True)
+        self.__consumer.start()
+
+    def put(self, labels: list) -> bool:
+        """
+        Queue labels to be stored, without waiting
+        :param labels: list of labels
+        :return: True if the labels have been queued,
+                 False if the queue has no room for all of them (none is queued)
+        """
+        with self.__condition:
+            if len(self.__labels) + len(labels) > self.max_size:
+                self.__stats["rejected"] += len(labels)
+                return False
+            self.__labels.extend(labels)
+            self.__stats["received"] += len(labels)
+            self.__condition.notify()
+        return True
+
+    def depth(self) -> int:
+        """
+        :return: number of labels waiting to be stored
+        """
+        with self.__condition:
+            return len(self.__labels)
+
+    def stats(self) -> dict:
+        """
+        :return: queue depth, capacity, label counters,
+                 and drain rate (labels stored per second, moving average over the last batches)
+        """
+        with self.__condition:
+            stats = dict(self.__stats)
+            stats["depth"] = len(self.__labels)
+        stats["max_size"] = self.max_size
+        stats["max_batch"] = self.max_batch
+        stats["uptime"] = round(time.monotonic() - self.__start_time, 3)
+        stats["drain_rate"] = round(stats["drain_rate"], 3)
+        return stats
+
+    def wait_empty(self, timeout: float = None) -> bool:
+        """
+        Wait until every queued label has been stored (or has failed)
+        :param timeout: seconds to wait, None waits forever
+        :return: True if the queue is empty
+        """
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: not self.__labels and not self.__busy, timeout)
+
+    def __drain(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__labels)
+                batch = [self.__labels.popleft()
+                         for _ in range(min(self.max_batch, len(self.__labels)))]
+                self.__busy = True
+            start = time.monotonic()
+            stored = True
+            try:
+                self.store_labels(batch)
+            except Exception:
+                # any failure only loses this batch, the writer keeps draining the queue
+                stored = False
+                logging.exception("Evaluation System failed to store %d labels", len(batch))
+            elapsed = time.monotonic() - start
+            with self.__condition:
+                self.__busy = False
+                if stored:
+                    self.__stats["stored"] += len(batch)
+                    self.__stats["batches"] += 1
+                    rate = len(batch) / elapsed if elapsed > 0 else 0.0
+                    # exponential moving average, so the rate follows the recent batches
+                    self.__stats["drain_rate"] = rate if self.__stats["batches"] == 1 \
+                        else 0.8 * self.__stats["drain_rate"] + 0.2 * rate
+                else:
+                    self.__stats["failed"] += len(batch)
+                self.__condition.notify_all()
+
+
+class LabelQueueStatsApi(Resource):
+    """
+    This API exposes the statistics of a LabelQueue
+    """
+    def __init__(self, label_queue: LabelQueue):
+        """
+        Initialize the API.
+        :param label_queue: the observed queue
+        """
+        self.label_queue = label_queue
+
+    def get(self):
+        """
+        Handle a GET request.
+        :return: the statistics of the queue, status code 200
+        """
+        return self.label_queue.stats(), 200
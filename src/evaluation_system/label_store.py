@@ -2,11 +2,13 @@
     Module for interaction with labels' DataBase (creation, push/pop)
 """
 import logging
-import os
 from db_sqlite3 import DatabaseController
 
 from evaluation_system.eval_ambient_flags_loader import DELETE_DB_ON_LOAD, DB_NAME
 
+# Append-only log of every received label
+AUDIT_TABLE = "labelAuditLog"
+
 
 class LabelStore:
     """
@@ -14,11 +16,10 @@ class LabelStore:
     """
 
     def __init__(self):
+        self.db = DatabaseController(DB_NAME)
         if DELETE_DB_ON_LOAD:
-            if os.path.exists(DB_NAME):
-                os.remove(DB_NAME)
+            self.db.drop_database()
             print(f'flag is set to DELETE_DB_ON_LOAD with name : {DB_NAME}')
-        self.db = DatabaseController(DB_NAME)
 
     def ls_store_label_df(self, label, table):
         """
@@ -31,6 +32,23 @@ class LabelStore:
             logging.error("Impossible to <insert_dataframe>, in table : {%s}", table)
             raise ValueError("Evaluation System label storage failed")
 
+    def ls_audit_labels(self, labels):
+        """
+        Append labels to the audit log table (rows are never updated or deleted)
+        :param labels: list of (session_id, source, value, received_at) tuples
+        :return:
+        """
+        if not self.db.insert_many(AUDIT_TABLE, ["session_id", "source", "value", "received_at"], labels):
+            logging.error("Impossible to <insert_many>, in table : {%s}", AUDIT_TABLE)
+            raise ValueError("Evaluation System label audit failed")
+
+    def ls_transaction(self):
+        """
+        Group the following label store operations in a single DB transaction
+        :return: context manager, commits on exit, rolls back on error
+        """
+        return self.db.transaction()
+
     def ls_create_table(self, query, params=None):
         """
         :param query: query to create table
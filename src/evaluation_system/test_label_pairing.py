@@ -0,0 +1,104 @@
+"""
+    Unit tests for the LabelPairingIndex class
+"""
+import unittest
+
+from evaluation_system.label_pairing import LabelPairingIndex
+
+
+class TestLabelPairingIndex(unittest.TestCase):
+    """
+        Unit tests for the in-memory pairing of expert and classifier labels
+    """
+
+    def test_pairing(self):
+        """
+            A label waits for its counterpart, whichever source arrives first
+        """
+        index = LabelPairingIndex()
+
+        self.assertFalse(index.add("1", "expert", "high"))
+        self.assertFalse(index.add("2", "classifier", "normal"))
+        self.assertEqual(index.num_pending("expert"), 1)
+        self.assertEqual(index.num_pending("classifier"), 1)
+
+        self.assertTrue(index.add("1", "classifier", "high"))
+        self.assertTrue(index.add("2", "expert", "moderate"))
+        self.assertEqual(index.pairs, [("1", "high", "high"), ("2", "moderate", "normal")])
+        self.assertEqual(index.num_pending("expert"), 0)
+        self.assertEqual(index.num_pending("classifier"), 0)
+        self.assertEqual(index.pending, {"expert": {}, "classifier": {}})
+
+    def test_conflict_streak(self):
+        """
+            The streak counts consecutive conflicting pairs and is reset by an agreeing pair
+        """
+        index = LabelPairingIndex()
+        for session_id, expert, classifier in [("1", "high", "normal"), ("2", "high", "normal"),
+                                               ("3", "normal", "normal"), ("4", "high", "normal")]:
+            index.add(session_id, "expert", expert)
+            index.add(session_id, "classifier", classifier)
+
+        self.assertEqual(index.window_size(), 4)
+        self.assertEqual(index.num_conflicting, 3)
+        self.assertEqual(index.current_streak, 1)
+        self.assertEqual(index.max_streak, 2)
+
+    def test_duplicate_labels(self):
+        """
+            Labels of the same source for one session are paired in arrival order
+        """
+        index = LabelPairingIndex()
+        index.add("1", "expert", "high")
+        index.add("1", "expert", "normal")
+        self.assertEqual(index.num_pending("expert"), 2)
+
+        index.add("1", "classifier", "high")
+        self.assertEqual(index.num_pending("expert"), 1)
+        index.add("1", "classifier", "high")
+        index.add("1", "classifier", "moderate")
+
+        self.assertEqual(index.pairs, [("1", "high", "high"), ("1", "normal", "high")])
+        self.assertEqual(index.num_conflicting, 1)
+        self.assertEqual(index.num_pending("expert"), 0)
+        self.assertEqual(index.num_pending("classifier"), 1)
+
+    def test_pop_window(self):
+        """
+            Popping the window returns its pairs and counters and starts a new empty window,
+            the labels still waiting are kept
+        """
+        index = LabelPairingIndex()
+        index.add("1", "expert", "high")
+        index.add("1", "classifier", "normal")
+        index.add("2", "expert", "high")
+
+        window = index.pop_window()
+
+        self.assertEqual(window, {"pairs": [("1", "high", "normal")],
+                                  "num_conflicting": 1,
+                                  "max_consecutive_conflicting": 1})
+        self.assertEqual(index.window_size(), 0)
+        self.assertEqual((index.num_conflicting, index.current_streak, index.max_streak), (0, 0, 0))
+        self.assertTrue(index.add("2", "classifier", "high"))
+        self.assertEqual(index.num_conflicting, 0)
+
+    def test_eviction(self):
+        """
+            Beyond max_pending waiting sessions of a source, the oldest one is evicted
+        """
+        index = LabelPairingIndex(max_pending=2)
+        index.add("1", "classifier", "high")
+        index.add("1", "classifier", "high")
+        index.add("2", "classifier", "normal")
+        index.add("3", "classifier", "normal")
+        index.add("4", "expert", "normal")
+
+        self.assertEqual(list(index.pending["classifier"]), ["2", "3"])
+        self.assertEqual(index.evicted, 2)
+        self.assertFalse(index.add("1", "expert", "high"))
+        self.assertTrue(index.add("3", "expert", "normal"))
+
+
+if __name__ == '__main__':
+    unittest.main()
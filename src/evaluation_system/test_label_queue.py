@@ -0,0 +1,75 @@
+"""
+    Unit tests for the LabelQueue class
+"""
+import threading
+import unittest
+
+from evaluation_system.label_queue import LabelQueue
+
+
+class TestLabelQueue(unittest.TestCase):
+    """
+        Unit tests for the bounded queue drained by a single writer thread
+    """
+
+    def test_store_in_batches(self):
+        """
+            The queued labels are stored in order, in batches of at most max_batch labels
+        """
+        batches = []
+        release = threading.Event()
+
+        def store_labels(labels):
+            release.wait(10)
+            batches.append(labels)
+
+        label_queue = LabelQueue(store_labels, max_size=100, max_batch=3)
+        self.assertTrue(label_queue.put([1]))
+        self.assertTrue(label_queue.put(list(range(2, 8))))
+        release.set()
+
+        self.assertTrue(label_queue.wait_empty(10))
+        self.assertEqual([label for batch in batches for label in batch], list(range(1, 8)))
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        stats = label_queue.stats()
+        self.assertEqual((stats["received"], stats["stored"], stats["depth"]), (7, 7, 0))
+        self.assertEqual(stats["batches"], len(batches))
+
+    def test_reject_when_full(self):
+        """
+            Labels which do not fit in the queue are rejected as a whole
+        """
+        release = threading.Event()
+        label_queue = LabelQueue(lambda labels: release.wait(10), max_size=3, max_batch=1)
+        self.addCleanup(release.set)
+
+        self.assertTrue(label_queue.put([1, 2, 3]))
+        self.assertFalse(label_queue.put([4, 5, 6, 7]))
+        self.assertLessEqual(label_queue.depth(), 3)
+        self.assertEqual(label_queue.stats()["rejected"], 4)
+
+    def test_writer_survives_failure(self):
+        """
+            A failing batch is counted as failed and the writer keeps draining the queue
+        """
+        stored = []
+
+        def store_labels(labels):
+            if labels == ["bad"]:
+                raise ValueError("store failed")
+            stored.extend(labels)
+
+        label_queue = LabelQueue(store_labels, max_size=10, max_batch=1)
+        with self.assertLogs(level="ERROR"):
+            label_queue.put(["bad"])
+            self.assertTrue(label_queue.wait_empty(10))
+        label_queue.put(["good"])
+
+        self.assertTrue(label_queue.wait_empty(10))
+        self.assertEqual(stored, ["good"])
+        stats = label_queue.stats()
+        self.assertEqual((stats["failed"], stats["stored"]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,9 @@ class IngConfiguration:
         threshold (float): Soglia per la configurazione.
         evaluation_phase (str): Fase di valutazione specificata nel file di configurazione.
         development_phase (str): Fase di sviluppo specificata nel file di configurazione.
+        session_ttl (float): Secondi dopo cui una sessione incompleta viene scartata.
+        journal (bool): Abilita il journal su SQLite dei record in attesa.
+        dispatch_* : Parametri dell'invio asincrono verso gli altri sistemi.
     """
 
     def __init__(self):
@@ -35,6 +38,21 @@ class IngConfiguration:
                 self.indirizzo_prod = config["indirizzo_prod"]
                 self.testing = config["testing"]
 
+                # Secondi dopo cui una sessione incompleta viene scartata dal buffer
+                self.session_ttl = config.get("session_ttl", 600)
+                # Se True i record in attesa vengono salvati anche su SQLite per il crash recovery
+                self.journal = config.get("journal", False)
+
+                # Invio asincrono verso gli altri sistemi (vedi comms.outbound_dispatcher)
+                self.dispatch_queue_size = config.get("dispatch_queue_size", 1000)
+                self.dispatch_workers = config.get("dispatch_workers", 1)
+                self.dispatch_timeout = config.get("dispatch_timeout", 5)
+                self.dispatch_retries = config.get("dispatch_retries", 3)
+                self.dispatch_backoff = config.get("dispatch_backoff", 0.5)
+                # Prepared session inviate in un'unica POST (>1 solo se la destinazione accetta liste)
+                self.dispatch_batch_segr = config.get("dispatch_batch_segr", 1)
+                self.dispatch_batch_prod = config.get("dispatch_batch_prod", 1)
+
 
 
         except FileNotFoundError:
@@ -1,14 +1,15 @@
 import time
+import json
 from db_sqlite3 import DatabaseController
 from flask import Flask, request, jsonify
 import pandas as pd
-from prepare_system.RawSession import RawSession
+from prepare_system.RawSession import RawSession, RawSessionBatch, RAW_SESSION_COLUMNS
+from prepare_system.SessionBuffer import SessionBuffer, SessionJournal
 from prepare_system.IngestionSystemConfig import IngConfiguration
 from prepare_system.PreparedSession import PreparedSession
-import os
-from utility.json_validation import validate_json_data_file
+from utility.json_validation import validate_json_data_file, preload_schemas
+from comms.outbound_dispatcher import OutboundDispatcher
 import numpy as np
-import requests
 
 """
 prima di eseguire controllare l'indirizzo in cui si fa partire il server
@@ -19,6 +20,50 @@ controllare di aver tolto i commenti alla parte if dev_phase
 
 time1 = 0
 
+# Schema delle prepared session inviate al segregation system
+PREPARED_SESSION_SCHEMA = "segregation_system/schemas/prepared_session_schema.json"
+
+# Secondi di attesa se la coda di invio verso un sistema è piena, poi il messaggio viene scartato
+SEND_TIMEOUT = 1
+
+# Indici creati all'avvio: tabella -> colonne indicizzate.
+# Le delete del journal (sessione completata o scaduta) filtrano per UUID.
+INDICI = {
+    "labels": ["UUID"],
+    "transactionCloud": ["UUID"],
+    "localizationSys": ["UUID"],
+    "networkMonitor": ["UUID"],
+}
+
+
+def normalizza_record(record):
+    """
+    Sostituisce i valori nulli, vuoti o a 0 con None e determina la tabella a cui appartiene il record.
+    :param record: dict ricevuto dal client
+    :return: (record normalizzato, tabella), tabella vale "errore" se il record non è riconosciuto
+    """
+    # Sostituisci valori nulli o vuoti con NaN
+    for key, value in record.items():
+        if value is None or value == "" or value == 0:
+            record[key] = np.nan
+
+    # Trasforma i valori NaN in None
+    r = {key: None if pd.isnull(value) else value for key, value in record.items()}
+
+    # Determina la tabella su cui inserire il record
+    tabella = "errore"
+    if "LABEL" in record:
+        tabella = "labels"
+    elif "latitude" in record:
+        tabella = "localizationSys"
+    elif "targetIP" in record:
+        tabella = "networkMonitor"
+    elif "ts1" in record:
+        tabella = "transactionCloud"
+
+    return r, tabella
+
+
 class IngestionSystemOrchestrator():
     def __init__(self):
         """
@@ -36,11 +81,27 @@ class IngestionSystemOrchestrator():
         print(f"threshold = {self.ingestion_system_config.threshold}\t ev_phase {self.ingestion_system_config.evaluation_phase}\t "
               f"devphsase = {self.ingestion_system_config.development_phase}")
 
+        # Le POST verso gli altri sistemi partono in background: la richiesta non le attende
+        config = self.ingestion_system_config
+        self.dispatcher = OutboundDispatcher(queue_size=config.dispatch_queue_size,
+                                             workers=config.dispatch_workers,
+                                             timeout=config.dispatch_timeout,
+                                             retries=config.dispatch_retries,
+                                             backoff=config.dispatch_backoff)
+        self.dispatcher.add_destination(config.indirizzo_segr, config.dispatch_batch_segr)
+        self.dispatcher.add_destination(config.indirizzo_prod, config.dispatch_batch_prod)
+
+        # Lo schema viene compilato una sola volta, non a ogni prepared session
+        if self.ingestion_system_config.development_phase:
+            preload_schemas(PREPARED_SESSION_SCHEMA)
+
         # Configurazione del server Flask
         self.app = Flask(__name__)
 
         # Aggiunge il route per il metodo run
         self.app.add_url_rule('/run', methods=['POST'], view_func=self.run)
+        # Route per ricevere più record (array JSON o NDJSON) in una sola richiesta
+        self.app.add_url_rule('/run_batch', methods=['POST'], view_func=self.run_batch)
 
         # Inizializza il database
         if self.init_db():
@@ -48,15 +109,22 @@ class IngestionSystemOrchestrator():
         else:
             print("[ERROR] errore durante inizializzazione del database")
 
+        # Le raw session si assemblano in memoria; SQLite serve solo come journal (opzionale)
+        self.journal = SessionJournal(self.myDB) if self.ingestion_system_config.journal else None
+        self.buffer = SessionBuffer(self.ingestion_system_config.session_ttl, self.journal)
+        if self.journal is not None:
+            self.recupera_sessioni()
+
     def init_db(self):
         """
         Inizializza il database eliminando eventuali file esistenti e creando le tabelle necessarie.
+        Con il journal abilitato il database viene mantenuto, per recuperare i record in attesa.
         """
-        # Rimuove il database esistente, se presente
-        if os.path.exists("myDB.db"):
-            os.remove("myDB.db")
+        # Rimuove il database esistente, se presente (insieme ai file -wal/-shm)
+        if not self.ingestion_system_config.journal:
+            self.myDB.drop_database()
 
-        myDB = DatabaseController("myDB.db")
+        myDB = self.myDB
         # Creazione della tabella labels
         table = """CREATE TABLE IF NOT EXISTS labels 
                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -108,182 +176,280 @@ class IngestionSystemOrchestrator():
         else:
             print("errore creazione tabella")
 
+        # Creazione degli indici su UUID
+        for tabella, colonne in INDICI.items():
+            if not myDB.create_index(tabella, colonne):
+                print(f"errore creazione indice su {tabella}")
+
+        # Nessuna query del percorso caldo deve leggere un'intera tabella: il controllo viene fatto
+        # a ogni avvio, subito dopo aver creato gli indici, anche con il journal disabilitato
+        self.check_query_plans()
+
         return True
 
+    def check_query_plans(self):
+        """
+        Verifica con EXPLAIN QUERY PLAN che le query eseguite dal journal usino gli indici:
+        sono le uniche query su SQLite del percorso caldo (eseguite solo con il journal abilitato).
+        Solleva RuntimeError se una di esse farebbe una scansione completa di una tabella.
+        """
+        query_calde = [f"DELETE FROM {tabella} WHERE UUID=?" for tabella in RAW_SESSION_COLUMNS]
+
+        for query in query_calde:
+            scansioni = self.myDB.full_scans(query, [""])
+            if scansioni:
+                raise RuntimeError(f"[ERROR] la query {' '.join(query.split())} "
+                                   f"esegue una scansione completa: {scansioni}")
+
+    def recupera_sessioni(self):
+        """
+        Ricarica nel buffer i record rimasti nel journal all'ultimo arresto.
+        Le sessioni che risultano già complete vengono elaborate subito.
+        """
+        recuperati = self.journal.recover()
+        print(f"[INFO] recuperati {len(recuperati)} record dal journal")
+        for tabella, record in recuperati:
+            righe = self.buffer.add(tabella, record, journal=False)
+            if righe is not None:
+                with self.app.app_context():
+                    self.elabora_raw_session(record["UUID"], RawSession.from_records(righe))
+
     def ricezione_record(self):
         """
-        Riceve un record JSON dalla richiesta HTTP POST e lo converte in un DataFrame pandas.
+        Riceve un record JSON dalla richiesta HTTP POST e lo converte in un dict
+        con i valori mancanti a None.
         """
         # Ottieni i dati JSON dalla richiesta
         record = request.get_json()
         print(record)
 
-        # Sostituisci valori nulli o vuoti con NaN
-        for key, value in record.items():
-            if value is None or value == "" or value == 0:
-                record[key] = np.nan
-
         if not record:
             print("[ERRORE] mancata ricezione record")
             return jsonify({"error": "Nessun dato ricevuto"}), 400
 
-        # Converti il JSON in un DataFrame pandas
-        r = pd.DataFrame(record, index=[0])
-
-        # Trasforma i valori NaN in None per compatibilità con SQLite
-        r = r.applymap(lambda x: None if pd.isnull(x) else x)
+        return normalizza_record(record)
 
-        # Determina la tabella su cui inserire il record
-        tabella = "errore"
-        if "LABEL" in record:
-            tabella = "labels"
-        elif "latitude" in record:
-            tabella = "localizationSys"
-        elif "targetIP" in record:
-            tabella = "networkMonitor"
-        elif "ts1" in record:
-            tabella = "transactionCloud"
-
-        return r, tabella
+    def ricezione_batch(self):
+        """
+        Riceve più record dalla richiesta HTTP POST, come array JSON (Content-Type application/json)
+        oppure come NDJSON (un oggetto JSON per riga), e li restituisce uno alla volta.
+        Solleva ValueError se il corpo non è JSON valido o non è né un oggetto né un array.
+        """
+        if request.is_json:
+            records = request.get_json(silent=True)
+            if isinstance(records, dict):
+                records = [records]
+            if not isinstance(records, list):
+                raise ValueError("il corpo deve essere un oggetto o un array JSON")
+            yield from records
+        else:
+            # NDJSON: decodificato riga per riga dallo stream (run_batch lo decodifica comunque
+            # tutto prima di toccare il buffer, vedi sotto)
+            for riga in request.stream:
+                if riga.strip():
+                    yield json.loads(riga)
 
-    def check_raw_session(self, UUID):
+    def run(self):
         """
-        Verifica se sono presenti tutti i record necessari per creare una raw session.
+        Gestisce la ricezione e l'elaborazione di un record JSON inviato tramite POST.
+        Aggiunge il record al buffer e, se la raw session è completa, la elabora.
         """
-        query = """
-                select * from labels as lb
-                inner join localizationSys as ls on ls.UUID=lb.UUID 
-                inner join networkMonitor as nm on nm.UUID=ls.UUID
-                inner join transactionCloud as tc on tc.UUID=nm.UUID 
-                where lb.UUID =?
-                """
-
-        result = self.myDB.read_sql(query, [UUID])
-        if result.shape[0] > 0:
+        try:
+            # Se le code di invio sono piene il client deve riprovare più tardi
+            if self.dispatcher.full():
+                return jsonify({"error": "Sistema sovraccarico, riprovare"}), 503
+
+            record, tabella = self.ricezione_record()
+
+            if tabella not in RAW_SESSION_COLUMNS:
+                print("[ERROR] record non riconosciuto")
+                return jsonify({"error": "Record non riconosciuto"}), 400
+
+            # Aggiunge il record al buffer: restituisce le righe solo se la raw session è completa
+            righe = self.buffer.add(tabella, record)
+            if righe is None:
+                return jsonify({"message": "Dati ricevuti con successo"}), 200
+
             print("[INFO] inizio creazione della raw session")
-            return True
-        else:
-            return False
+            messaggio, status = self.elabora_raw_session(record["UUID"], RawSession.from_records(righe))
+            return jsonify(messaggio), status
+
+        except Exception as e:
+            print(f"Errore durante l'elaborazione: {e}")
+            return jsonify({"error": "Errore durante l'elaborazione"}), 500
 
-    def create_raw_session(self, UUID):
+    def run_batch(self):
         """
-        Crea una raw session utilizzando i dati presenti nel database.
+        Gestisce la ricezione di un lotto di record (anche di sessioni e tabelle diverse).
+        Ogni record viene aggiunto al buffer come in run; le raw session completate dal lotto
+        vengono elaborate tutte insieme alla fine, dopo aver letto l'intera richiesta,
+        in un'unica passata sugli array (RawSessionBatch).
         """
-        obj = RawSession(UUID, self.myDB)
-        return obj
+        if self.dispatcher.full():
+            return jsonify({"error": "Sistema sovraccarico, riprovare"}), 503
 
-    def remove_recordDB(self, UUID):
+        try:
+            # L'intero corpo viene decodificato prima di toccare il buffer: un lotto malformato
+            # viene rifiutato senza che nessuna sessione venga completata (e persa)
+            records = list(self.ricezione_batch())
+        except ValueError as e:
+            print(f"[ERROR] lotto non valido: {e}")
+            return jsonify({"error": "Lotto non valido"}), 400
+
+        ricevuti = len(records)
+        scartati = 0
+        complete = []
+        for record in records:
+            if not isinstance(record, dict) or not record:
+                scartati += 1
+                continue
+            try:
+                record, tabella = normalizza_record(record)
+                # senza UUID il record non appartiene a nessuna sessione
+                if tabella not in RAW_SESSION_COLUMNS or record.get("UUID") is None:
+                    scartati += 1
+                    continue
+                righe = self.buffer.add(tabella, record)
+            except Exception as e:
+                # un record non valido non fa fallire il resto del lotto
+                print(f"[ERROR] record scartato: {e}")
+                scartati += 1
+                continue
+            if righe is not None:
+                complete.append((record["UUID"], righe))
+
+        print(f"[INFO] lotto di {ricevuti} record, {scartati} scartati, {len(complete)} raw session complete")
+        # Le sessioni complete sono già state tolte dal buffer: un errore su una sessione
+        # non deve far perdere le altre, le sessioni fallite vengono contate nella risposta
+        fallite = 0
+        try:
+            batch, altre = RawSessionBatch.from_records(complete)
+        except Exception as e:
+            print(f"[ERROR] costruzione del batch fallita, sessioni elaborate una alla volta: {e}")
+            batch, altre = None, complete
+        if batch is not None and len(batch):
+            try:
+                self.elabora_batch(batch)
+            except Exception as e:
+                print(f"[ERROR] elaborazione di {len(batch)} raw session fallita: {e}")
+                fallite += len(batch)
+        for UUID, righe in altre:
+            try:
+                self.elabora_raw_session(UUID, RawSession.from_records(righe))
+            except Exception as e:
+                print(f"[ERROR] elaborazione della raw session {UUID} fallita: {e}")
+                fallite += 1
+
+        return jsonify({
+            "message": "Dati ricevuti con successo",
+            "ricevuti": ricevuti,
+            "scartati": scartati,
+            "sessioni": len(complete),
+            "fallite": fallite
+        }), 200
+
+    def elabora_raw_session(self, UUID, r):
         """
-        Rimuove i record associati a un UUID specifico da tutte le tabelle del database.
+        Valida e corregge una raw session completa, ne estrae le caratteristiche
+        e invia la prepared session al sistema successivo.
+        :return: (messaggio, status HTTP)
         """
-        query = "DELETE FROM labels WHERE UUID=?"
-        if not self.myDB.delete(query, [UUID]):
-            print("[ERRORE] impossibile eliminare il record dalla tabella labels")
+        if self.ingestion_system_config.testing:
+            global time1
+            time1 = time.time_ns()
+
+        # Valida e corregge i dati
+        result = r.mark_missing_samples()
+        if result > self.ingestion_system_config.threshold:
+            return {"message": "Dati ricevuti sono incompleti"}, 200
+
+        if self.ingestion_system_config.evaluation_phase:
+            obj = {
+                "session_id" : UUID,
+                "source" : 'expert',
+                "value" : r.Rlabels["LABEL"].values[0]
+            }
+            print(obj)
+            self.dispatcher.send(self.ingestion_system_config.indirizzo_ev, obj, timeout=SEND_TIMEOUT)
 
-        query = "DELETE FROM localizationSys WHERE UUID=?"
-        if not self.myDB.delete(query, [UUID]):
-            print("[ERRORE] impossibile eliminare il record dalla tabella localizationsSys")
+        r.correct_missing_samples()
+        r.correct_outliers()
+        if r.check_nan():
+            print("sessione scartata")
+            return {"message": "Dati ricevuti sono incompleti"}, 200
 
-        query = "DELETE FROM networkMonitor WHERE UUID=?"
-        if not self.myDB.delete(query, [UUID]):
-            print("[ERRORE] impossibile eliminare il record dalla tabella networkMonitor")
+        features = r.extract_features()
+        self.invia_prepared_session(UUID, features)
 
-        query = "DELETE FROM transactionCloud WHERE UUID=?"
-        if not self.myDB.delete(query, [UUID]):
-            print("[ERRORE] impossibile eliminare il record dalla tabella transactionCloud")
+        return {"message": "Dati ricevuti con successo"}, 200
 
-    def run(self):
+    def elabora_batch(self, batch):
         """
-        Gestisce la ricezione e l'elaborazione di un record JSON inviato tramite POST.
-        Controlla se è possibile creare una raw session e, se valida, estrae le caratteristiche.
+        Come elabora_raw_session, ma per più raw session insieme (RawSessionBatch).
         """
-        try:
-            record, tabella = self.ricezione_record()
+        if self.ingestion_system_config.testing:
+            global time1
+            time1 = time.time_ns()
 
-            record = pd.DataFrame(record, index=[0]).reset_index(drop=True)
+        # Valida e corregge i dati
+        batch = batch.subset(batch.mark_missing_samples() <= self.ingestion_system_config.threshold)
 
-            # Inserisce il record nel database
-            if self.myDB.insert_dataframe(record, tabella):
-                print("[DEBUG] record inserito nel DB")
-            else:
-                print("[ERROR] durante l'inserimento del record nel DB")
-
-            # Controlla se è possibile creare una raw session
-            if not self.check_raw_session(record["UUID"].values[0]):
-                return jsonify({"message": "Dati ricevuti con successo"}), 200
-            if self.ingestion_system_config.testing:
-                global time1
-                time1 = time.time_ns()
-
-            UUID = record["UUID"].values[0]
-            r = self.create_raw_session(UUID)
-            # Rimuove i record dal database
-            self.remove_recordDB(UUID)
-            # Valida e corregge i dati
-            result = r.mark_missing_samples()
-            if result > self.ingestion_system_config.threshold:
-                return jsonify({"message": "Dati ricevuti sono incompleti"}), 200
-
-            if self.ingestion_system_config.evaluation_phase:
+        if self.ingestion_system_config.evaluation_phase:
+            for UUID, label in zip(batch.UUID, batch.label):
                 obj = {
                     "session_id" : UUID,
                     "source" : 'expert',
-                    "value" : r.Rlabels["LABEL"].values[0]
+                    "value" : label
                 }
                 print(obj)
-                risp = requests.post(self.ingestion_system_config.indirizzo_ev, json=obj)
-                print(risp)
-
-            r.correct_missing_samples()
-            r.correct_outliers()
-            if r.check_nan():
-                print("sessione scartata")
-                return jsonify({"message": "Dati ricevuti sono incompleti"}), 200
-
-            features = r.extract_features()
-
-
-            s = PreparedSession(features, UUID)
-            my_json = {
-                "UUID": s.UUID,
-                "label": s.label,
-                "mean_abs_diff_ts": float(s.mean_abs_diff_ts),
-                "mean_abs_diff_am": float(s.mean_abs_diff_am),
-                "median_long": float(s.median_long),
-                "median_lat": float(s.median_lat),
-                "median_targetIP": s.median_targetIP,
-                "median_destIP": s.median_destIP
-            }
-            print(my_json)
-            if self.ingestion_system_config.testing:
-                time2 = time.time_ns()
-                time_diff = time2-time1
-
-                risp = requests.post(self.ingestion_system_config.indirizzo_test, json={
-                    "system":"ingestion_system",
-                    "time":time_diff,
-                    "end":False
-                })
-                print(risp)
-
-            if self.ingestion_system_config.development_phase:
+                self.dispatcher.send(self.ingestion_system_config.indirizzo_ev, obj, timeout=SEND_TIMEOUT)
 
-                schema = "segregation_system/schemas/prepared_session_schema.json"
-                print(validate_json_data_file(my_json,schema))
-                risp = requests.post(self.ingestion_system_config.indirizzo_segr, json=my_json)
-                print(risp)
-            else:
+        batch.correct_missing_samples()
+        batch.correct_outliers()
+        scartate = batch.check_nan()
+        if scartate.any():
+            print(f"{scartate.sum()} sessioni scartate")
+            batch = batch.subset(~scartate)
 
-                risp = requests.post(self.ingestion_system_config.indirizzo_prod, json=my_json)
-                print(risp)
+        for UUID, features in zip(batch.UUID, batch.extract_features()):
+            if features is not None:
+                self.invia_prepared_session(UUID, features)
 
-            print("*-------------------------------------------------------*")
+    def invia_prepared_session(self, UUID, features):
+        """
+        Crea la prepared session dalle caratteristiche estratte e la invia al sistema successivo.
+        """
+        s = PreparedSession(features, UUID)
+        my_json = {
+            "UUID": s.UUID,
+            "label": s.label,
+            "mean_abs_diff_ts": float(s.mean_abs_diff_ts),
+            "mean_abs_diff_am": float(s.mean_abs_diff_am),
+            "median_long": float(s.median_long),
+            "median_lat": float(s.median_lat),
+            "median_targetIP": s.median_targetIP,
+            "median_destIP": s.median_destIP
+        }
+        print(my_json)
+        if self.ingestion_system_config.testing:
+            time2 = time.time_ns()
+            time_diff = time2-time1
+
+            self.dispatcher.send(self.ingestion_system_config.indirizzo_test, {
+                "system":"ingestion_system",
+                "time":time_diff,
+                "end":False
+            }, timeout=SEND_TIMEOUT)
+
+        if self.ingestion_system_config.development_phase:
+
+            print(validate_json_data_file(my_json, PREPARED_SESSION_SCHEMA))
+            self.dispatcher.send(self.ingestion_system_config.indirizzo_segr, my_json, timeout=SEND_TIMEOUT)
+        else:
 
-            return jsonify({"message": "Dati ricevuti con successo"}), 200
+            self.dispatcher.send(self.ingestion_system_config.indirizzo_prod, my_json, timeout=SEND_TIMEOUT)
 
-        except Exception as e:
-            print(f"Errore durante l'elaborazione: {e}")
-            return jsonify({"error": "Errore durante l'elaborazione"}), 500
+        print("*-------------------------------------------------------*")
 
     def r(self, host="192.168.97.85", port=5001, debug=True): # todo 127.0.0.1   192.168.97.85
         """
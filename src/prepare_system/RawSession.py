@@ -1,26 +1,63 @@
 import pandas as pd
 import numpy as np
-import ipaddress
+from utility.ip_codec import ips_to_int, ints_to_ip, int_to_ip, INVALID_IP
+
+
+# Colonne lette da ciascuna tabella per costruire la raw session
+LABELS_COLUMNS = ["UUID", "LABEL"]
+NETWORK_COLUMNS = ["UUID", "targetIP", "destIP"]
+LOCALIZATION_COLUMNS = ["UUID", "latitude", "longitude"]
+TS_COLUMNS = [f"ts{i}" for i in range(1, 11)]
+AM_COLUMNS = [f"am{i}" for i in range(1, 11)]
+TRANSACTION_COLUMNS = ["UUID"] + TS_COLUMNS + AM_COLUMNS
+
+# Tabella -> colonne lette
+RAW_SESSION_COLUMNS = {
+    "labels": LABELS_COLUMNS,
+    "networkMonitor": NETWORK_COLUMNS,
+    "localizationSys": LOCALIZATION_COLUMNS,
+    "transactionCloud": TRANSACTION_COLUMNS,
+}
+
+
+def select_query(table):
+    """
+    Query con cui la raw session legge le righe di una tabella relative a un UUID.
+    """
+    return f"SELECT {', '.join(RAW_SESSION_COLUMNS[table])} FROM {table} WHERE UUID=?"
+
+
+def _read_table(myDB, table, UUID):
+    """
+    Legge le righe di una tabella relative a un UUID come tuple (senza passare da pandas.read_sql)
+    e le converte in DataFrame con la stessa semantica di read_sql.
+    """
+    rows = myDB.fetch_rows(select_query(table), [UUID])
+    return pd.DataFrame.from_records(rows, columns=RAW_SESSION_COLUMNS[table], coerce_float=True)
 
 
 class RawSession():
     def __init__(self, UUID, myDB):
         # Recupera i dati dalle diverse tabelle nel database usando l'UUID
-        query = "SELECT UUID, LABEL FROM labels WHERE UUID=?"
-        self.Rlabels = myDB.read_sql(query, [UUID])
+        self.Rlabels = _read_table(myDB, "labels", UUID)
+        self.Rnetwork = _read_table(myDB, "networkMonitor", UUID)
+        self.Rlocalization = _read_table(myDB, "localizationSys", UUID)
+        self.Rtransaction = _read_table(myDB, "transactionCloud", UUID)
 
-        query = "SELECT UUID, targetIP, destIP FROM networkMonitor WHERE UUID=?"
-        self.Rnetwork = myDB.read_sql(query, [UUID])
-
-        query = "SELECT UUID, latitude, longitude FROM localizationSys WHERE UUID=?"
-        self.Rlocalization = myDB.read_sql(query, [UUID])
-
-        query = """
-            SELECT UUID, ts1, ts2, ts3, ts4, ts5, ts6, ts7, ts8, ts9, ts10, 
-                   am1, am2, am3, am4, am5, am6, am7, am8, am9, am10 
-            FROM transactionCloud WHERE UUID=?
+    @classmethod
+    def from_records(cls, records):
         """
-        self.Rtransaction = myDB.read_sql(query, [UUID])
+        Crea la raw session da righe già in memoria (SessionBuffer), senza leggere il database.
+        :param records: dict tabella -> lista di tuple nelle colonne di RAW_SESSION_COLUMNS
+        """
+        obj = cls.__new__(cls)
+        frames = {table: pd.DataFrame.from_records(records[table], columns=columns, coerce_float=True)
+                  for table, columns in RAW_SESSION_COLUMNS.items()}
+        obj.Rlabels = frames["labels"]
+        obj.Rnetwork = frames["networkMonitor"]
+        obj.Rlocalization = frames["localizationSys"]
+        obj.Rtransaction = frames["transactionCloud"]
+        return obj
 
     def mark_missing_samples(self):
         # Stampa la percentuale di valori mancanti in tutti i record
@@ -106,13 +143,13 @@ class RawSession():
         median_longitude = self.Rlocalization['longitude'].median()
 
         # Calcola le mediane per IP di destinazione e target convertiti in numeri interi
-        self.Rnetwork['target'] = self.Rnetwork['targetIP'].apply(lambda x: int(ipaddress.ip_address(x)))
-        median_targetIP = self.Rnetwork['target'].median()
-        median_targetIP = str(ipaddress.ip_address(int(median_targetIP)))
+        self.Rnetwork['target'] = ips_to_int(self.Rnetwork['targetIP'].values)
+        self.Rnetwork['dest'] = ips_to_int(self.Rnetwork['destIP'].values)
+        if (self.Rnetwork[['target', 'dest']] == INVALID_IP).values.any():
+            raise ValueError("indirizzo IP non valido")
 
-        self.Rnetwork['dest'] = self.Rnetwork['destIP'].apply(lambda x: int(ipaddress.ip_address(x)))
-        median_destIP = self.Rnetwork['dest'].median()
-        median_destIP = str(ipaddress.ip_address(int(median_destIP)))
+        median_targetIP = int_to_ip(self.Rnetwork['target'].median())
+        median_destIP = int_to_ip(self.Rnetwork['dest'].median())
 
         # Calcola le differenze assolute medie per le serie temporali `ts` e `am`
         self.Rtransaction['mean_abs_diff_ts'] = self.Rtransaction.filter(like='ts').diff(axis=1).abs().mean(axis=1)
@@ -128,3 +165,185 @@ class RawSession():
         features = [mean_abs_diff_ts, mean_abs_diff_am, median_longitude, median_latitude, median_targetIP,
                     median_destIP, label]
         return features
+
+
+# Elementi di una raw session con un record per tabella (UUID compreso), usati per la percentuale
+# di valori mancanti
+ELEMENTI_SESSIONE = sum(len(colonne) for colonne in RAW_SESSION_COLUMNS.values())
+
+
+def _interpolate(values):
+    """
+    Interpolazione lineare riga per riga di una matrice (sessioni x campioni), con la stessa semantica
+    di DataFrame.interpolate(axis=1): i NaN iniziali restano tali, quelli interni vengono interpolati
+    e quelli finali prendono l'ultimo valore valido.
+    """
+    values = values.copy()
+    invalid = np.isnan(values)
+    if not invalid.any():
+        return values
+
+    positions = np.arange(values.shape[1])
+    valid_positions = np.where(invalid, -1, positions)
+    # Ultimo campione valido a sinistra e primo a destra di ogni posizione
+    prev = np.maximum.accumulate(valid_positions, axis=1)
+    following = np.where(invalid, values.shape[1], positions)
+    following = np.minimum.accumulate(following[:, ::-1], axis=1)[:, ::-1]
+
+    rows = np.arange(values.shape[0])[:, None]
+    fp_prev = values[rows, np.maximum(prev, 0)]
+    interni = invalid & (prev >= 0) & (following < values.shape[1])
+    finali = invalid & (prev >= 0) & (following == values.shape[1])
+
+    # Stessa formula di np.interp, usato da pandas: slope * (x - xp[j]) + fp[j]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fp_next = values[rows, np.minimum(following, values.shape[1] - 1)]
+        slope = (fp_next - fp_prev) / (following - prev)
+        interpolated = slope * (positions - prev) + fp_prev
+    values[interni] = interpolated[interni]
+    values[finali] = fp_prev[finali]
+    return values
+
+
+def _mean_abs_diff(values):
+    """
+    Media delle differenze assolute tra campioni consecutivi di ogni riga, ignorando i NaN
+    (come DataFrame.diff(axis=1).abs().mean(axis=1)).
+    """
+    diff = np.abs(np.diff(values, axis=1))
+    invalid = np.isnan(diff)
+    # pandas somma tutta la riga (con 0 al posto dei NaN, anche per la prima colonna di diff)
+    diff = np.concatenate([np.zeros((values.shape[0], 1)), np.where(invalid, 0, diff)], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return diff.sum(axis=1) / (~invalid).sum(axis=1)
+
+
+class RawSessionBatch():
+    """
+    Più raw session elaborate insieme come array colonnari NumPy, una riga per sessione.
+    Ogni metodo corrisponde a quello di RawSession, con la stessa semantica, ma in un'unica
+    passata sugli array invece che una sessione alla volta.
+    Vale solo per sessioni con un record per tabella; le altre vanno elaborate con RawSession.
+    """
+
+    def __init__(self, UUID, label, targetIP, destIP, latitude, longitude, ts, am):
+        """
+        :param UUID, label, targetIP, destIP: array di oggetti (N,), None per i valori mancanti
+        :param latitude, longitude: array float (N,), NaN per i valori mancanti
+        :param ts, am: array float (N, 10), NaN per i valori mancanti
+        """
+        self.UUID = UUID
+        self.label = label
+        self.targetIP = targetIP
+        self.destIP = destIP
+        self.latitude = latitude
+        self.longitude = longitude
+        self.ts = ts
+        self.am = am
+
+    def __len__(self):
+        return len(self.UUID)
+
+    @classmethod
+    def from_records(cls, sessions):
+        """
+        Costruisce il batch dalle sessioni complete del SessionBuffer.
+        :param sessions: lista di (UUID, dict tabella -> lista di righe)
+        :return: (batch, altre), dove altre sono le sessioni da elaborare con RawSession
+                 (più record per tabella o valori numerici non convertibili)
+        """
+        righe = []
+        altre = []
+        for UUID, records in sessions:
+            if any(len(records[table]) != 1 for table in RAW_SESSION_COLUMNS):
+                altre.append((UUID, records))
+                continue
+            numeri = records["localizationSys"][0][1:] + records["transactionCloud"][0][1:]
+            if not all(v is None or isinstance(v, float) for v in numeri):
+                altre.append((UUID, records))
+                continue
+            righe.append((UUID, records))
+
+        def column(table, index):
+            return np.array([records[table][0][index] for _, records in righe], dtype=object)
+
+        def numeric(table, start, stop):
+            values = [records[table][0][start:stop] for _, records in righe]
+            return np.array(values, dtype=float).reshape(len(righe), stop - start)
+
+        batch = cls(
+            UUID=np.array([UUID for UUID, _ in righe], dtype=object),
+            label=column("labels", 1),
+            targetIP=column("networkMonitor", 1),
+            destIP=column("networkMonitor", 2),
+            latitude=numeric("localizationSys", 1, 2)[:, 0],
+            longitude=numeric("localizationSys", 2, 3)[:, 0],
+            ts=numeric("transactionCloud", 1, 11),
+            am=numeric("transactionCloud", 11, 21),
+        )
+        return batch, altre
+
+    def subset(self, mask):
+        """
+        Restituisce un nuovo batch con le sole sessioni selezionate da mask.
+        """
+        return RawSessionBatch(self.UUID[mask], self.label[mask], self.targetIP[mask], self.destIP[mask],
+                               self.latitude[mask], self.longitude[mask], self.ts[mask], self.am[mask])
+
+    def mark_missing_samples(self):
+        """
+        :return: array (N,) con la percentuale di valori mancanti di ogni sessione
+        """
+        count_null = (pd.isna(self.label).astype(int) + pd.isna(self.targetIP) + pd.isna(self.destIP)
+                      + np.isnan(self.latitude) + np.isnan(self.longitude)
+                      + np.isnan(self.ts).sum(axis=1) + np.isnan(self.am).sum(axis=1))
+        missing_ratio = count_null / ELEMENTI_SESSIONE
+        if len(self):
+            print(f"[INFO] Percentuale media valori mancanti su {len(self)} sessioni: "
+                  f"{missing_ratio.mean() * 100:.2f}%")
+        return missing_ratio
+
+    def check_nan(self):
+        """
+        :return: array booleano (N,), True per le sessioni con ancora valori mancanti
+        """
+        return (pd.isna(self.label) | pd.isna(self.targetIP) | pd.isna(self.destIP)
+                | np.isnan(self.latitude) | np.isnan(self.longitude)
+                | np.isnan(self.ts).any(axis=1) | np.isnan(self.am).any(axis=1))
+
+    def correct_missing_samples(self):
+        # Interpolazione dei dati mancanti nelle serie temporali `ts` e `am`
+        self.ts = _interpolate(self.ts)
+        self.am = _interpolate(self.am)
+
+    def correct_outliers(self):
+        # Riporta le coordinate di localizzazione nel range accettabile (i NaN restano tali)
+        self.latitude = np.clip(self.latitude, -90, 90)
+        self.longitude = np.clip(self.longitude, -180, 180)
+
+    def extract_features(self):
+        """
+        :return: lista con le caratteristiche di ogni sessione, nello stesso formato di
+                 RawSession.extract_features, oppure None se la sessione ha un IP non valido
+        """
+        mean_abs_diff_ts = _mean_abs_diff(self.ts)
+        mean_abs_diff_am = _mean_abs_diff(self.am)
+
+        # Con un record per sessione la mediana degli IP è l'IP stesso, in forma canonica
+        target = ips_to_int(self.targetIP)
+        dest = ips_to_int(self.destIP)
+        validi = (target != INVALID_IP) & (dest != INVALID_IP)
+        median_targetIP = np.full(len(self), None, dtype=object)
+        median_destIP = np.full(len(self), None, dtype=object)
+        median_targetIP[validi] = ints_to_ip(target[validi])
+        median_destIP[validi] = ints_to_ip(dest[validi])
+
+        features = []
+        for i in range(len(self)):
+            if not validi[i]:
+                print(f"[ERROR] indirizzo IP non valido nella sessione {self.UUID[i]}")
+                features.append(None)
+                continue
+            features.append([mean_abs_diff_ts[i], mean_abs_diff_am[i], self.longitude[i], self.latitude[i],
+                             median_targetIP[i], median_destIP[i], self.label[i]])
+        return features
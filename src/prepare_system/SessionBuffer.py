@@ -0,0 +1,226 @@
+import math
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from prepare_system.RawSession import RAW_SESSION_COLUMNS
+
+# Colonne TEXT delle tabelle di ingestion, tutte le altre sono REAL
+COLONNE_TEXT = {"UUID", "LABEL", "targetIP", "destIP"}
+
+# Letterale numerico che SQLite converte in REAL in una colonna con affinità REAL
+NUMERO_RE = re.compile(r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$")
+
+
+def valore_sqlite(colonna, valore):
+    """
+    Converte un valore come farebbe SQLite inserendolo nella colonna (affinità TEXT o REAL),
+    così che una raw session assemblata in memoria sia identica a una letta dal database.
+    """
+    if valore is None or (isinstance(valore, float) and math.isnan(valore)):
+        return None
+    if colonna in COLONNE_TEXT:
+        if isinstance(valore, bool):
+            return str(int(valore))
+        if isinstance(valore, (int, float)):
+            return str(valore)
+        return valore
+    if isinstance(valore, (int, float)):
+        return float(valore)
+    if isinstance(valore, str) and NUMERO_RE.match(valore):
+        return float(valore)
+    return valore
+
+
+def riga_tabella(tabella, record):
+    """
+    Converte un record (dict) nella tupla di colonne lette dalla raw session per quella tabella.
+    Le colonne mancanti valgono None, le chiavi non previste vengono ignorate.
+    """
+    return tuple(valore_sqlite(colonna, record.get(colonna))
+                 for colonna in RAW_SESSION_COLUMNS[tabella])
+
+
+class _SessioneParziale():
+    """
+    Record ricevuti finora per un UUID, divisi per tabella.
+    """
+    def __init__(self, creazione):
+        self.creazione = creazione
+        self.righe = {tabella: [] for tabella in RAW_SESSION_COLUMNS}
+
+    def completa(self):
+        return all(self.righe.values())
+
+
+class SessionBuffer():
+    """
+    Buffer in memoria in cui si assemblano le raw session, indicizzato per UUID.
+    Tiene traccia delle sorgenti (tabelle) già arrivate per ogni sessione e la rilascia
+    appena sono presenti tutte e quattro, senza passare dal database.
+    Le sessioni che non si completano entro ttl secondi dal primo record vengono scartate.
+    Thread-safe: il server Flask gestisce ogni richiesta in un thread diverso.
+    """
+
+    def __init__(self, ttl, journal=None):
+        """
+        :param ttl: secondi dopo cui una sessione incompleta viene scartata (None = mai)
+        :param journal: SessionJournal opzionale su cui salvare i record per il crash recovery
+        """
+        self.ttl = ttl
+        self.journal = journal
+        self._sessioni = OrderedDict()  # ordinate per istante del primo record
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessioni)
+
+    def add(self, tabella, record, journal=True):
+        """
+        Aggiunge un record alla sessione del suo UUID.
+        :param tabella: tabella di provenienza del record (labels, localizationSys, ...)
+        :param record: dict con i campi del record, deve contenere UUID
+        :param journal: False per non riscrivere sul journal (record già recuperati da esso)
+        :return: dict tabella -> lista di righe se la sessione è completa (e viene rimossa
+                 dal buffer), altrimenti None
+        """
+        riga = riga_tabella(tabella, record)
+        UUID = riga[0]
+        if journal and self.journal is not None:
+            self.journal.append(tabella, riga)
+
+        adesso = time.monotonic()
+        with self._lock:
+            self._scarta_scadute(adesso)
+            sessione = self._sessioni.get(UUID)
+            if sessione is None:
+                sessione = _SessioneParziale(adesso)
+                self._sessioni[UUID] = sessione
+            sessione.righe[tabella].append(riga)
+            if not sessione.completa():
+                return None
+            del self._sessioni[UUID]
+
+        if self.journal is not None:
+            self.journal.discard(UUID)
+        return sessione.righe
+
+    def evict_expired(self):
+        """
+        Scarta le sessioni incomplete più vecchie di ttl secondi.
+        :return: lista degli UUID scartati
+        """
+        with self._lock:
+            return self._scarta_scadute(time.monotonic())
+
+    def _scarta_scadute(self, adesso):
+        """
+        Da chiamare con il lock acquisito. Costo proporzionale alle sole sessioni scadute.
+        """
+        scadute = []
+        if self.ttl is None:
+            return scadute
+        while self._sessioni:
+            UUID, sessione = next(iter(self._sessioni.items()))
+            if adesso - sessione.creazione < self.ttl:
+                break
+            del self._sessioni[UUID]
+            scadute.append(UUID)
+        if scadute:
+            print(f"[INFO] scartate {len(scadute)} sessioni incomplete scadute")
+            if self.journal is not None:
+                for UUID in scadute:
+                    self.journal.discard(UUID)
+        return scadute
+
+
+class SessionJournal():
+    """
+    Journal write-behind su SQLite dei record presenti nel SessionBuffer, usato solo per il
+    crash recovery. Le scritture vengono accodate e un thread in background le esegue a lotti,
+    ognuno in un'unica transazione, fuori dal percorso della richiesta HTTP.
+    """
+
+    def __init__(self, myDB, intervallo=0.2):
+        """
+        :param myDB: DatabaseController con le tabelle di ingestion già create
+        :param intervallo: secondi tra un lotto di scritture e il successivo
+        """
+        self.myDB = myDB
+        self.intervallo = intervallo
+        self._coda = queue.Queue()
+        self._thread = threading.Thread(target=self._scrivi, daemon=True)
+        self._thread.start()
+
+    def append(self, tabella, riga):
+        """
+        Accoda l'inserimento di una riga (tupla nelle colonne di RAW_SESSION_COLUMNS[tabella]).
+        """
+        self._coda.put(("insert", tabella, riga))
+
+    def discard(self, UUID):
+        """
+        Accoda la rimozione di tutte le righe di una sessione (completata o scaduta).
+        """
+        self._coda.put(("delete", None, UUID))
+
+    def recover(self):
+        """
+        Legge tutte le righe rimaste nel journal, nell'ordine di arrivo.
+        :return: lista di (tabella, record dict)
+        """
+        recuperati = []
+        for tabella, colonne in RAW_SESSION_COLUMNS.items():
+            righe = self.myDB.fetch_rows(f"SELECT {', '.join(colonne)} FROM {tabella} ORDER BY id")
+            recuperati.extend((tabella, dict(zip(colonne, riga))) for riga in righe)
+        return recuperati
+
+    def flush(self):
+        """
+        Attende che tutte le scritture accodate finora siano sul database.
+        """
+        fatto = threading.Event()
+        self._coda.put(("flush", None, fatto))
+        fatto.wait()
+
+    def _scrivi(self):
+        while True:
+            operazioni = [self._coda.get()]
+            time.sleep(self.intervallo)
+            while True:
+                try:
+                    operazioni.append(self._coda.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._esegui(operazioni)
+            except Exception as e:
+                print(f"[ERROR] scrittura del journal fallita: {e}")
+            for tipo, _, argomento in operazioni:
+                if tipo == "flush":
+                    argomento.set()
+
+    def _esegui(self, operazioni):
+        """
+        Esegue un lotto di operazioni in un'unica transazione, rispettandone l'ordine:
+        gli inserimenti consecutivi nella stessa tabella diventano un solo executemany.
+        """
+        inserimenti = {tabella: [] for tabella in RAW_SESSION_COLUMNS}
+        with self.myDB.transaction():
+            for tipo, tabella, argomento in operazioni:
+                if tipo == "insert":
+                    inserimenti[tabella].append(argomento)
+                elif tipo == "delete":
+                    self._inserisci(inserimenti)
+                    for t in RAW_SESSION_COLUMNS:
+                        self.myDB.delete(f"DELETE FROM {t} WHERE UUID=?", [argomento])
+            self._inserisci(inserimenti)
+
+    def _inserisci(self, inserimenti):
+        for tabella, righe in inserimenti.items():
+            if righe:
+                self.myDB.insert_many(tabella, RAW_SESSION_COLUMNS[tabella], righe)
+                righe.clear()
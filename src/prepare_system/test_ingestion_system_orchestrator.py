@@ -0,0 +1,164 @@
+"""
+    Unit test della route /run_batch di IngestionSystemOrchestrator
+"""
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+from db_sqlite3 import DatabaseController
+from prepare_system.IngestionSystemOrchestrator import IngestionSystemOrchestrator, INDICI
+
+INDIRIZZO_PROD = "http://production/upload_session"
+
+CONFIG = SimpleNamespace(
+    threshold=0.4, evaluation_phase=False, development_phase=False, testing=False,
+    indirizzo_test="http://test", indirizzo_ev="http://evaluation", indirizzo_segr="http://segregation",
+    indirizzo_prod=INDIRIZZO_PROD, session_ttl=None, journal=False,
+    dispatch_queue_size=10, dispatch_workers=1, dispatch_timeout=1, dispatch_retries=0,
+    dispatch_backoff=0, dispatch_batch_segr=1, dispatch_batch_prod=1,
+)
+
+
+def sessione(UUID, targetIP="10.0.0.1"):
+    """
+    I quattro record di una sessione completa, uno per tabella.
+    """
+    transazione = {"UUID": UUID}
+    transazione.update({f"ts{i}": float(i) for i in range(1, 11)})
+    transazione.update({f"am{i}": float(i * 3) for i in range(1, 11)})
+    return [
+        {"UUID": UUID, "LABEL": "normal"},
+        {"UUID": UUID, "targetIP": targetIP, "destIP": "10.0.0.2"},
+        {"UUID": UUID, "latitude": 45.5, "longitude": 9.2},
+        transazione,
+    ]
+
+
+class TestRunBatch(unittest.TestCase):
+    """
+        I record di un lotto passano dal buffer e le sessioni complete vengono inviate
+    """
+
+    def setUp(self):
+        """
+            Orchestratore con configurazione di test, database in memoria e dispatcher finto
+        """
+        patchers = [
+            patch("prepare_system.IngestionSystemOrchestrator.IngConfiguration", return_value=CONFIG),
+            patch("prepare_system.IngestionSystemOrchestrator.DatabaseController",
+                  side_effect=lambda _: DatabaseController(":memory:")),
+            patch("prepare_system.IngestionSystemOrchestrator.OutboundDispatcher"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.orc = IngestionSystemOrchestrator()
+        self.dispatcher = self.orc.dispatcher
+        self.dispatcher.full.return_value = False
+        self.client = self.orc.app.test_client()
+
+    def inviate(self):
+        """
+            UUID delle prepared session inviate al production system
+        """
+        return sorted(c.args[1]["UUID"] for c in self.dispatcher.send.call_args_list
+                      if c.args[0] == INDIRIZZO_PROD)
+
+    def test_array_json(self):
+        """
+            Un array JSON con una sessione completa e una incompleta
+        """
+        risposta = self.client.post("/run_batch", json=sessione("1") + sessione("2")[:2])
+
+        self.assertEqual(risposta.status_code, 200)
+        self.assertEqual(risposta.get_json()["ricevuti"], 6)
+        self.assertEqual(risposta.get_json()["sessioni"], 1)
+        self.assertEqual(self.inviate(), ["1"])
+        self.assertEqual(len(self.orc.buffer), 1)
+
+    def test_ndjson(self):
+        """
+            Lo stesso lotto come NDJSON, con righe vuote ignorate
+        """
+        corpo = "\n".join(json.dumps(r) for r in sessione("1") + sessione("2")) + "\n\n"
+
+        risposta = self.client.post("/run_batch", data=corpo, content_type="application/x-ndjson")
+
+        self.assertEqual(risposta.status_code, 200)
+        self.assertEqual(risposta.get_json()["ricevuti"], 8)
+        self.assertEqual(self.inviate(), ["1", "2"])
+
+    def test_lotto_malformato(self):
+        """
+            Un lotto malformato viene rifiutato senza completare nessuna sessione
+        """
+        corpo = "\n".join(json.dumps(r) for r in sessione("1")) + "\n{non json\n"
+
+        risposta = self.client.post("/run_batch", data=corpo, content_type="application/x-ndjson")
+        self.assertEqual(risposta.status_code, 400)
+        risposta = self.client.post("/run_batch", data="[{", content_type="application/json")
+        self.assertEqual(risposta.status_code, 400)
+        risposta = self.client.post("/run_batch", json="record")
+        self.assertEqual(risposta.status_code, 400)
+
+        self.assertEqual(len(self.orc.buffer), 0)
+        self.dispatcher.send.assert_not_called()
+
+    def test_tabelle_miste(self):
+        """
+            Record di sessioni e tabelle diverse mescolati, record non validi scartati, sessioni con
+            più record per tabella elaborate con RawSession
+        """
+        doppia = sessione("3")
+        doppia.insert(0, {"UUID": "3", "targetIP": "10.0.0.9", "destIP": "10.0.0.2"})
+        prima, seconda = sessione("1"), sessione("2")
+        lotto = [r for coppia in zip(prima, seconda) for r in coppia] + doppia
+        lotto += [{"sconosciuto": 1}, [], {}, {"LABEL": "normal"}]
+
+        risposta = self.client.post("/run_batch", json=lotto)
+
+        self.assertEqual(risposta.status_code, 200)
+        self.assertEqual(risposta.get_json(), {"message": "Dati ricevuti con successo", "ricevuti": 17,
+                                               "scartati": 4, "sessioni": 3, "fallite": 0})
+        self.assertEqual(self.inviate(), ["1", "2", "3"])
+
+    def test_sessione_fallita(self):
+        """
+            Un errore su una sessione non fa perdere le altre e viene contato nella risposta
+        """
+        doppia = sessione("3")
+        doppia.insert(0, {"UUID": "3", "targetIP": "10.0.0.9", "destIP": "10.0.0.2"})
+        lotto = sessione("1") + sessione("2") + doppia
+
+        with patch.object(self.orc, "elabora_batch", MagicMock(side_effect=RuntimeError("errore"))):
+            risposta = self.client.post("/run_batch", json=lotto)
+
+        self.assertEqual(risposta.status_code, 200)
+        self.assertEqual(risposta.get_json()["fallite"], 2)
+        self.assertEqual(self.inviate(), ["3"])
+
+    def test_piani_delle_query(self):
+        """
+            Il controllo dei piani, eseguito all'avvio anche senza journal, rileva un indice mancante
+        """
+        self.orc.check_query_plans()
+
+        with patch.dict(INDICI, {"labels": ["UUID"]}, clear=True):
+            with self.assertRaises(RuntimeError):
+                IngestionSystemOrchestrator()
+
+    def test_sovraccarico(self):
+        """
+            Con le code di invio piene il lotto non viene letto
+        """
+        self.dispatcher.full.return_value = True
+
+        risposta = self.client.post("/run_batch", json=sessione("1"))
+
+        self.assertEqual(risposta.status_code, 503)
+        self.assertEqual(len(self.orc.buffer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+    Unit test della classe RawSessionBatch
+"""
+import math
+import unittest
+
+from prepare_system.RawSession import RawSession, RawSessionBatch
+from prepare_system.SessionBuffer import riga_tabella
+
+
+def sessione(UUID, label="normal", targetIP="10.0.0.1", destIP="10.0.0.2",
+             latitude=45.0, longitude=10.0, ts=None, am=None):
+    """
+    Righe di una raw session con un record per tabella, come le restituisce il SessionBuffer.
+    """
+    ts = ts if ts is not None else [float(i * i) for i in range(1, 11)]
+    am = am if am is not None else [float(i) * 2.5 for i in range(1, 11)]
+    transazione = {"UUID": UUID}
+    transazione.update({f"ts{i}": v for i, v in enumerate(ts, 1)})
+    transazione.update({f"am{i}": v for i, v in enumerate(am, 1)})
+    return UUID, {
+        "labels": [riga_tabella("labels", {"UUID": UUID, "LABEL": label})],
+        "networkMonitor": [riga_tabella("networkMonitor",
+                                        {"UUID": UUID, "targetIP": targetIP, "destIP": destIP})],
+        "localizationSys": [riga_tabella("localizationSys",
+                                         {"UUID": UUID, "latitude": latitude, "longitude": longitude})],
+        "transactionCloud": [riga_tabella("transactionCloud", transazione)],
+    }
+
+
+def elabora_raw_session(righe):
+    """
+    Stessa sequenza di elabora_raw_session, una sessione alla volta.
+    :return: (percentuale valori mancanti, scartata, caratteristiche o None se l'IP non è valido)
+    """
+    r = RawSession.from_records(righe)
+    mancanti = r.mark_missing_samples()
+    r.correct_missing_samples()
+    r.correct_outliers()
+    if r.check_nan():
+        return mancanti, True, None
+    try:
+        return mancanti, False, r.extract_features()
+    except ValueError:
+        return mancanti, False, None
+
+
+class TestRawSessionBatch(unittest.TestCase):
+    """
+        Il batch deve dare gli stessi risultati di RawSession su ogni sessione
+    """
+
+    def assertStesseCaratteristiche(self, attese, ottenute):
+        """
+            Confronta le caratteristiche, i float a meno dell'arrotondamento
+        """
+        self.assertEqual(len(attese), len(ottenute))
+        for attesa, ottenuta in zip(attese, ottenute):
+            if isinstance(attesa, float):
+                self.assertTrue(math.isclose(attesa, ottenuta, rel_tol=1e-12), (attese, ottenute))
+            else:
+                self.assertEqual(attesa, ottenuta)
+
+    def test_equivalenza_con_raw_session(self):
+        """
+            Sessioni valide, con valori mancanti, con outlier e con IP non validi
+        """
+        ts_mancanti = [1.0, None, 3.0, 4.0, None, None, 10.0, 12.0, 13.0, None]
+        sessioni = [
+            sessione("valida"),
+            sessione("mancanti", ts=ts_mancanti, am=[None] + [float(i) for i in range(2, 11)]),
+            sessione("outlier", latitude=120.0, longitude=-200.0),
+            sessione("ip_non_valido", targetIP="300.1.1.1"),
+            sessione("ip_mancante", destIP=None),
+            sessione("senza_coordinate", latitude=None, label="high"),
+            sessione("ip_non_canonico", targetIP="010.000.000.001", label="moderate"),
+        ]
+
+        batch, altre = RawSessionBatch.from_records(sessioni)
+        self.assertEqual((len(batch), altre), (len(sessioni), []))
+
+        mancanti = batch.mark_missing_samples()
+        batch.correct_missing_samples()
+        batch.correct_outliers()
+        scartate = batch.check_nan()
+        caratteristiche = batch.subset(~scartate).extract_features()
+        caratteristiche = iter(caratteristiche)
+
+        for i, (UUID, righe) in enumerate(sessioni):
+            with self.subTest(UUID=UUID):
+                attese_mancanti, attesa_scartata, attese = elabora_raw_session(righe)
+                self.assertAlmostEqual(mancanti[i], attese_mancanti)
+                self.assertEqual(bool(scartate[i]), attesa_scartata)
+                if attesa_scartata:
+                    continue
+                ottenute = next(caratteristiche)
+                if attese is None:
+                    self.assertIsNone(ottenute)
+                else:
+                    self.assertStesseCaratteristiche(attese, ottenute)
+
+    def test_sessioni_non_vettorizzabili(self):
+        """
+            Le sessioni con più record per tabella o valori non numerici restano a RawSession
+        """
+        UUID, doppia = sessione("doppia")
+        doppia["networkMonitor"] = doppia["networkMonitor"] * 2
+        testo = sessione("testo", latitude="nord")
+
+        batch, altre = RawSessionBatch.from_records([sessione("valida"), (UUID, doppia), testo])
+
+        self.assertEqual(batch.UUID.tolist(), ["valida"])
+        self.assertEqual([UUID for UUID, _ in altre], ["doppia", "testo"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+    Unit test delle classi SessionBuffer e SessionJournal
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from db_sqlite3 import DatabaseController
+from prepare_system.RawSession import RAW_SESSION_COLUMNS
+from prepare_system.SessionBuffer import SessionBuffer, SessionJournal
+
+# Un record per ciascuna tabella della sessione "1"
+RECORD = {
+    "labels": {"UUID": "1", "LABEL": "normal"},
+    "networkMonitor": {"UUID": "1", "targetIP": "10.0.0.1", "destIP": "10.0.0.2"},
+    "localizationSys": {"UUID": "1", "latitude": 45, "longitude": "10.5"},
+    "transactionCloud": {"UUID": "1", "ts1": 1.0, "am1": 2.0},
+}
+
+
+def record(UUID, tabella):
+    """
+    Record di una tabella per la sessione UUID.
+    """
+    return dict(RECORD[tabella], UUID=UUID)
+
+
+class TestSessionBuffer(unittest.TestCase):
+    """
+        La sessione viene rilasciata quando arriva l'ultima tabella, le incomplete scadono dopo ttl
+    """
+
+    def test_sessione_completa(self):
+        """
+            Le righe vengono rilasciate solo con tutte e quattro le tabelle, con i valori convertiti
+            come li salverebbe SQLite
+        """
+        buffer = SessionBuffer(ttl=None)
+        tabelle = list(RAW_SESSION_COLUMNS)
+        for tabella in tabelle[:-1]:
+            self.assertIsNone(buffer.add(tabella, record("1", tabella)))
+        self.assertEqual(len(buffer), 1)
+
+        righe = buffer.add(tabelle[-1], record("1", tabelle[-1]))
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(righe["localizationSys"], [("1", 45.0, 10.5)])
+        self.assertEqual(righe["transactionCloud"][0][:3], ("1", 1.0, None))
+
+    @patch("prepare_system.SessionBuffer.time.monotonic")
+    def test_scadenza(self, monotonic):
+        """
+            Le sessioni incomplete più vecchie di ttl vengono scartate, le più recenti restano
+        """
+        buffer = SessionBuffer(ttl=10)
+        monotonic.return_value = 100
+        buffer.add("labels", record("vecchia", "labels"))
+        monotonic.return_value = 105
+        buffer.add("labels", record("recente", "labels"))
+
+        monotonic.return_value = 109
+        self.assertEqual(buffer.evict_expired(), [])
+        monotonic.return_value = 110
+        self.assertEqual(buffer.evict_expired(), ["vecchia"])
+        self.assertEqual(len(buffer), 1)
+
+        # una sessione scaduta ricomincia da capo: i record arrivati prima sono persi
+        monotonic.return_value = 116
+        for tabella in list(RAW_SESSION_COLUMNS)[1:]:
+            self.assertIsNone(buffer.add(tabella, record("recente", tabella)))
+        self.assertEqual(len(buffer), 1)
+
+
+class TestSessionJournal(unittest.TestCase):
+    """
+        Il journal salva i record del buffer in background e li restituisce al riavvio
+    """
+
+    def setUp(self):
+        """
+            Crea le tabelle di ingestion in un database di una cartella temporanea
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db = DatabaseController(os.path.join(self.tmp_dir.name, "journal.db"))
+        self.addCleanup(self.db.close)
+        for tabella, colonne in RAW_SESSION_COLUMNS.items():
+            self.db.create_table(f"CREATE TABLE {tabella} (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                 f"{', '.join(colonne)})", [])
+
+    def righe(self):
+        """
+            Numero di righe presenti nel journal
+        """
+        return sum(self.db.fetch_scalar(f"SELECT COUNT(*) FROM {tabella}") for tabella in RAW_SESSION_COLUMNS)
+
+    def test_write_behind(self):
+        """
+            Le scritture avvengono nel thread del journal, una sessione completata viene rimossa
+        """
+        journal = SessionJournal(self.db, intervallo=0)
+        buffer = SessionBuffer(ttl=None, journal=journal)
+        for tabella in RAW_SESSION_COLUMNS:
+            buffer.add(tabella, record("1", tabella))
+        buffer.add("labels", record("2", "labels"))
+        buffer.add("networkMonitor", record("2", "networkMonitor"))
+
+        journal.flush()
+
+        self.assertEqual(self.righe(), 2)
+        self.assertEqual([(tabella, r["UUID"]) for tabella, r in journal.recover()],
+                         [("labels", "2"), ("networkMonitor", "2")])
+
+    @patch("prepare_system.SessionBuffer.time.monotonic")
+    def test_scadenza_rimuove_dal_journal(self, monotonic):
+        """
+            Una sessione scaduta viene tolta anche dal journal
+        """
+        journal = SessionJournal(self.db, intervallo=0)
+        buffer = SessionBuffer(ttl=10, journal=journal)
+        monotonic.return_value = 0
+        buffer.add("labels", record("1", "labels"))
+        monotonic.return_value = 10
+        buffer.add("labels", record("2", "labels"))
+
+        journal.flush()
+
+        self.assertEqual([r["UUID"] for _, r in journal.recover()], ["2"])
+
+    def test_replay(self):
+        """
+            Dopo un riavvio i record recuperati ricompongono le sessioni senza essere riscritti
+        """
+        journal = SessionJournal(self.db, intervallo=0)
+        buffer = SessionBuffer(ttl=None, journal=journal)
+        tabelle = list(RAW_SESSION_COLUMNS)
+        for tabella in tabelle[:-1]:
+            buffer.add(tabella, record("1", tabella))
+        journal.flush()
+
+        # riavvio: nuovo buffer e nuovo journal sullo stesso database
+        journal = SessionJournal(self.db, intervallo=0)
+        buffer = SessionBuffer(ttl=None, journal=journal)
+        for tabella, r in journal.recover():
+            self.assertIsNone(buffer.add(tabella, r, journal=False))
+        journal.flush()
+        self.assertEqual(self.righe(), 3)
+
+        righe = buffer.add(tabelle[-1], record("1", tabelle[-1]))
+        journal.flush()
+
+        self.assertEqual(righe["labels"], [("1", "normal")])
+        self.assertEqual(self.righe(), 0)
+        self.assertEqual(journal.recover(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
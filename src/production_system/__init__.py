@@ -2,12 +2,19 @@
 """
 The __init__.py file is used to initialize the production system and start the Flask server.
 """
-# pylint: disable=E0401
-import threading
+# pylint: disable=E0401,C0413
 import os
-import time
+import sys
+import threading
+
+# Launched as a script (python src/production_system/__init__.py) only this directory is on sys.path:
+# add its parent, which holds the packages shared with the other systems (utility, comms).
+# The inference worker processes inherit the path.
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from production_system_controller import ProductionSystemController
 from json_io import FlaskServer
+import session_queue
 
 
 def start_flask_server():
@@ -32,12 +39,17 @@ def main():
     1. Creates and starts a new thread for the Flask server.
     2. Creates and starts a new thread for the production system controller.
     3. Waits for both threads to complete.
-    4. Removes the classifier model file when both threads have ended.
     
     Note:
-    The classifier model file is located at 'src/production system/model/classifier_model.joblib'.
-    If the file exists, it will be removed. If the file does not exist, a message will be printed.
+    The classifier models are staged by the model registry in 'src/production_system/model/versions'.
+    They are kept on shutdown, with the active version, so the next run resumes the same model
+    (a rollback included); use model_registry.registry.clear() to remove them.
     """
+    # Put back in the queue the sessions spooled and not classified by the previous run
+    recovered = session_queue.recover_spool()
+    if recovered:
+        print(f"Recovered {recovered} sessions from the spool")
+
     # Create a new Flask server thread
     flask_thread = threading.Thread(target=start_flask_server)
     flask_thread.start()
@@ -46,18 +58,9 @@ def main():
     production_system_thread = threading.Thread(target=start_production_system_controller)
     production_system_thread.start()
 
-    try:
-        # Wait for both threads to complete
-        production_system_thread.join()
-        flask_thread.join()
-    finally:
-        # When both threads end, remove the model
-        model_path = os.path.join('src', 'production_system', 'model', 'classifier_model.joblib')
-        if os.path.exists(model_path):
-            os.remove(model_path)
-            print(f"Removed file: {model_path}")
-        else:
-            print(f"File not found: {model_path}")
+    # Wait for both threads to complete
+    production_system_thread.join()
+    flask_thread.join()
 
 if __name__ == "__main__":
     main()
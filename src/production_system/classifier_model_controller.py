@@ -3,41 +3,112 @@ Module delegated to the classification of the session request.
 """
 import os
 import time
-import ipaddress
 import json
-import joblib
-import pandas as pd
+import warnings
+import numpy as np
 import requests
+import model_registry
+import production_config
+from utility.ip_codec import ips_to_float
 
 # pylint: disable=C0301
+
+# Features given to the model, in the order of the training set
+FEATURE_NAMES = ['mean_abs_diff_ts', 'mean_abs_diff_am', 'median_long', 'median_lat', 'median_targetIP', 'median_destIP']
+
+def session_features(data_list):
+    """
+    Builds the feature matrix of many session requests.
+
+    Parameters
+    ----------
+    data_list : list of dict
+        The sessions, in the format of PrepareSessionHandler.session_request().
+
+    Returns
+    -------
+    numpy.ndarray
+        Float64 matrix with a row for each session and the columns in the order of FEATURE_NAMES.
+    """
+    # Matrice delle caratteristiche: una riga per sessione, colonne nell'ordine di FEATURE_NAMES
+    features = np.empty((len(data_list), len(FEATURE_NAMES)), dtype=np.float64)
+    features[:, 0] = [data['mean_diff_time'] for data in data_list]
+    features[:, 1] = [data['mean_diff_amount'] for data in data_list]
+    features[:, 2] = [data['median_coordinates'][1] for data in data_list]
+    features[:, 3] = [data['median_coordinates'][0] for data in data_list]
+    # Converti gli IP a float (ogni indirizzo distinto una sola volta)
+    features[:, 4] = ips_to_float([data['mean_target_ip'] for data in data_list])
+    features[:, 5] = ips_to_float([data['mean_dest_ip'] for data in data_list])
+    return features
+
+def predict(model, features):
+    """
+    Classifies a feature matrix built by session_features with a single prediction of the model.
+
+    Parameters
+    ----------
+    model : object
+        The classifier model.
+    features : numpy.ndarray
+        The feature matrix.
+
+    Returns
+    -------
+    array
+        The classification results.
+    """
+    # Se il modello conosce i nomi delle caratteristiche, rispetta il suo ordine
+    names = getattr(model, 'feature_names_in_', None)
+    if isinstance(names, np.ndarray):
+        features = features[:, [FEATURE_NAMES.index(name) for name in names]]
+
+    # Predici con il modello: una sola chiamata per tutto il batch
+    with warnings.catch_warnings():
+        # il modello è stato addestrato su un DataFrame, la matrice non ha i nomi delle colonne
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        return model.predict(features)
+
 class ClassifierModelController:
     """
     Controller class for managing and using a classifier model.
 
     Methods:
     --------
-    __init__():
-        Initializes the ClassifierModelController instance, loads hyperparameters, and loads the classifier model.
+    __init__(registry=None):
+        Initializes the ClassifierModelController instance and waits for the model registry to deploy a classifier model.
     get_hyperparameters():
         Retrieves hyperparameters from a JSON file.
-    load_classifier():
-        Loads the classifier model using the hyperparameters.
+    load_classifier(timeout=1):
+        Waits for the model registry to activate a classifier model.
+    notify_deployment(version, load_time):
+        Sends the time spent to deploy a new classifier model.
     get_classifier_model():
         Returns the loaded classifier model.
     classify(data):
         Classifies the given data using the loaded model.
+    classify_batch(data_list):
+        Classifies many sessions with a single prediction of the model.
     predict(data):
         Placeholder method for predicting data using the model.
     """
-    def __init__(self):
+    def __init__(self, registry=None):
         """
         Initializes the ClassifierModelController.
 
-        This includes creating an instance of the JSON I/O handler and loading the classifier model with its hyperparameters.
+        The models are taken from the model registry: the background loader is started and
+        the initialization waits until the first model has been deployed.
+
+        Parameters
+        ----------
+        registry : model_registry.ModelRegistry, optional
+            The registry of the deployed models; the one shared with the Flask server by default.
         """
-        self.model = None
-        while self.model is None:
-            self.load_classifier()
+        self.registry = registry if registry is not None else model_registry.registry
+        if self.registry.on_load is None:
+            self.registry.on_load = self.notify_deployment
+        self.registry.start()
+        while not self.load_classifier():
+            pass
 
     def get_hyperparameters(self):
         """
@@ -58,45 +129,52 @@ class ClassifierModelController:
             hyperparameters = json.load(file)
         return hyperparameters
 
-    def load_classifier(self):
+    def load_classifier(self, timeout=1):
         """
-        Loads the classifier model using hyperparameters.
+        Waits for the registry to activate a classifier model.
 
-        Extracts necessary details like the number of inputs, layers, neurons, and training error from the hyperparameters.
-        Uses the 'model_file' path from hyperparameters to load the model with joblib.
-        """
-        model_file = os.path.join('src', 'production_system', 'model')
+        The models are loaded in background by the registry, which swaps the active one
+        without pausing the classification.
 
-        while not any(fname.endswith('.joblib') for fname in os.listdir(model_file)):
-            time.sleep(1)
-        # load the classifier model
-        try:
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for a model.
 
-            files = [fname for fname in os.listdir(model_file) if fname.endswith('.joblib')]
-            model_file = os.path.join(model_file, files[0])
-
-            start_time = time.time_ns()
-
-            self.model = joblib.load(model_file)
-
-            time_now = time.time_ns()
-            end_time = time_now - start_time
+        Returns
+        -------
+        bool
+            True if a model is active.
+        """
+        return self.registry.wait_for_model(timeout)
 
-            print(f"Time now: {time_now}.Time to deploy classifier model in seconds: {end_time/(10**9)}")
-            try:
-                requests.post("http://192.168.97.2:5555/", json={
-                    'system':'production_system',
-                    'time':end_time,
-                    'end':True
-                }, timeout=10)
-            except requests.exceptions.RequestException as e:
-                print(f"An error occurred while sending timestamp: {e}")
-        except (FileNotFoundError, joblib.externals.loky.process_executor.TerminatedWorkerError) as e:
-            print(f"Error loading model: {e}")
-            self.model = None
-            return False
-        os.remove(model_file)
-        return True
+    def notify_deployment(self, version, load_time):
+        """
+        Sends the time spent to deploy a new classifier model.
+
+        Parameters
+        ----------
+        version : int
+            The version of the deployed model.
+        load_time : int
+            Nanoseconds spent loading the model.
+        """
+        print(f"Time now: {time.time_ns()}.Time to deploy classifier model version {version} in seconds: {load_time/(10**9)}")
+        try:
+            requests.post(production_config.TIMING_URL, json={
+                'system':'production_system',
+                'time':load_time,
+                'end':True
+            }, timeout=10)
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred while sending timestamp: {e}")
+
+    @property
+    def model(self):
+        """
+        The active classifier model.
+        """
+        return self.registry.model
 
     def classify(self, data):
         """
@@ -112,25 +190,31 @@ class ClassifierModelController:
         array
             The classification results.
         """
-        if not hasattr(self, 'model'):
-            raise RuntimeError("Model not loaded")
+        return self.classify_batch([data])
+
+    def classify_batch(self, data_list):
+        """
+        Classifies many sessions with a single prediction of the loaded model.
+
+        Parameters:
+        -----------
+        data_list : list of dict
+            The input data to classify, in the format of PrepareSessionHandler.session_request().
 
+        Returns:
+        --------
+        array
+            The classification results, one for each session and in the same order.
+        """
         start_time = time.time()
-        # Estrai le caratteristiche rilevanti dal dizionario
-        features = {
-            'mean_abs_diff_ts': data['mean_diff_time'],
-            'mean_abs_diff_am': data['mean_diff_amount'],
-            'median_long': data['median_coordinates'][1],
-            'median_lat': data['median_coordinates'][0],
-            'median_targetIP': ip_to_float(data['mean_target_ip']),  # Converti IP a float
-            'median_destIP': ip_to_float(data['mean_dest_ip']),  # Converti IP a float
-        }
-        # Converti le caratteristiche in un DataFrame di pandas
-        features_df = pd.DataFrame([features])
-        # Predici con il modello
-        y_pred = self.model.predict(features_df)  # Usa il modello caricato
+        features = session_features(data_list)
+        # Il modello attivo non viene sostituito finché la predizione non è terminata
+        with self.registry.read() as model:
+            if model is None:
+                raise RuntimeError("Model not loaded")
+            y_pred = predict(model, features)
         end_time = time.time()
-        print("Classification took ", end_time - start_time, " seconds")
+        print(f"Classification of {len(data_list)} sessions took ", end_time - start_time, " seconds")
         return y_pred
 
     def get_classifier_model(self):
@@ -142,15 +226,6 @@ class ClassifierModelController:
         MLPClassifier
             The loaded classifier model.
         """
-        if not hasattr(self, 'model'):
+        if self.model is None:
             raise RuntimeError("Model not loaded")
         return self.model
-
-def ip_to_float(ip_string):
-    """
-    Convert an IP address string to a normalized float.
-    """
-    try:
-        return float(int(ipaddress.ip_address(ip_string))) / float(int(ipaddress.ip_address("255.255.255.255")))
-    except ValueError:
-        return 0.0  # Return 0.0 if the IP is invalid
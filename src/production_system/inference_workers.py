@@ -0,0 +1,310 @@
+"""
+This module contains the pool of inference worker processes of the production system.
+
+Every worker process holds its own copy of the classifier model, so the classification is not
+serialized behind the GIL of the process running the Flask server. The numpy arrays of joblib models
+are memory-mapped, so the workers share the same pages of the model file instead of copying them.
+The batches of sessions are load-balanced through a shared task queue; each worker reports its health
+(heartbeat, processed batches, loaded model version) through shared memory arrays.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import joblib
+import model_registry
+from classifier_model_controller import session_features, predict
+
+# pylint: disable=C0301
+
+# Seconds between two heartbeats of an idle worker
+HEARTBEAT_INTERVAL = 1.0
+
+# A worker without heartbeat for more than these seconds is reported as not healthy
+HEALTH_TIMEOUT = 10.0
+
+# Times a batch is submitted again after the death of the worker classifying it, before it is reported as failed
+MAX_RESUBMITS = 2
+
+# Pool started by start_pool, used by the Flask server for the health report
+pool = None
+
+
+def load_model(path):
+    """
+    Loads a model file staged by the model registry.
+
+    Parameters
+    ----------
+    path : str
+        Path of the model file.
+
+    Returns
+    -------
+    object
+        The model; the numpy arrays of uncompressed joblib files are memory-mapped read-only.
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.joblib':
+        return joblib.load(path, mmap_mode='r')
+    return model_registry.LOADERS[extension](path)
+
+
+def _model_path(versions_dir, version):
+    """
+    Returns the path of a staged model version, None if the file is not available anymore.
+    """
+    if os.path.isdir(versions_dir):
+        for fname in os.listdir(versions_dir):
+            match = model_registry.VERSION_RE.match(fname)
+            if match and int(match.group(1)) == version:
+                return os.path.join(versions_dir, fname)
+    return None
+
+
+def _worker(worker_id, versions_dir, tasks, results, heartbeats, processed, versions, current):
+    """
+    Main loop of a worker process: takes a batch from the task queue, loads the model version
+    requested by the batch if it is not the one already loaded, classifies and puts the labels
+    in the result queue. A None task stops the worker.
+    """
+    model, version = None, None
+    while True:
+        heartbeats[worker_id] = time.time()
+        try:
+            task = tasks.get(timeout=HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            continue
+        if task is None:
+            break
+        batch_id, task_version, requests_batch = task
+        current[worker_id] = batch_id
+        start_time = time.time_ns()
+        try:
+            if task_version != version:
+                path = _model_path(versions_dir, task_version)
+                if path is not None:
+                    model, version = load_model(path), task_version
+                    versions[worker_id] = version
+                elif model is None:
+                    raise FileNotFoundError(f"Model version {task_version} not found")
+                else:
+                    # La versione richiesta è già stata rimossa: prosegui con il modello caricato
+                    print(f"Worker {worker_id}: model version {task_version} not found, using version {version}")
+            labels = predict(model, session_features(requests_batch)).tolist()
+            results.put((batch_id, labels, time.time_ns() - start_time))
+        except Exception as e:  # pylint: disable=W0718
+            # Any error fails only this batch: the worker survives a corrupt model or a malformed session
+            print(f"Worker {worker_id}: error classifying batch {batch_id}: {e}")
+            results.put((batch_id, None, time.time_ns() - start_time))
+        processed[worker_id] += 1
+        current[worker_id] = -1
+
+
+class InferenceWorkerPool:
+    """
+    Pool of worker processes classifying batches of session requests.
+
+    Methods
+    -------
+    submit(requests_batch, version):
+        Puts a batch in the shared task queue, waiting if the queue is full.
+    get_result(timeout=None):
+        Returns the labels of a classified batch.
+    check_workers():
+        Restarts the dead workers and resubmits the batch they were classifying.
+    health():
+        Returns the health report of each worker.
+    close():
+        Stops the workers.
+    """
+    def __init__(self, workers, versions_dir, queue_size=None):
+        """
+        Starts the worker processes.
+
+        Parameters
+        ----------
+        workers : int
+            Number of worker processes.
+        versions_dir : str
+            Directory of the model versions staged by the model registry.
+        queue_size : int, optional
+            Maximum number of batches waiting in the task queue, twice the number of workers by default.
+        """
+        # spawn: i processi non ereditano i thread (Flask, loader del registry) del processo padre
+        self._context = multiprocessing.get_context('spawn')
+        self.versions_dir = versions_dir
+        self.tasks = self._context.Queue(maxsize=queue_size or 2 * workers)
+        self.results = self._context.Queue()
+        self.heartbeats = self._context.Array('d', workers, lock=False)
+        self.processed = self._context.Array('q', workers, lock=False)
+        self.versions = self._context.Array('q', [-1] * workers, lock=False)
+        self.current = self._context.Array('q', [-1] * workers, lock=False)
+        self.processes = [None] * workers
+        self._pending = {}
+        self._resubmits = {}
+        self._next_batch_id = 0
+        self._lock = threading.Lock()
+        for worker_id in range(workers):
+            self._start_worker(worker_id)
+
+    def _start_worker(self, worker_id):
+        self.heartbeats[worker_id] = time.time()
+        self.current[worker_id] = -1
+        process = self._context.Process(
+            target=_worker, name=f"inference-worker-{worker_id}", daemon=True,
+            args=(worker_id, self.versions_dir, self.tasks, self.results,
+                  self.heartbeats, self.processed, self.versions, self.current))
+        process.start()
+        self.processes[worker_id] = process
+
+    def submit(self, requests_batch, version):
+        """
+        Puts a batch of session requests in the task queue, waiting if it is full.
+
+        Parameters
+        ----------
+        requests_batch : list of dict
+            The session requests, in the format of PrepareSessionHandler.session_request().
+        version : int
+            The version of the model (in the model registry) to classify the batch with.
+
+        Returns
+        -------
+        int
+            The id of the batch.
+        """
+        with self._lock:
+            batch_id = self._next_batch_id
+            self._next_batch_id += 1
+            self._pending[batch_id] = (version, requests_batch)
+        self.tasks.put((batch_id, version, requests_batch))
+        return batch_id
+
+    def get_result(self, timeout=None):
+        """
+        Returns the result of a classified batch.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait; None waits until a batch is classified.
+
+        Returns
+        -------
+        tuple or None
+            (requests_batch, labels, classification time in nanoseconds), labels is None if the
+            classification failed; None if no batch has been classified within the timeout.
+        """
+        try:
+            batch_id, labels, elapsed = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        with self._lock:
+            _, requests_batch = self._pending.pop(batch_id, (None, None))
+            self._resubmits.pop(batch_id, None)
+        if requests_batch is None:
+            # risultato di un batch già rimesso in coda dopo la morte del worker
+            return None
+        return requests_batch, labels, elapsed
+
+    def check_workers(self):
+        """
+        Restarts the dead workers; the batch a worker was classifying when it died is submitted again,
+        up to MAX_RESUBMITS times, then it is reported as failed so it cannot kill the workers forever.
+
+        Returns
+        -------
+        int
+            The number of restarted workers.
+        """
+        restarted = 0
+        for worker_id, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            print(f"Inference worker {worker_id} died (exit code {process.exitcode}), restarting it")
+            batch_id = self.current[worker_id]
+            self._start_worker(worker_id)
+            restarted += 1
+            with self._lock:
+                task = self._pending.get(batch_id)
+                resubmits = self._resubmits.get(batch_id, 0) + 1
+                if task is not None:
+                    self._resubmits[batch_id] = resubmits
+            if task is None:
+                continue
+            if resubmits > MAX_RESUBMITS:
+                print(f"Batch {batch_id} killed {resubmits} inference workers, giving up")
+                self.results.put((batch_id, None, 0))
+            else:
+                self.tasks.put((batch_id, task[0], task[1]))
+        return restarted
+
+    def health(self):
+        """
+        Returns the health report of the workers.
+
+        Returns
+        -------
+        list of dict
+            For each worker: pid, alive, healthy (alive and with a recent heartbeat), seconds since
+            the last heartbeat, number of processed batches, loaded model version (None if no model).
+        """
+        now = time.time()
+        report = []
+        for worker_id, process in enumerate(self.processes):
+            last_heartbeat = now - self.heartbeats[worker_id]
+            alive = process.is_alive()
+            report.append({
+                'worker': worker_id,
+                'pid': process.pid,
+                'alive': alive,
+                'healthy': alive and last_heartbeat < HEALTH_TIMEOUT,
+                'last_heartbeat': round(last_heartbeat, 3),
+                'processed': self.processed[worker_id],
+                'model_version': self.versions[worker_id] if self.versions[worker_id] >= 0 else None,
+                'busy': self.current[worker_id] >= 0
+            })
+        return report
+
+    def pending(self):
+        """
+        Returns the number of batches submitted and not yet classified.
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def close(self, timeout=5):
+        """
+        Stops the workers, terminating the ones which do not stop within the timeout.
+        """
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+def start_pool(workers, versions_dir=None):
+    """
+    Starts the pool of inference workers shared by the controller and the Flask server.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes, a negative number uses one for each core.
+    versions_dir : str, optional
+        Directory of the staged model versions, the one of the shared model registry by default.
+
+    Returns
+    -------
+    InferenceWorkerPool
+        The started pool.
+    """
+    global pool  # pylint: disable=W0603
+    if versions_dir is None:
+        versions_dir = model_registry.registry.versions_dir
+    pool = InferenceWorkerPool(workers if workers > 0 else os.cpu_count(), versions_dir)
+    return pool
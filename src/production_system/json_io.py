@@ -7,6 +7,9 @@ import json
 from flask import Flask, request
 from flask_restful import Api, Resource
 from flask_cors import CORS
+import session_queue
+import model_registry
+import inference_workers
 
 class ModelUpload(Resource):
     """ 
@@ -23,13 +26,50 @@ class ModelUpload(Resource):
         # Verifica se il file è presente nella richiesta
         if 'file' in request.files:
             file = request.files['file']
+            extension = os.path.splitext(file.filename or '')[1] or '.joblib'
 
-            os.makedirs(os.path.join('src', 'production_system', 'model'), exist_ok=True)
-
-            file.save(os.path.join('src', 'production_system', 'model', 'classifier_model.joblib'))
-            return {'message': 'Model saved successfully'}, 201
+            # Il modello viene salvato come nuova versione e caricato in background
+            try:
+                version = model_registry.registry.stage(file, extension)
+            except ValueError as e:
+                return {'error': str(e)}, 415
+            return {'message': 'Model saved successfully', 'version': version}, 201
         return {'error': 'No file part in the request'}, 400
 
+class ModelRollback(Resource):
+    """
+    Flask-RESTful resource for restoring the previous classifier model.
+    Methods
+    -------
+    post():
+        Handles POST requests to roll back to the previous model.
+    """
+    def post(self):
+        """
+        Handles POST requests to roll back to the previous model.
+        """
+        version = model_registry.registry.rollback()
+        if version is None:
+            return {'error': 'No previous model to restore'}, 409
+        return {'message': 'Model restored', 'version': version}, 200
+
+class WorkerHealth(Resource):
+    """
+    Flask-RESTful resource reporting the health of the inference worker processes.
+    Methods
+    -------
+    get():
+        Handles GET requests returning the health report of each worker.
+    """
+    def get(self):
+        """
+        Handles GET requests returning the health report of each worker.
+        """
+        if inference_workers.pool is None:
+            return {'error': 'Inference workers not enabled'}, 404
+        return {'workers': inference_workers.pool.health(),
+                'pending': inference_workers.pool.pending()}, 200
+
 class SessionUpload(Resource):
     """
     Flask-RESTful resource for handling session uploads.
@@ -57,16 +97,13 @@ class SessionUpload(Resource):
                 # Verifica che il JSON contenga la chiave 'uuid' (attenzione al case-sensitive)
                 if 'UUID' not in json_data:  # Cambiato da 'uuid' a 'UUID' in base ai dati ricevuti
                     return {'error': 'Missing required field: UUID'}, 400
+                # L'UUID dà il nome al file della sessione: niente separatori di percorso
+                if not session_queue.valid_uuid(json_data['UUID']):
+                    return {'error': 'Invalid UUID'}, 400
 
-                # Assicurati che esista la directory per salvare i file
-                output_dir = os.path.join('src', 'production_system', 'session')
-                os.makedirs(output_dir, exist_ok=True)
-
-                # Salva il file JSON con il nome basato sull'UUID
-                filename = f"{json_data['UUID']}.json"  # Cambiato da 'uuid' a 'UUID'
-                file_path = os.path.join(output_dir, filename)
-                with open(file_path, 'w', encoding='utf8') as file:
-                    json.dump(json_data, file)
+                # Passa la sessione al controller tramite la coda in memoria
+                # (salvata anche su file solo se session_queue.SPOOL_SESSIONS è attivo)
+                session_queue.put_session(json_data)
 
                 return {'message': 'Session saved'}, 201
 
@@ -96,6 +133,8 @@ class FlaskServer:
         CORS(self.app)  # Aggiungi supporto CORS
         self.api = Api(self.app)
         self.api.add_resource(ModelUpload, '/upload_model')
+        self.api.add_resource(ModelRollback, '/rollback_model')
+        self.api.add_resource(WorkerHealth, '/workers')
         self.api.add_resource(SessionUpload, '/upload_session')
 
         # Configura Flask per accettare file di grandi dimensioni
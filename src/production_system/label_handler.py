@@ -1,8 +1,12 @@
 """ 
 This class is responsible for handling labels and sending them to different phases.
 """
+import threading
+from comms.outbound_dispatcher import OutboundDispatcher
+import production_config
 
-import requests
+_outbox = None
+_outbox_lock = threading.Lock()
 
 class LabelHandler:
     """
@@ -68,16 +72,74 @@ class LabelHandler:
             The phase to send the label to (default is 'evaluation').
 
         Sends the label to either the evaluation or production system based on the phase.
+        The label is queued in the outbox and sent in background; with a label batch size
+        greater than 1 the evaluation labels are sent in lists to the batch endpoint.
+
+        Returns:
+        --------
+        bool
+            True if the label has been queued, False if the outbox is full and the label was dropped.
         """
         # Prepare the message to be sent
         if phase == 'evaluation':
-            address = 'http://192.168.97.250:8001'
+            address = evaluation_url()
         else:
-            address = 'http://192.168.97.250:8001'
-
-        # Send the label to evaluation system using a post request
-        try:
-            requests.post(address, json=self.label, timeout=1)
-        except requests.exceptions.RequestException:
-            return
-        return
+            address = production_config.PRODUCTION_URL
+
+        # Queue the label in the outbox, it is sent in background
+        return outbox().send(address, self.label)
+
+
+def outbox():
+    """
+    Returns the outbox shared by all the label handlers, creating it on first use.
+
+    The outbox sends the labels and the timing data from background threads, reusing the
+    connections, batching the labels and retrying the failed posts; the classification never
+    waits on the network.
+
+    Returns:
+    --------
+    OutboundDispatcher
+        The outbox.
+    """
+    global _outbox  # pylint: disable=W0603
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = OutboundDispatcher(queue_size=production_config.OUTBOX_QUEUE_SIZE,
+                                         workers=production_config.OUTBOX_WORKERS,
+                                         timeout=production_config.OUTBOX_TIMEOUT,
+                                         retries=production_config.OUTBOX_RETRIES,
+                                         backoff=production_config.OUTBOX_BACKOFF)
+            # Only the batch endpoint of the evaluation system accepts a list of labels
+            _outbox.add_destination(evaluation_url(), production_config.LABEL_BATCH_SIZE)
+        return _outbox
+
+
+def evaluation_url():
+    """
+    Returns the endpoint of the evaluation system for the labels: the batch endpoint
+    if the labels are sent in batches, the single label endpoint otherwise.
+
+    Returns:
+    --------
+    str
+        The URL.
+    """
+    if production_config.LABEL_BATCH_SIZE > 1:
+        return production_config.EVALUATION_BATCH_URL
+    return production_config.EVALUATION_URL
+
+
+def send_timing(elapsed):
+    """
+    Sends in background the time spent by the production system to the timing service.
+
+    Parameters:
+    -----------
+    elapsed : int
+        The time in nanoseconds.
+    """
+    outbox().send(production_config.TIMING_URL, {'system': 'production_system',
+                                                 'time': elapsed,
+                                                 'end': True})
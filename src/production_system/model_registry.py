@@ -0,0 +1,353 @@
+"""
+This module contains the versioned registry of the classifier models deployed in the production system.
+
+New models are staged atomically in the versions directory, a background loader loads them and swaps
+the active model under a read-write lock, so that the classification never sees a half-loaded model
+and is paused only for the time of the swap. The previous model is kept in memory for an instant rollback.
+The active version is persisted, so a rollback survives both a restart and the staging of a new model.
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+import joblib
+from mlp_predictor import MLPPredictor
+
+# pylint: disable=C0301
+
+# Directory of the models received from the development system
+MODEL_DIR = os.path.join('src', 'production_system', 'model')
+
+# Staged models are named v<version><extension>, e.g. v000001.joblib
+VERSION_RE = re.compile(r'^v(\d+)(\.\w+)$')
+
+# Functions used to load a model file, by extension: sklearn models saved with joblib,
+# or MLP classifiers exported by the development system as NumPy arrays
+LOADERS = {'.joblib': joblib.load, '.npz': MLPPredictor.load}
+
+
+class ReadWriteLock:
+    """
+    Read-write lock: many readers (the classifications) or a single writer (the swap of the model).
+    A waiting writer blocks the new readers, so a swap is never postponed indefinitely.
+
+    Methods
+    -------
+    read():
+        Context manager holding the lock in shared mode.
+    write():
+        Context manager holding the lock in exclusive mode.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """
+        Holds the lock in shared mode.
+        """
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """
+        Holds the lock in exclusive mode.
+        """
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class ModelRegistry:
+    """
+    Versioned registry of the classifier models.
+
+    Methods
+    -------
+    start():
+        Starts the background loader, which also loads the model active in a previous run.
+    stage(file, extension='.joblib'):
+        Atomically stages a new model file and wakes up the loader.
+    activate(model, version):
+        Makes a loaded model the active one, keeping the current one for rollback.
+    rollback():
+        Restores the previous model.
+    read():
+        Context manager returning the active model, which cannot be swapped while in use.
+    wait_for_model(timeout=None):
+        Waits until a model is active.
+    clear():
+        Removes every staged model file and the persisted active version.
+    """
+    def __init__(self, model_dir=MODEL_DIR, on_load=None):
+        """
+        Initializes the registry.
+
+        Parameters
+        ----------
+        model_dir : str, optional
+            Directory of the models; the staged versions are kept in its 'versions' subdirectory,
+            the active version in its 'active_version.json' file.
+        on_load : callable, optional
+            Called with (version, seconds) after a staged model has been loaded and activated.
+        """
+        self.versions_dir = os.path.join(model_dir, 'versions')
+        self.state_path = os.path.join(model_dir, 'active_version.json')
+        self.on_load = on_load
+        self.model = None
+        self.version = None
+        self.previous_model = None
+        self.previous_version = None
+        # Highest version ever activated: older staged versions (e.g. one rolled back) are not reloaded
+        self.latest_version = None
+        self._rw_lock = ReadWriteLock()
+        self._lock = threading.Lock()
+        self._activated = threading.Condition()
+        self._staged = threading.Event()
+        self._loader = None
+
+    def _staged_versions(self):
+        """
+        Returns the staged model files as a sorted list of (version, path).
+        """
+        if not os.path.isdir(self.versions_dir):
+            return []
+        versions = []
+        for fname in os.listdir(self.versions_dir):
+            match = VERSION_RE.match(fname)
+            if match and match.group(2) in LOADERS:
+                versions.append((int(match.group(1)), os.path.join(self.versions_dir, fname)))
+        return sorted(versions)
+
+    def _read_state(self):
+        """
+        Returns the active and the latest version persisted by _write_state, an empty dict if there is none.
+        """
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            if os.path.exists(self.state_path):
+                print(f"Error reading the active model version: {e}")
+            return {}
+
+    def _write_state(self):
+        """
+        Atomically persists the active and the latest version.
+        """
+        tmp_path = self.state_path + '.tmp'
+        with self._lock:
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'active': self.version, 'latest': self.latest_version}, f)
+            os.replace(tmp_path, self.state_path)
+
+    def stage(self, file, extension='.joblib'):
+        """
+        Stages a new model: the file is written to a temporary path and then renamed,
+        so the loader never reads a partially written model.
+
+        Parameters
+        ----------
+        file : object
+            The model file, anything with a save(path) method (e.g. a werkzeug FileStorage).
+        extension : str, optional
+            Extension of the model file, it selects the loader.
+
+        Returns
+        -------
+        int
+            The version assigned to the model.
+        """
+        if extension not in LOADERS:
+            raise ValueError(f"Unsupported model format: {extension}")
+        os.makedirs(self.versions_dir, exist_ok=True)
+        with self._lock:
+            staged = self._staged_versions()
+            version = max([staged[-1][0] if staged else 0, self.latest_version or 0]) + 1
+            final_path = os.path.join(self.versions_dir, f"v{version:06d}{extension}")
+            tmp_path = final_path + '.tmp'
+            file.save(tmp_path)
+            os.replace(tmp_path, final_path)
+        self._staged.set()
+        return version
+
+    def activate(self, model, version):
+        """
+        Makes a model the active one; the current active model becomes the previous one.
+
+        Parameters
+        ----------
+        model : object
+            The loaded model.
+        version : int
+            Its version.
+        """
+        with self._rw_lock.write():
+            if self.model is not None:
+                self.previous_model, self.previous_version = self.model, self.version
+            self.model, self.version = model, version
+            self.latest_version = max(self.latest_version or 0, version)
+        self._write_state()
+        with self._activated:
+            self._activated.notify_all()
+
+    def rollback(self):
+        """
+        Restores the previous model, the current one becomes the previous.
+
+        Returns
+        -------
+        int or None
+            The version now active, or None if there is no previous model.
+        """
+        with self._rw_lock.write():
+            if self.previous_model is None:
+                return None
+            self.model, self.previous_model = self.previous_model, self.model
+            self.version, self.previous_version = self.previous_version, self.version
+            version = self.version
+        self._write_state()
+        return version
+
+    @contextmanager
+    def read(self):
+        """
+        Returns the active model (None if no model has been loaded yet).
+        The model is not swapped until the with block ends.
+        """
+        with self._rw_lock.read():
+            yield self.model
+
+    def wait_for_model(self, timeout=None):
+        """
+        Waits until a model is active.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait; None waits until a model is loaded.
+
+        Returns
+        -------
+        bool
+            True if a model is active.
+        """
+        with self._activated:
+            return self._activated.wait_for(lambda: self.model is not None, timeout)
+
+    def _version_to_load(self):
+        """
+        Returns the (version, path) of the staged model to activate, or None.
+
+        A version newer than every one activated so far is always chosen. Otherwise, at the first load
+        after a restart, the version that was active in the previous run is restored, even if a newer
+        one had been rolled back.
+        """
+        staged = self._staged_versions()
+        resume = None
+        if self.latest_version is None and self.version is None:
+            state = self._read_state()
+            self.latest_version = state.get('latest')
+            resume = dict(staged).get(state.get('active'))
+            if resume is not None:
+                resume = (state['active'], resume)
+        newer = [s for s in staged if s[0] > max(self.latest_version or 0, self.version or 0)]
+        return newer[-1] if newer else resume
+
+    def load_staged(self):
+        """
+        Loads the latest staged model, if it is newer than every model activated so far, and activates it.
+        The loading is done outside the lock: the classification goes on with the active model meanwhile.
+
+        Returns
+        -------
+        bool
+            True if a new model has been activated.
+        """
+        to_load = self._version_to_load()
+        if to_load is None:
+            return False
+        version, path = to_load
+        start_time = time.time_ns()
+        try:
+            model = LOADERS[os.path.splitext(path)[1]](path)
+        except Exception as e:  # pylint: disable=W0718
+            print(f"Error loading model version {version}: {e}")
+            # Il file non è un modello valido: rimuovilo per non ritentare all'infinito
+            os.remove(path)
+            return False
+        self.activate(model, version)
+        end_time = time.time_ns() - start_time
+        self._remove_old_versions()
+        if self.on_load is not None:
+            self.on_load(version, end_time)
+        return True
+
+    def _remove_old_versions(self):
+        """
+        Removes the staged files older than the previous version, which cannot be restored anymore.
+        """
+        keep = min(v for v in (self.version, self.previous_version) if v is not None)
+        with self._lock:
+            for version, path in self._staged_versions():
+                if version < keep:
+                    os.remove(path)
+
+    def _loader_loop(self):
+        while True:
+            self._staged.wait()
+            self._staged.clear()
+            try:
+                self.load_staged()
+            except Exception as e:  # pylint: disable=W0718
+                # The loader must survive any error: the active model stays in use
+                print(f"Error loading the staged model: {e}")
+
+    def start(self):
+        """
+        Starts the background loader. The model active in a previous run, or a newer one staged
+        meanwhile, is loaded immediately.
+        """
+        if self._loader is None:
+            self._loader = threading.Thread(target=self._loader_loop, daemon=True)
+            self._loader.start()
+            self._staged.set()
+
+    def clear(self):
+        """
+        Removes every staged model file and the persisted active version.
+        """
+        with self._lock:
+            for _, path in self._staged_versions():
+                os.remove(path)
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+
+
+# Registry shared by the Flask server and the production system controller
+registry = ModelRegistry()
@@ -1,9 +1,8 @@
 """ 
 This module contains the PrepareSessionHandler class for preparing and managing session data.
 """
-import json
-import os
 import time
+import session_queue
 
 # pylint: disable=C0301
 
@@ -72,30 +71,63 @@ class PrepareSessionHandler:
         except (TypeError, ValueError, KeyError):
             return None
 
-    def new_session(self):
+    def new_session(self, timeout=None):
         """
-        Retrieves a new session message from the JSON I/O system.
+        Retrieves a new session message from the session queue, waiting for it to arrive.
         Parses the message to populate the attributes of the current session.
-        """
-        current_directory = os.path.join(os.path.dirname(__file__), 'session')
 
-        # wait until at least one file with .json extension is present in the "session" directory
-        while not any(fname.endswith('.json') for fname in os.listdir(current_directory)):
-            # wait for file to be received
-            time.sleep(1)
+        Parameters
+        ----------
+        timeout : float, optional
+            Seconds to wait for a session; None waits until one arrives.
+        """
+        return self.parse_session(session_queue.get_session(timeout))
 
-            # get list of files in the directory and take the first one with .json extension
-        files = [fname for fname in os.listdir(current_directory) if fname.endswith('.json')]
-        if not files:
-            return False
-        filename = files[0]
-        with open(os.path.join(current_directory, filename), 'r', encoding='utf-8') as file:
-            message = json.load(file)
+    def new_sessions(self, max_sessions, max_wait_ms):
+        """
+        Collects a micro-batch of sessions: waits for the first one, then keeps collecting
+        until max_sessions have arrived or max_wait_ms milliseconds have passed.
+
+        Parameters
+        ----------
+        max_sessions : int
+            Maximum number of sessions in the batch.
+        max_wait_ms : float
+            Maximum time to wait for more sessions after the first one.
+
+        Returns
+        -------
+        list of dict
+            The session requests (see session_request()), in arrival order; malformed sessions are skipped.
+        """
+        requests_batch = []
+        message = session_queue.get_session()
+        deadline = time.monotonic() + max_wait_ms / 1000
+        while True:
+            if self.parse_session(message):
+                requests_batch.append(self.session_request())
+            if len(requests_batch) >= max_sessions:
+                break
+            message = session_queue.get_session(max(deadline - time.monotonic(), 0))
+            if message is None:
+                break
+        return requests_batch
+
+    def parse_session(self, message):
+        """
+        Parses a session message to populate the attributes of the current session.
 
-            # delete the file
-            os.remove(os.path.join(current_directory, filename))
+        Parameters
+        ----------
+        message : dict
+            The prepared session received by the Flask server.
 
-        # If the message is empty, exit the method
+        Returns
+        -------
+        bool
+            True if the message is a valid session.
+        """
+        # If no message arrived or the message is empty, exit the method
         if not message:
             return False
 
@@ -113,5 +145,8 @@ class PrepareSessionHandler:
             self.mean_dest_ip = message['median_destIP']  # Mean destination IP address
         except (KeyError, TypeError, ValueError) as e:
             print(f"Error parsing session message: {e}")
+            # A malformed session is never classified, release its spooled copy
+            if 'UUID' in message:
+                session_queue.session_done(message['UUID'])
             return False
         return True
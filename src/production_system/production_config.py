@@ -0,0 +1,80 @@
+"""
+This module loads the configuration of the production system.
+"""
+import json
+import os
+
+# pylint: disable=C0301
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data',
+                           'production_system', 'configs', 'production_config.json')
+
+DEFAULT_CONFIG = {
+    # Maximum number of sessions classified with a single predict
+    "batch_size": 256,
+    # Maximum time (in milliseconds) to wait for more sessions after the first one of a batch
+    "batch_timeout_ms": 10,
+    # If True the received sessions are also written to disk, see session_queue
+    "spool_sessions": False,
+    # Number of inference worker processes (0 classifies in the controller thread, -1 one for each core)
+    "inference_workers": 0,
+    # Endpoints of the labels (by phase) and of the timing service
+    "evaluation_url": "http://192.168.97.250:8001",
+    # Endpoint of the evaluation system accepting a list of labels, used when label_batch_size > 1
+    "evaluation_batch_url": "http://192.168.97.250:8001/batch",
+    "production_url": "http://192.168.97.250:8001",
+    "timing_url": "http://192.168.97.2:5555/",
+    # Maximum number of labels in a single post to the evaluation system; with more than 1
+    # the body of the post is a list, sent to evaluation_batch_url
+    "label_batch_size": 1,
+    # Label outbox: queued messages per endpoint, sending threads per endpoint, timeout (seconds) of a post,
+    # retries of a failed post and seconds before the first retry (doubled at each retry)
+    "outbox_queue_size": 10000,
+    "outbox_workers": 1,
+    "outbox_timeout": 1,
+    "outbox_retries": 3,
+    "outbox_backoff": 0.5
+}
+
+
+def load_config(path=CONFIG_PATH):
+    """
+    Loads the production system configuration, using the default value of every missing key.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path to the JSON configuration file.
+
+    Returns
+    -------
+    dict
+        The configuration.
+    """
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            config.update(json.load(file))
+    except FileNotFoundError:
+        print(f"Configuration file not found, using defaults: {path}")
+    except json.JSONDecodeError as e:
+        print(f"Error decoding configuration file, using defaults: {e}")
+    return config
+
+
+config = load_config()
+
+BATCH_SIZE = config["batch_size"]
+BATCH_TIMEOUT_MS = config["batch_timeout_ms"]
+SPOOL_SESSIONS = config["spool_sessions"]
+INFERENCE_WORKERS = config["inference_workers"]
+EVALUATION_URL = config["evaluation_url"]
+EVALUATION_BATCH_URL = config["evaluation_batch_url"]
+PRODUCTION_URL = config["production_url"]
+TIMING_URL = config["timing_url"]
+LABEL_BATCH_SIZE = config["label_batch_size"]
+OUTBOX_QUEUE_SIZE = config["outbox_queue_size"]
+OUTBOX_WORKERS = config["outbox_workers"]
+OUTBOX_TIMEOUT = config["outbox_timeout"]
+OUTBOX_RETRIES = config["outbox_retries"]
+OUTBOX_BACKOFF = config["outbox_backoff"]
@@ -2,11 +2,14 @@
 Production System Controller Module.
 """
 # pylint: disable=E0401
+import threading
 import time
-import requests
 import classifier_model_controller  # Module for handling the classifier model
 import prepare_session_handler  # Module for managing session preparation
 import label_handler  # Module for handling labels
+import production_config  # Configuration of the production system
+import inference_workers  # Pool of inference worker processes
+import session_queue  # Queue of the prepared sessions received by the Flask server
 
 # pylint: disable=C0301
 # Class to control the production system workflow
@@ -26,10 +29,20 @@ class ProductionSystemController:
             Receives a new session using the session handler and stores it for further classification tasks.
         run_classsification_task():
             Performs classification on the session request and initializes a LabelHandler with the resulting label.
+        run_classification_batch(requests_batch):
+            Classifies a micro-batch of session requests with a single prediction and initializes a LabelHandler for each label.
         send_label():
             Sends the label generated from classification to the appropriate system.
+        send_labels():
+            Sends the labels generated from the classification of a micro-batch.
         send_label_evaluation():
             Sends a label with the phase set to 'evaluation' for evaluation purposes.
+        send_timing(end_time):
+            Sends the classification time to the timing service.
+        run_with_workers():
+            Main loop classifying the micro-batches with the pool of inference worker processes.
+        collect_worker_results(pool):
+            Sends the labels of the batches classified by the inference workers.
         run():
             Starts the production system workflow, continuously handling incoming sessions, classifying them, and sending the resulting labels.
     """
@@ -37,6 +50,7 @@ class ProductionSystemController:
         self.classifier = None
         self.session = None
         self.label = None
+        self.labels = []
 
     def handle_classifier_model_deployment(self):
         """
@@ -54,8 +68,10 @@ class ProductionSystemController:
         This method initializes the prepare_session_handler and uses it to retrieve a new session message.
         The session is then stored for further classification tasks.
         """
-        while self.session.new_session() is False:
-            time.sleep(1)
+        # new_session waits (without polling) for a session to arrive, and returns False
+        # only if the session is malformed: in that case the next one is awaited
+        while self.session.new_session(timeout=None) is False:
+            pass
 
     def run_classsification_task(self):
         """
@@ -69,13 +85,39 @@ class ProductionSystemController:
         self.label = label_handler.LabelHandler(self.session.uuid, label)
         # Initialize a label handler with the classification label
 
+    def run_classification_batch(self, requests_batch):
+        """
+        Performs classification on a micro-batch of session requests.
+
+        All the sessions are classified with a single prediction of the model, then a label_handler
+        is initialized for each resulting label, in the same order of the requests.
+        """
+        if not requests_batch:
+            self.labels = []
+            return
+        labels = self.classifier.classify_batch(requests_batch)
+        self.labels = [label_handler.LabelHandler(request['uuid'], label)
+                       for request, label in zip(requests_batch, labels)]
+
+    def send_labels(self):
+        """
+        Sends the labels generated from the classification of a micro-batch.
+
+        The spooled copy of each session is released once its label is in the outbox.
+        """
+        for label in self.labels:
+            if label.send_label():
+                session_queue.session_done(label.uuid)
+
     def send_label(self):
         """
         Sends the label generated from classification.
         
         This method sends the generated label to the appropriate system (either evaluation or production).
+        The spooled copy of the session is released once the label is in the outbox.
         """
-        self.label.send_label()
+        if self.label.send_label():
+            session_queue.session_done(self.label.uuid)
 
     def send_label_evaluation(self):
         """
@@ -93,28 +135,82 @@ class ProductionSystemController:
         This method is the main loop of the production system. It continuously handles incoming sessions,
         classifies them using the classifier, and sends the resulting labels to the appropriate system.
         """
-        development = True
-        if development is False:
-            self.handle_classifier_model_deployment()
-
-        else:
-            while True:
-                self.handle_classifier_model_deployment()
+        # Wait for the first model; the following ones are swapped in background by the model registry
+        self.handle_classifier_model_deployment()
         self.session = prepare_session_handler.PrepareSessionHandler()  # Initialize session handler
+        if production_config.INFERENCE_WORKERS:
+            self.run_with_workers()
+            return
+        batching = production_config.BATCH_SIZE > 1
         while True:
             # Continuously handle incoming sessions and classify them
-            self.handle_prepared_session_reception()
-
-            start_time = time.time_ns()
-            self.run_classsification_task()
+            if batching:
+                # Collect up to BATCH_SIZE sessions (or for BATCH_TIMEOUT_MS) and classify them together
+                requests_batch = self.session.new_sessions(production_config.BATCH_SIZE,
+                                                           production_config.BATCH_TIMEOUT_MS)
+                start_time = time.time_ns()
+                self.run_classification_batch(requests_batch)
+            else:
+                self.handle_prepared_session_reception()
+                start_time = time.time_ns()
+                self.run_classsification_task()
             end_time = time.time_ns() - start_time
-            try:
-                requests.post("http://192.168.97.2:5555/",
-                json={'system':'production_system',
-                    'time':end_time,
-                    'end':True}, 
-                timeout=10)
-            except requests.exceptions.RequestException as e:
-                print(f"An error occurred while sending timestamp: {e}")
-
-            self.send_label()
+            self.send_timing(end_time)
+
+            if batching:
+                self.send_labels()
+            else:
+                self.send_label()
+
+    def send_timing(self, end_time):
+        """
+        Sends the classification time to the timing service, in background.
+
+        Parameters
+        ----------
+        end_time : int
+            Nanoseconds spent classifying.
+        """
+        label_handler.send_timing(end_time)
+
+    def run_with_workers(self):
+        """
+        Main loop of the production system with the inference worker processes.
+
+        The micro-batches of sessions are submitted to the pool of workers, which classify them in parallel;
+        the labels are sent by a separate thread as soon as each batch is classified.
+        """
+        pool = inference_workers.start_pool(production_config.INFERENCE_WORKERS)
+        threading.Thread(target=self.collect_worker_results, args=(pool,), daemon=True).start()
+        while True:
+            requests_batch = self.session.new_sessions(production_config.BATCH_SIZE,
+                                                       production_config.BATCH_TIMEOUT_MS)
+            if requests_batch:
+                # The batch is classified with the model active when it is submitted
+                pool.submit(requests_batch, self.classifier.registry.version)
+
+    def collect_worker_results(self, pool, timeout=inference_workers.HEARTBEAT_INTERVAL):
+        """
+        Sends the labels of the batches classified by the inference workers, restarting the dead workers.
+
+        Parameters
+        ----------
+        pool : inference_workers.InferenceWorkerPool
+            The pool of workers.
+        timeout : float, optional
+            Seconds to wait for a result before checking the health of the workers.
+        """
+        while True:
+            pool.check_workers()
+            result = pool.get_result(timeout)
+            if result is None:
+                continue
+            requests_batch, labels, end_time = result
+            if labels is None:
+                # The sessions stay in the spool (if enabled) and are classified again at the next start
+                print(f"Classification failed, sessions not labeled: {[request['uuid'] for request in requests_batch]}")
+                continue
+            self.send_timing(end_time)
+            for request, label in zip(requests_batch, labels):
+                if label_handler.LabelHandler(request['uuid'], label).send_label():
+                    session_queue.session_done(request['uuid'])
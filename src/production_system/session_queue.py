@@ -0,0 +1,129 @@
+"""
+This module contains the in-process queue between the Flask server, which receives the prepared sessions,
+and the production system controller, which classifies them.
+"""
+import json
+import os
+import queue
+import re
+import production_config
+
+# pylint: disable=C0301
+
+# Directory of the optional durability spool (one JSON file per session not yet taken by the controller)
+SESSION_DIR = os.path.join(os.path.dirname(__file__), 'session')
+
+# If True every received session is also written to SESSION_DIR, and recovered at the next start
+SPOOL_SESSIONS = production_config.SPOOL_SESSIONS
+
+# Accepted UUIDs: they name the spooled files, so they cannot contain path separators or dots
+UUID_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+_sessions = queue.Queue()
+
+
+def valid_uuid(uuid):
+    """
+    Returns True if uuid is a string in the accepted UUID format (see UUID_RE).
+    """
+    return isinstance(uuid, str) and UUID_RE.match(uuid) is not None
+
+
+def _spool_path(uuid):
+    if not valid_uuid(uuid):
+        raise ValueError(f"Invalid UUID: {uuid!r}")
+    return os.path.join(SESSION_DIR, f"{uuid}.json")
+
+
+def put_session(json_data):
+    """
+    Adds a prepared session to the queue.
+
+    Parameters
+    ----------
+    json_data : dict
+        The prepared session, it must contain the 'UUID' key.
+
+    Raises
+    ------
+    ValueError
+        If the UUID is not in the accepted format (see valid_uuid()).
+    """
+    if not valid_uuid(json_data['UUID']):
+        raise ValueError(f"Invalid UUID: {json_data['UUID']!r}")
+    if SPOOL_SESSIONS:
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        tmp_path = _spool_path(json_data['UUID']) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as file:
+            json.dump(json_data, file)
+        # the session is either fully written or not present at all
+        os.replace(tmp_path, _spool_path(json_data['UUID']))
+    _sessions.put(json_data)
+
+
+def get_session(timeout=None):
+    """
+    Takes the oldest prepared session from the queue, waiting for one to arrive.
+
+    Parameters
+    ----------
+    timeout : float, optional
+        Seconds to wait; None waits until a session arrives.
+
+    Returns
+    -------
+    dict or None
+        The session, or None if no session arrived within the timeout.
+    """
+    try:
+        return _sessions.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def session_done(uuid):
+    """
+    Removes the spooled copy of a session taken from the queue.
+
+    Parameters
+    ----------
+    uuid : str
+        The UUID of the session.
+    """
+    if SPOOL_SESSIONS and valid_uuid(uuid):
+        try:
+            os.remove(_spool_path(uuid))
+        except FileNotFoundError:
+            pass
+
+
+def recover_spool():
+    """
+    Puts back in the queue the sessions left in the spool directory by a previous run.
+    Must be called before the Flask server starts receiving sessions.
+
+    Returns
+    -------
+    int
+        The number of recovered sessions.
+    """
+    if not SPOOL_SESSIONS or not os.path.isdir(SESSION_DIR):
+        return 0
+    recovered = 0
+    for filename in sorted(os.listdir(SESSION_DIR)):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(SESSION_DIR, filename), 'r', encoding='utf-8') as file:
+                _sessions.put(json.load(file))
+            recovered += 1
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error recovering session {filename}: {e}")
+    return recovered
+
+
+def pending():
+    """
+    Returns the number of sessions waiting to be classified.
+    """
+    return _sessions.qsize()
@@ -6,34 +6,43 @@ This module contains the unit tests for the ClassifierModelController class.
 import unittest
 import ipaddress
 from unittest.mock import patch, mock_open, MagicMock
-from classifier_model_controller import ClassifierModelController, ip_to_float
+import numpy as np
+from classifier_model_controller import ClassifierModelController
+from utility.ip_codec import ip_to_float
+from model_registry import ModelRegistry
 
 
 class TestClassifierModelController(unittest.TestCase):
     """ 
     Unit tests for the ClassifierModelController class.
     """
-    @patch('classifier_model_controller.os.path.exists')
-    @patch('classifier_model_controller.joblib.load')
-    def test_init(self, mock_joblib_load, mock_path_exists):
+    def setUp(self):
+        """
+        Use a registry with an active model for every test.
+        """
+        self.registry = MagicMock(spec=ModelRegistry)
+        self.registry.on_load = None
+        self.registry.model = MagicMock()
+        self.registry.wait_for_model.return_value = True
+        self.registry.read.return_value.__enter__.return_value = self.registry.model
+
+    def test_init(self):
         """ 
         Test the initialization of the ClassifierModelController class.
         """
-        # Mock the existence of the model file
-        mock_path_exists.return_value = True
-        mock_joblib_load.return_value = MagicMock()
-
         # Initialize the controller
-        controller = ClassifierModelController()
+        controller = ClassifierModelController(self.registry)
 
-        # Check if the model is loaded
+        # Check if the registry loader was started and the model is available
+        self.registry.start.assert_called_once()
+        self.assertEqual(self.registry.on_load, controller.notify_deployment)
         self.assertIsNotNone(controller.model)
 
     @patch('classifier_model_controller.os.path.exists')
     @patch('classifier_model_controller.time.sleep')
     @patch('builtins.open', new_callable=mock_open,
         read_data='{"model_file": "model/classifier_model.joblib"}')
-    def test_get_hyperparameters(self, mock_path_exists):
+    def test_get_hyperparameters(self, mock_file, mock_sleep, mock_path_exists):
         """ 
         Test the get_hyperparameters method of the ClassifierModelController class.
         """
@@ -41,7 +50,7 @@ class TestClassifierModelController(unittest.TestCase):
         mock_path_exists.return_value = True
 
         # Initialize the controller
-        controller = ClassifierModelController()
+        controller = ClassifierModelController(self.registry)
 
         # Get hyperparameters
         hyperparameters = controller.get_hyperparameters()
@@ -49,40 +58,45 @@ class TestClassifierModelController(unittest.TestCase):
         # Check if the hyperparameters are correct
         self.assertEqual(hyperparameters['model_file'], 'model/classifier_model.joblib')
 
-    @patch('classifier_model_controller.os.path.exists')
-    @patch('classifier_model_controller.time.sleep')
-    @patch('classifier_model_controller.joblib.load')
-    def test_load_classifier(self, mock_joblib_load, mock_path_exists):
+    def test_load_classifier(self):
         """ 
         Test the load_classifier method of the ClassifierModelController class.
         """
-        # Mock the existence of the model file
-        mock_path_exists.return_value = True
-        mock_joblib_load.return_value = MagicMock()
+        # The first model arrives after a timeout
+        self.registry.wait_for_model.side_effect = [False, True, True]
 
         # Initialize the controller
-        controller = ClassifierModelController()
+        controller = ClassifierModelController(self.registry)
 
         # Load the classifier
         result = controller.load_classifier()
 
         # Check if the model is loaded
         self.assertTrue(result)
+        self.assertEqual(self.registry.wait_for_model.call_count, 3)
         self.assertIsNotNone(controller.model)
 
-    @patch('classifier_model_controller.os.path.exists')
-    @patch('classifier_model_controller.time.sleep')
-    @patch('classifier_model_controller.joblib.load')
-    def test_classify(self, mock_joblib_load, mock_path_exists):
+    @patch('classifier_model_controller.requests.post')
+    def test_notify_deployment(self, mock_post):
+        """
+        Test the notify_deployment method of the ClassifierModelController class.
+        """
+        controller = ClassifierModelController(self.registry)
+
+        controller.notify_deployment(1, 42)
+
+        mock_post.assert_called_once_with("http://192.168.97.2:5555/", json={
+            'system': 'production_system',
+            'time': 42,
+            'end': True
+        }, timeout=10)
+
+    def test_classify(self):
         """ 
         Test the classify method of the ClassifierModelController class.
         """
-        # Mock the existence of the model file
-        mock_path_exists.return_value = True
-        mock_joblib_load.return_value = MagicMock()
-
         # Initialize the controller
-        controller = ClassifierModelController()
+        controller = ClassifierModelController(self.registry)
 
         # Mock the model's predict method
         controller.model.predict = MagicMock(return_value=[1])
@@ -101,19 +115,15 @@ class TestClassifierModelController(unittest.TestCase):
 
         # Check if the classification result is correct
         self.assertEqual(result, [1])
+        # The model is used under the read lock of the registry
+        self.registry.read.assert_called_once()
 
-    @patch('classifier_model_controller.os.path.exists')
-    @patch('classifier_model_controller.joblib.load')
-    def test_get_classifier_model(self, mock_joblib_load, mock_path_exists):
+    def test_get_classifier_model(self):
         """ 
         Test the get_classifier_model method of the ClassifierModelController class.
         """
-        # Mock the existence of the model file
-        mock_path_exists.return_value = True
-        mock_joblib_load.return_value = MagicMock()
-
         # Initialize the controller
-        controller = ClassifierModelController()
+        controller = ClassifierModelController(self.registry)
 
         # Get the classifier model
         model = controller.get_classifier_model()
@@ -137,5 +147,60 @@ class TestClassifierModelController(unittest.TestCase):
         result = ip_to_float(ip)
         self.assertEqual(result, 0.0)
 
+    def test_classify_batch(self):
+        """
+        Test the classify_batch method: one prediction on a matrix with a row for each session.
+        """
+        self.registry.model = MagicMock(spec=['predict'])
+        self.registry.read.return_value.__enter__.return_value = self.registry.model
+        controller = ClassifierModelController(self.registry)
+        controller.model.predict.return_value = np.array([0, 2])
+
+        data = [{
+            'median_coordinates': [40.7128, -74.0060],
+            'mean_diff_time': 10.5,
+            'mean_diff_amount': 200.0,
+            'mean_target_ip': '192.168.1.1',
+            'mean_dest_ip': 'invalid_ip'
+        }, {
+            'median_coordinates': [1.0, 2.0],
+            'mean_diff_time': 3.0,
+            'mean_diff_amount': 4.0,
+            'mean_target_ip': '10.0.0.1',
+            'mean_dest_ip': '10.0.0.2'
+        }]
+
+        result = controller.classify_batch(data)
+
+        self.assertEqual(list(result), [0, 2])
+        controller.model.predict.assert_called_once()
+        features = controller.model.predict.call_args[0][0]
+        np.testing.assert_array_equal(features, [
+            [10.5, 200.0, -74.0060, 40.7128, ip_to_float('192.168.1.1'), 0.0],
+            [3.0, 4.0, 2.0, 1.0, ip_to_float('10.0.0.1'), ip_to_float('10.0.0.2')]
+        ])
+
+    def test_classify_batch_feature_order(self):
+        """
+        Test that classify_batch follows the feature order of the model, when the model knows it.
+        """
+        self.registry.model = MagicMock(spec=['predict', 'feature_names_in_'])
+        self.registry.read.return_value.__enter__.return_value = self.registry.model
+        controller = ClassifierModelController(self.registry)
+        controller.model.feature_names_in_ = np.array(
+            ['median_lat', 'median_long', 'mean_abs_diff_ts', 'mean_abs_diff_am', 'median_destIP', 'median_targetIP'])
+        controller.model.predict.return_value = np.array([1])
+
+        controller.classify_batch([{
+            'median_coordinates': [1.0, 2.0],
+            'mean_diff_time': 3.0,
+            'mean_diff_amount': 4.0,
+            'mean_target_ip': '0.0.0.0',
+            'mean_dest_ip': '255.255.255.255'
+        }])
+
+        features = controller.model.predict.call_args[0][0]
+        np.testing.assert_array_equal(features, [[1.0, 2.0, 3.0, 4.0, 1.0, 0.0]])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,41 @@
+"""
+Unit tests for the entry point of the production system.
+"""
+# pylint: disable=E0401
+
+import os
+import subprocess
+import sys
+import unittest
+
+PRODUCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs the entry point as "python src/production_system/__init__.py" does (only its directory
+# on sys.path), without starting the system, and prints where the modules have been loaded from
+LAUNCH = f"""
+import sys, runpy
+sys.path[0] = {PRODUCTION_DIR!r}
+runpy.run_path({os.path.join(PRODUCTION_DIR, '__init__.py')!r}, run_name='launch')
+import classifier_model_controller, label_handler
+print(classifier_model_controller.ips_to_float.__module__)
+print(label_handler.OutboundDispatcher.__module__)
+"""
+
+
+class TestEntryPoint(unittest.TestCase):
+    """
+    Unit tests for the launch of the production system as a script.
+    """
+
+    def test_launch_as_script(self):
+        """
+        Test that the modules shared with the other systems are importable when launched as a script.
+        """
+        result = subprocess.run([sys.executable, "-c", LAUNCH], capture_output=True, text=True,
+                                timeout=60, check=False, cwd=os.path.dirname(PRODUCTION_DIR))
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split()[-2:], ["utility.ip_codec", "comms.outbound_dispatcher"])
+
+if __name__ == '__main__':
+    unittest.main()
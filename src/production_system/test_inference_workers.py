@@ -0,0 +1,139 @@
+"""
+Unit tests for the inference_workers module.
+"""
+# pylint: disable=E0401
+
+import unittest
+import os
+import queue
+import tempfile
+from unittest.mock import patch
+import joblib
+import numpy as np
+from sklearn.dummy import DummyClassifier
+import inference_workers
+from inference_workers import InferenceWorkerPool
+
+SESSION = {
+    'uuid': '1',
+    'median_coordinates': [1.0, 2.0],
+    'mean_diff_time': 3.0,
+    'mean_diff_amount': 4.0,
+    'mean_target_ip': '10.0.0.1',
+    'mean_dest_ip': '10.0.0.2'
+}
+
+
+class TestInferenceWorkers(unittest.TestCase):
+    """
+    Unit tests for the inference worker processes.
+    """
+
+    def setUp(self):
+        """
+        Stage a constant classifier as version 1 in a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        model = DummyClassifier(strategy='constant', constant=2).fit(np.zeros((2, 6)), [2, 0])
+        joblib.dump(model, os.path.join(self.tmp_dir.name, 'v000001.joblib'))
+
+    def run_worker(self, tasks):
+        """
+        Runs the worker loop in this process on the given tasks, followed by the stop task.
+        """
+        task_queue, results = queue.Queue(), queue.Queue()
+        for task in tasks + [None]:
+            task_queue.put(task)
+        heartbeats, processed, versions, current = [0.0], [0], [-1], [-1]
+        inference_workers._worker(0, self.tmp_dir.name, task_queue, results,  # pylint: disable=W0212
+                                  heartbeats, processed, versions, current)
+        self.assertGreater(heartbeats[0], 0)
+        self.assertEqual(processed[0], len(tasks))
+        self.assertEqual(current[0], -1)
+        return [results.get_nowait() for _ in tasks], versions[0]
+
+    def test_worker(self):
+        """
+        Test that the worker loads the requested model version and classifies the batch.
+        """
+        results, version = self.run_worker([(7, 1, [SESSION, SESSION])])
+
+        self.assertEqual(results[0][:2], (7, [2, 2]))
+        self.assertEqual(version, 1)
+
+    def test_worker_missing_model(self):
+        """
+        Test that a batch is reported as failed when its model version is not available.
+        """
+        results, version = self.run_worker([(0, 2, [SESSION])])
+
+        self.assertEqual(results[0][:2], (0, None))
+        self.assertEqual(version, -1)
+
+    def test_worker_keeps_loaded_model(self):
+        """
+        Test that the loaded model is used when the requested version has been removed.
+        """
+        results, version = self.run_worker([(0, 1, [SESSION]), (1, 2, [SESSION])])
+
+        self.assertEqual(results[1][:2], (1, [2]))
+        self.assertEqual(version, 1)
+
+    def test_worker_survives_any_error(self):
+        """
+        Test that an unexpected error (here a corrupt model file) fails only its batch.
+        """
+        with open(os.path.join(self.tmp_dir.name, 'v000002.joblib'), 'wb') as f:
+            f.write(b'not a model')
+        results, version = self.run_worker([(0, 2, [SESSION]), (1, 1, [SESSION])])
+
+        self.assertEqual(results[0][:2], (0, None))
+        self.assertEqual(results[1][:2], (1, [2]))
+        self.assertEqual(version, 1)
+
+    def test_pool_gives_up_poison_batch(self):
+        """
+        Test that a batch killing its worker is resubmitted at most MAX_RESUBMITS times, then reported as failed.
+        """
+        pool = InferenceWorkerPool(1, self.tmp_dir.name)
+        self.addCleanup(pool.close)
+        pool.processes[0].terminate()
+        pool.processes[0].join()
+        batch_id = pool.submit([SESSION], 1)
+        pool.tasks.get(timeout=60)
+
+        # The worker stays dead: every check finds it died while classifying the batch
+        with patch.object(pool, '_start_worker'):
+            for _ in range(inference_workers.MAX_RESUBMITS):
+                pool.current[0] = batch_id
+                self.assertEqual(pool.check_workers(), 1)
+                self.assertEqual(pool.tasks.get(timeout=60)[0], batch_id)
+            pool.current[0] = batch_id
+            pool.check_workers()
+
+        self.assertEqual(pool.get_result(timeout=60), ([SESSION], None, 0))
+        self.assertTrue(pool.tasks.empty())
+        self.assertEqual(pool.pending(), 0)
+
+    def test_pool(self):
+        """
+        Test a pool of worker processes: classification, health report and stop.
+        """
+        pool = InferenceWorkerPool(1, self.tmp_dir.name)
+        self.addCleanup(pool.close)
+
+        pool.submit([SESSION], 1)
+        requests_batch, labels, _ = pool.get_result(timeout=60)
+
+        self.assertEqual(requests_batch, [SESSION])
+        self.assertEqual(labels, [2])
+        self.assertEqual(pool.pending(), 0)
+        self.assertEqual(pool.check_workers(), 0)
+        health = pool.health()
+        self.assertTrue(health[0]['healthy'])
+        self.assertEqual(health[0]['model_version'], 1)
+        self.assertEqual(health[0]['processed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,151 +4,160 @@ Unit tests for the JSON I/O module.
 # pylint: disable=E0401
 
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
-import os
+from unittest.mock import patch
+import io
 import json
-from json_io import ModelUpload, SessionUpload, FlaskServer
+import os
+import queue
+import tempfile
+import joblib
+import session_queue
+from model_registry import ModelRegistry
+from json_io import ModelRollback, FlaskServer
 
 class TestModelUpload(unittest.TestCase):
     """ 
     Unit tests for the ModelUpload resource.
     """
 
-    @patch('json_io.request')
-    @patch('json_io.os.makedirs')
-    @patch('json_io.open', new_callable=mock_open)
-    def test_post_model_file(self, mock_makedirs, mock_request):
+    def setUp(self):
+        """
+        Use a test client and a model registry in a temporary directory for every test.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.registry = ModelRegistry(model_dir=self.tmp_dir.name)
+        patcher = patch('json_io.model_registry.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = FlaskServer().app.test_client()
+
+    def test_post_model_file(self):
         """ 
-        Test the post method of the ModelUpload resource.
+        Test that an uploaded model is staged in the model registry as a new version.
         """
-        # Mock the request to contain a file
-        mock_request.files = {'file': MagicMock()}
-        mock_request.files['file'].filename = 'classifier_model.joblib'
+        model = io.BytesIO()
+        joblib.dump({'weights': [1, 2]}, model)
+        model.seek(0)
 
-        # Create an instance of the resource
-        resource = ModelUpload()
+        response = self.client.post('/upload_model', data={'file': (model, 'classifier_model.joblib')},
+                                    content_type='multipart/form-data')
 
-        # Call the post method
-        response = resource.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json(), {'message': 'Model saved successfully', 'version': 1})
+        self.assertEqual(os.listdir(self.registry.versions_dir), ['v000001.joblib'])
+        self.assertTrue(self.registry.load_staged())
+        self.assertEqual(self.registry.model, {'weights': [1, 2]})
 
-        # Check if the file was saved correctly
-        mock_makedirs.assert_called_once_with(
-            os.path.join('src', 'production_system', 'model'), exist_ok=True)
-        mock_request.files['file'].save.assert_called_once_with(
-            os.path.join('src', 'production_system', 'model', 'classifier_model.joblib'))
+    def test_post_unsupported_format(self):
+        """ 
+        Test that a model in an unsupported format is refused and not staged.
+        """
+        response = self.client.post('/upload_model', data={'file': (io.BytesIO(b'model'), 'model.pkl')},
+                                    content_type='multipart/form-data')
 
-        # Check the response
-        self.assertEqual(response, ({'message': 'Model saved successfully'}, 201))
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(os.path.exists(self.registry.versions_dir))
 
-    @patch('json_io.request')
-    def test_post_no_file(self, mock_request):
+    def test_post_no_file(self):
         """ 
         Test the post method of the ModelUpload resource when no file is present.
         """
-        # Mock the request to not contain a file
-        mock_request.files = {}
+        response = self.client.post('/upload_model', data={}, content_type='multipart/form-data')
 
-        # Create an instance of the resource
-        resource = ModelUpload()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'No file part in the request'})
+
+class TestModelRollback(unittest.TestCase):
+    """
+    Unit tests for the ModelRollback resource.
+    """
+
+    @patch('json_io.model_registry.registry.rollback')
+    def test_post_rollback(self, mock_rollback):
+        """
+        Test the post method of the ModelRollback resource.
+        """
+        mock_rollback.side_effect = [1, None]
 
-        # Call the post method
-        response = resource.post()
+        resource = ModelRollback()
 
-        # Check the response
-        self.assertEqual(response, ({'error': 'No file part in the request'}, 400))
+        self.assertEqual(resource.post(), ({'message': 'Model restored', 'version': 1}, 200))
+        self.assertEqual(resource.post(), ({'error': 'No previous model to restore'}, 409))
 
 class TestSessionUpload(unittest.TestCase):
     """
     Unit tests for the SessionUpload resource.
     """
 
-    @patch('json_io.request')
-    @patch('json_io.os.makedirs')
-    @patch('json_io.open', new_callable=mock_open)
-    def test_post_session_data(self, mock_makedirs, mock_request):
-        """ 
-        Test the post method of the SessionUpload resource.
+    def setUp(self):
+        """
+        Use a test client, an empty session queue and a temporary spool directory for every test.
         """
-        # Mock the request to contain JSON data
-        mock_request.is_json = True
-        mock_request.get_data.return_value = json.dumps({
-            'UUID': '12345',
-            'data': 'example_data'
-        })
-
-        # Create an instance of the resource
-        resource = SessionUpload()
-
-        # Call the post method
-        response = resource.post()
-
-        # Check if the file was saved correctly
-        mock_makedirs.assert_called_once_with(
-            os.path.join('src', 'production_system', 'session'), exist_ok=True)
-        mock_open().assert_called_once_with(
-            os.path.join('src', 'production_system', 'session', '12345.json'), 'w', encoding='utf8')
-        mock_open().write.assert_called_once_with(json.dumps({
-            'UUID': '12345',
-            'data': 'example_data'
-        }))
-
-        # Check the response
-        self.assertEqual(response, ({'message': 'Session saved'}, 201))
-
-    @patch('json_io.request')
-    def test_post_invalid_json(self, mock_request):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        patchers = [
+            patch('session_queue._sessions', queue.Queue()),
+            patch('session_queue.SESSION_DIR', self.tmp_dir.name),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = FlaskServer().app.test_client()
+
+    def test_post_session_data(self):
         """ 
-        Test the post method of the SessionUpload resource with invalid JSON data.
+        Test that an uploaded session is passed to the controller through the session queue.
         """
-        # Mock the request to contain invalid JSON data
-        mock_request.is_json = True
-        mock_request.get_data.return_value = 'invalid_json'
+        session = {'UUID': '12345', 'data': 'example_data'}
 
-        # Create an instance of the resource
-        resource = SessionUpload()
+        response = self.client.post('/upload_session', json=session)
 
-        # Call the post method
-        response = resource.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json(), {'message': 'Session saved'})
+        self.assertEqual(session_queue.pending(), 1)
+        self.assertEqual(session_queue.get_session(timeout=0), session)
 
-        # Check the response
-        self.assertEqual(response, ({'error': 'Invalid JSON format'}, 400))
+    def test_post_invalid_json(self):
+        """ 
+        Test the post method of the SessionUpload resource with invalid JSON data.
+        """
+        response = self.client.post('/upload_session', data='invalid_json', content_type='application/json')
 
-    @patch('json_io.request')
-    def test_post_missing_uuid(self, mock_request):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'Invalid JSON format'})
+        self.assertEqual(session_queue.pending(), 0)
+
+    def test_post_missing_uuid(self):
         """ 
         Test the post method of the SessionUpload resource with missing UUID.
         """
-        # Mock the request to contain JSON data without UUID
-        mock_request.is_json = True
-        mock_request.get_data.return_value = json.dumps({
-            'data': 'example_data'
-        })
+        response = self.client.post('/upload_session', json={'data': 'example_data'})
 
-        # Create an instance of the resource
-        resource = SessionUpload()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'Missing required field: UUID'})
+        self.assertEqual(session_queue.pending(), 0)
 
-        # Call the post method
-        response = resource.post()
+    def test_post_invalid_uuid(self):
+        """ 
+        Test the post method of the SessionUpload resource with a UUID which is not a plain name.
+        """
+        response = self.client.post('/upload_session', json={'UUID': '../../escape', 'data': 'example_data'})
 
-        # Check the response
-        self.assertEqual(response, ({'error': 'Missing required field: UUID'}, 400))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'Invalid UUID'})
+        self.assertEqual(session_queue.pending(), 0)
 
-    @patch('json_io.request')
-    def test_post_unsupported_media_type(self, mock_request):
+    def test_post_unsupported_media_type(self):
         """ 
         Test the post method of the SessionUpload resource with unsupported media type.
         """
-        # Mock the request to not contain JSON data
-        mock_request.is_json = False
-
-        # Create an instance of the resource
-        resource = SessionUpload()
-
-        # Call the post method
-        response = resource.post()
+        response = self.client.post('/upload_session', data=json.dumps({'UUID': '12345'}),
+                                    content_type='text/plain')
 
-        # Check the response
-        self.assertEqual(response, ({'error': 'Unsupported media type'}, 415))
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(response.get_json(), {'error': 'Unsupported media type'})
+        self.assertEqual(session_queue.pending(), 0)
 
 class TestFlaskServer(unittest.TestCase):
     """ 
@@ -5,8 +5,14 @@ This module contains the unit tests for the LabelHandler class.
 
 import unittest
 from unittest.mock import patch, MagicMock
+import label_handler
 from label_handler import LabelHandler
-import requests
+import production_config
+from utility.json_validation import validate_json_data_file
+
+# Schemas of the labels accepted by the evaluation system, one at a time or in a batch
+EVAL_LABEL_SCHEMA = "evaluation_system/schemas/eval_label_input_schema.json"
+EVAL_LABEL_BATCH_SCHEMA = "evaluation_system/schemas/eval_label_batch_schema.json"
 
 class TestLabelHandler(unittest.TestCase):
     """ 
@@ -58,59 +64,152 @@ class TestLabelHandler(unittest.TestCase):
         }
         self.assertEqual(handler.label, expected_label)
 
-    @patch('label_handler.requests.post')
-    def test_send_label_evaluation(self, mock_post):
+    @patch('label_handler.outbox')
+    def test_send_label_evaluation(self, mock_outbox):
         """ 
         Test the send_label method of the LabelHandler class with the evaluation phase.
         """
-        # Mock the post request
-        mock_post.return_value = MagicMock(status_code=200)
+        mock_outbox.return_value.send.return_value = True
 
         # Create an instance of LabelHandler
         handler = LabelHandler(uuid="12345", label=1)
 
         # Send the label to the evaluation phase
+        result = handler.send_label(phase='evaluation')
+
+        # Check if the label was queued in the outbox for the evaluation endpoint
+        mock_outbox.return_value.send.assert_called_once_with(
+            production_config.EVALUATION_URL, handler.label)
+        self.assertTrue(result)
+
+    @patch('label_handler.production_config.LABEL_BATCH_SIZE', 2)
+    @patch('label_handler.outbox')
+    def test_send_label_evaluation_batch(self, mock_outbox):
+        """ 
+        Test that with a label batch size greater than 1 the label goes to the batch endpoint.
+        """
+        handler = LabelHandler(uuid="12345", label=1)
+
         handler.send_label(phase='evaluation')
 
-        # Check if the post request was made with the correct parameters
-        mock_post.assert_called_once_with('http://192.168.97.2:8001', json=handler.label, timeout=1)
+        mock_outbox.return_value.send.assert_called_once_with(
+            production_config.EVALUATION_BATCH_URL, handler.label)
 
-    @patch('label_handler.requests.post')
-    def test_send_label_production(self, mock_post):
+    @patch('label_handler.outbox')
+    def test_send_label_production(self, mock_outbox):
         """ 
         Test the send_label method of the LabelHandler class with the production phase.
         """
-        # Mock the post request
-        mock_post.return_value = MagicMock(status_code=200)
-
         # Create an instance of LabelHandler
         handler = LabelHandler(uuid="12345", label=1)
 
         # Send the label to the production phase
         handler.send_label(phase='production')
 
-        # Check if the post request was made with the correct parameters
-        mock_post.assert_called_once_with('http://192.168.97.2:8001', json=handler.label, timeout=1)
+        # Check if the label was queued in the outbox for the production endpoint
+        mock_outbox.return_value.send.assert_called_once_with(
+            production_config.PRODUCTION_URL, handler.label)
 
-    @patch('label_handler.requests.post')
-    def test_send_label_request_exception(self, mock_post):
+    @patch('label_handler._outbox', None)
+    @patch('label_handler.production_config.LABEL_BATCH_SIZE', 1)
+    @patch('comms.outbound_dispatcher.requests.Session.post')
+    def test_outbox_single_labels(self, mock_post):
         """ 
-        Test the send_label method of the LabelHandler class with a request exception.
+        Test that with a label batch size of 1 each label is posted alone to the single label endpoint.
         """
-        # Mock the post request to raise an exception
-        mock_post.side_effect = requests.exceptions.RequestException
+        mock_post.return_value = MagicMock(status_code=200)
+
+        LabelHandler(uuid="1", label=0).send_label()
+        label_handler.outbox().flush()
+
+        mock_post.assert_called_once()
+        self.assertEqual(mock_post.call_args.args[0], production_config.EVALUATION_URL)
+        self.assertTrue(validate_json_data_file(mock_post.call_args.kwargs['json'], EVAL_LABEL_SCHEMA))
+
+    @patch('label_handler._outbox', None)
+    @patch('label_handler.production_config.LABEL_BATCH_SIZE', 1)
+    @patch('comms.outbound_dispatcher.time.sleep')
+    @patch('comms.outbound_dispatcher.requests.Session.post')
+    def test_outbox_retry_after(self, mock_post, mock_sleep):
+        """
+        Test that a label refused with 429 (evaluation queue full) is retried after the Retry-After delay.
+        """
+        mock_post.side_effect = [MagicMock(status_code=429, headers={'Retry-After': '2'}),
+                                 MagicMock(status_code=503, headers={}),
+                                 MagicMock(status_code=429, headers={'Retry-After': '86400'}),
+                                 MagicMock(status_code=200)]
+
+        LabelHandler(uuid="1", label=0).send_label()
+        label_handler.outbox().flush()
+
+        self.assertEqual(mock_post.call_count, 4)
+        # Retry-After is honored, otherwise the exponential backoff is used
+        self.assertEqual(mock_sleep.call_args_list[0].args[0], 2.0)
+        self.assertEqual(mock_sleep.call_args_list[1].args[0], production_config.OUTBOX_BACKOFF * 2)
+        # A very long Retry-After is capped
+        self.assertEqual(mock_sleep.call_args_list[2].args[0], label_handler.outbox().max_retry_after)
+        self.assertLessEqual(label_handler.outbox().max_retry_after, 60.0)
+        self.assertEqual(label_handler.outbox().stats['sent'], 1)
+        self.assertEqual(label_handler.outbox().stats['failed'], 0)
+
+    @patch('label_handler._outbox', None)
+    @patch('label_handler.production_config.LABEL_BATCH_SIZE', 1)
+    @patch('comms.outbound_dispatcher.requests.Session.post')
+    def test_outbox_survives_errors(self, mock_post):
+        """
+        Test that an unexpected error while posting fails only its message, the outbox keeps sending.
+        """
+        mock_post.side_effect = [TypeError("Object of type bytes is not JSON serializable"),
+                                 MagicMock(status_code=200)]
+
+        with patch('builtins.print'):
+            LabelHandler(uuid="1", label=0).send_label()
+            LabelHandler(uuid="2", label=0).send_label()
+            label_handler.outbox().flush()
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(mock_post.call_args.kwargs['json']['session_id'], "2")
+        self.assertEqual(label_handler.outbox().stats['failed'], 1)
+        self.assertEqual(label_handler.outbox().stats['sent'], 1)
+
+    @patch('label_handler.outbox')
+    def test_send_label_outbox_full(self, mock_outbox):
+        """ 
+        Test the send_label method of the LabelHandler class when the outbox is full.
+        """
+        mock_outbox.return_value.send.return_value = False
 
         # Create an instance of LabelHandler
         handler = LabelHandler(uuid="12345", label=1)
 
-        # Send the label to the evaluation phase
-        result = handler.send_label(phase='evaluation')
+        # The label is dropped without waiting
+        self.assertFalse(handler.send_label(phase='evaluation'))
 
-        # Check if the post request was made with the correct parameters
-        mock_post.assert_called_once_with('http://192.168.97.2:8001', json=handler.label, timeout=1)
+    @patch('label_handler._outbox', None)
+    @patch('label_handler.production_config.LABEL_BATCH_SIZE', 2)
+    @patch('comms.outbound_dispatcher.requests.Session.post')
+    def test_outbox(self, mock_post):
+        """ 
+        Test that the outbox sends the labels in background, in batches, and the timing data alone.
+        """
+        mock_post.return_value = MagicMock(status_code=200)
 
-        # Check if the result is None (indicating an exception was handled)
-        self.assertIsNone(result)
+        for uuid in ["1", "2"]:
+            LabelHandler(uuid=uuid, label=0).send_label()
+        label_handler.send_timing(42)
+        label_handler.outbox().flush()
+
+        bodies = [call.kwargs['json'] for call in mock_post.call_args_list]
+        labels = [label for body in bodies if isinstance(body, list) for label in body]
+        self.assertEqual([label['session_id'] for label in labels], ["1", "2"])
+        self.assertTrue(all(len(body) <= 2 for body in bodies if isinstance(body, list)))
+        # The lists go only to the batch endpoint, in the format it accepts
+        for call in mock_post.call_args_list:
+            if isinstance(call.kwargs['json'], list):
+                self.assertEqual(call.args[0], production_config.EVALUATION_BATCH_URL)
+                self.assertTrue(validate_json_data_file(call.kwargs['json'], EVAL_LABEL_BATCH_SCHEMA))
+        self.assertIn({'system': 'production_system', 'time': 42, 'end': True}, bodies)
+        self.assertEqual(label_handler.outbox().stats['failed'], 0)
 
 if __name__ == '__main__':
     unittest.main()
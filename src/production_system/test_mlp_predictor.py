@@ -0,0 +1,90 @@
+"""
+Unit tests for the MLPPredictor class.
+"""
+# pylint: disable=E0401
+
+import unittest
+import os
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+from sklearn.neural_network import MLPClassifier
+from development_system.model_export import export_mlp
+from mlp_predictor import MLPPredictor
+from classifier_model_controller import FEATURE_NAMES, predict
+
+
+class TestMLPPredictor(unittest.TestCase):
+    """
+    Unit tests for the NumPy forward pass of the MLP classifiers exported by the development system.
+    """
+
+    def setUp(self):
+        """
+        Random training and test sets with the features of a session.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'model.npz')
+        rng = np.random.default_rng(0)
+        self.train = rng.normal(size=(300, len(FEATURE_NAMES)))
+        self.test = rng.normal(size=(1000, len(FEATURE_NAMES)))
+        self.rng = rng
+
+    def fit(self, n_classes, activation, as_dataframe=False):
+        """
+        Fits a small MLP classifier, exports it and loads it back as MLPPredictor.
+        """
+        labels = self.rng.integers(0, n_classes, len(self.train))
+        train = pd.DataFrame(self.train, columns=FEATURE_NAMES) if as_dataframe else self.train
+        with warnings.catch_warnings():
+            # pochi passi di addestramento: il modello non converge
+            warnings.simplefilter('ignore')
+            classifier = MLPClassifier(hidden_layer_sizes=(8, 4), activation=activation,
+                                       max_iter=50, random_state=0).fit(train, labels)
+        export_mlp(classifier, self.path)
+        return classifier, MLPPredictor.load(self.path)
+
+    def test_same_predictions(self):
+        """
+        Test that the predictions are the ones of sklearn, for every hidden activation.
+        """
+        for activation in ['identity', 'logistic', 'tanh', 'relu']:
+            with self.subTest(activation=activation):
+                classifier, predictor = self.fit(3, activation)
+                np.testing.assert_array_equal(predictor.predict(self.test), classifier.predict(self.test))
+                np.testing.assert_allclose(predictor.predict_proba(self.test),
+                                           classifier.predict_proba(self.test), rtol=1e-12)
+
+    def test_binary(self):
+        """
+        Test a binary classifier, which has a single logistic output neuron.
+        """
+        classifier, predictor = self.fit(2, 'relu')
+
+        self.assertEqual(predictor.out_activation, 'logistic')
+        np.testing.assert_array_equal(predictor.predict(self.test), classifier.predict(self.test))
+
+    def test_feature_names(self):
+        """
+        Test that the feature names of a classifier trained on a DataFrame are kept,
+        so the columns are given to the network in the training order.
+        """
+        classifier, predictor = self.fit(3, 'relu', as_dataframe=True)
+
+        self.assertEqual(list(predictor.feature_names_in_), FEATURE_NAMES)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            expected = classifier.predict(self.test)
+        np.testing.assert_array_equal(predict(predictor, self.test), expected)
+
+    def test_unsupported_activation(self):
+        """
+        Test that an unknown activation is refused when the predictor is created.
+        """
+        with self.assertRaises(ValueError):
+            MLPPredictor([np.zeros((6, 1))], [np.zeros(1)], 'swish', 'logistic', np.arange(2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""
+Unit tests for the model_registry module.
+"""
+# pylint: disable=E0401
+
+import unittest
+from unittest.mock import patch, MagicMock
+import os
+import shutil
+import tempfile
+import threading
+import joblib
+import numpy as np
+from model_registry import ModelRegistry, ReadWriteLock
+from mlp_predictor import MLPPredictor
+
+
+class ModelFile:
+    """
+    Minimal stand-in for an uploaded file: saves a picklable object with joblib.
+    """
+    def __init__(self, obj):
+        self.obj = obj
+
+    def save(self, path):
+        """
+        Saves the object to path.
+        """
+        joblib.dump(self.obj, path)
+
+
+class TestModelRegistry(unittest.TestCase):
+    """
+    Unit tests for the ModelRegistry class.
+    """
+
+    def setUp(self):
+        """
+        Use a temporary model directory for every test.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.registry = ModelRegistry(model_dir=self.tmp_dir.name)
+
+    def test_stage(self):
+        """
+        Test that staged models get increasing versions and no temporary file is left.
+        """
+        self.assertEqual(self.registry.stage(ModelFile('a')), 1)
+        self.assertEqual(self.registry.stage(ModelFile('b')), 2)
+        self.assertEqual(sorted(os.listdir(self.registry.versions_dir)), ['v000001.joblib', 'v000002.joblib'])
+
+    def test_stage_unsupported_format(self):
+        """
+        Test that a model with an unknown extension is refused.
+        """
+        with self.assertRaises(ValueError):
+            self.registry.stage(ModelFile('a'), '.pkl')
+
+    def test_load_staged(self):
+        """
+        Test that the latest staged model is activated and the previous one kept for rollback.
+        """
+        on_load = MagicMock()
+        self.registry.on_load = on_load
+        self.assertFalse(self.registry.load_staged())
+
+        self.registry.stage(ModelFile('a'))
+        self.assertTrue(self.registry.load_staged())
+        self.registry.stage(ModelFile('b'))
+        self.assertTrue(self.registry.load_staged())
+        self.assertFalse(self.registry.load_staged())
+
+        self.assertEqual(self.registry.model, 'b')
+        self.assertEqual((self.registry.previous_model, self.registry.previous_version), ('a', 1))
+        self.assertEqual(on_load.call_count, 2)
+
+        # Only the active and the previous versions are kept on disk
+        self.registry.stage(ModelFile('c'))
+        self.registry.load_staged()
+        self.assertEqual(sorted(os.listdir(self.registry.versions_dir)), ['v000002.joblib', 'v000003.joblib'])
+
+    def test_load_npz(self):
+        """
+        Test that a model exported as NumPy arrays is loaded with MLPPredictor.
+        """
+        path = os.path.join(self.tmp_dir.name, 'model.npz')
+        np.savez(path, layer_sizes=np.array([2, 1]), weights=np.array([1.0, -1.0, 0.0]),
+                 activations=np.array(['relu', 'logistic']), classes=np.array([0, 1]))
+        model_file = MagicMock()
+        model_file.save.side_effect = lambda dst: shutil.copyfile(path, dst)
+
+        self.assertEqual(self.registry.stage(model_file, '.npz'), 1)
+        self.assertTrue(self.registry.load_staged())
+
+        self.assertIsInstance(self.registry.model, MLPPredictor)
+        np.testing.assert_array_equal(self.registry.model.predict(np.array([[2.0, 1.0], [1.0, 2.0]])), [1, 0])
+
+    @patch('model_registry.LOADERS', {'.joblib': MagicMock(side_effect=EOFError)})
+    def test_load_invalid_model(self):
+        """
+        Test that a model which cannot be loaded is discarded and the active one is kept.
+        """
+        self.registry.activate('a', 1)
+        self.registry.stage(ModelFile('b'))
+
+        self.assertFalse(self.registry.load_staged())
+        self.assertEqual(self.registry.model, 'a')
+        self.assertEqual(os.listdir(self.registry.versions_dir), [])
+
+    def test_rollback(self):
+        """
+        Test that rollback swaps the active and the previous model.
+        """
+        self.assertIsNone(self.registry.rollback())
+        self.registry.activate('a', 1)
+        self.registry.activate('b', 2)
+
+        self.assertEqual(self.registry.rollback(), 1)
+        with self.registry.read() as model:
+            self.assertEqual(model, 'a')
+        self.assertEqual(self.registry.rollback(), 2)
+        self.assertEqual(self.registry.model, 'b')
+
+    def test_stage_after_rollback(self):
+        """
+        Test that a rolled back version is not activated again by the loader, while a newly staged one is.
+        """
+        self.registry.stage(ModelFile('a'))
+        self.registry.load_staged()
+        self.registry.stage(ModelFile('b'))
+        self.registry.load_staged()
+        self.assertEqual(self.registry.rollback(), 1)
+
+        self.assertFalse(self.registry.load_staged())
+        self.assertEqual(self.registry.stage(ModelFile('c')), 3)
+        self.assertTrue(self.registry.load_staged())
+        self.assertEqual((self.registry.model, self.registry.previous_model), ('c', 'a'))
+
+    def test_rollback_survives_restart(self):
+        """
+        Test that the version active after a rollback is the one loaded by the next run.
+        """
+        self.registry.stage(ModelFile('a'))
+        self.registry.load_staged()
+        self.registry.stage(ModelFile('b'))
+        self.registry.load_staged()
+        self.registry.rollback()
+
+        registry = ModelRegistry(model_dir=self.tmp_dir.name)
+        registry.start()
+        self.assertTrue(registry.wait_for_model(timeout=5))
+        self.assertEqual((registry.model, registry.version), ('a', 1))
+        self.assertFalse(registry.load_staged())
+        self.assertEqual(registry.stage(ModelFile('c')), 3)
+
+    @patch('model_registry.LOADERS', {'.joblib': MagicMock(side_effect=[ModuleNotFoundError('sklearn'), 'b'])})
+    def test_background_loader_survives_errors(self):
+        """
+        Test that the background loader keeps running after a model fails to load.
+        """
+        self.registry.start()
+        self.registry.stage(ModelFile('a'))
+        self.assertFalse(self.registry.wait_for_model(timeout=0.5))
+
+        self.registry.stage(ModelFile('b'))
+        self.assertTrue(self.registry.wait_for_model(timeout=5))
+        self.assertEqual(self.registry.model, 'b')
+
+    def test_background_loader(self):
+        """
+        Test that the background loader activates the staged models and wakes up the waiting threads.
+        """
+        self.registry.start()
+        self.assertFalse(self.registry.wait_for_model(timeout=0.01))
+
+        self.registry.stage(ModelFile('a'))
+        self.assertTrue(self.registry.wait_for_model(timeout=5))
+        self.assertEqual(self.registry.model, 'a')
+
+    def test_start_loads_previous_run(self):
+        """
+        Test that a model staged by a previous run is loaded at start.
+        """
+        self.registry.stage(ModelFile('a'))
+
+        registry = ModelRegistry(model_dir=self.tmp_dir.name)
+        registry.start()
+        self.assertTrue(registry.wait_for_model(timeout=5))
+        self.assertEqual((registry.model, registry.version), ('a', 1))
+
+        registry.clear()
+        self.assertEqual(os.listdir(registry.versions_dir), [])
+        self.assertFalse(os.path.exists(registry.state_path))
+
+
+class TestReadWriteLock(unittest.TestCase):
+    """
+    Unit tests for the ReadWriteLock class.
+    """
+
+    def test_writer_waits_for_readers(self):
+        """
+        Test that a writer waits for the readers holding the lock, and readers share it.
+        """
+        lock = ReadWriteLock()
+        written = threading.Event()
+
+        def write():
+            with lock.write():
+                written.set()
+
+        with lock.read():
+            with lock.read():
+                writer = threading.Thread(target=write)
+                writer.start()
+                self.assertFalse(written.wait(0.05))
+        self.assertTrue(written.wait(5))
+        writer.join()
+
+if __name__ == '__main__':
+    unittest.main()
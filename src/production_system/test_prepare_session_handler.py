@@ -4,8 +4,7 @@ This module contains the unit tests for the PrepareSessionHandler class.
 # pylint: disable=E0401
 
 import unittest
-from unittest.mock import patch, mock_open
-import os
+from unittest.mock import patch
 from prepare_session_handler import PrepareSessionHandler
 
 class TestPrepareSessionHandler(unittest.TestCase):
@@ -13,19 +12,17 @@ class TestPrepareSessionHandler(unittest.TestCase):
     Unit tests for the PrepareSessionHandler class.
     """
 
-    @patch('prepare_session_handler.os.path.exists')
-    @patch('prepare_session_handler.os.listdir')
-    @patch('prepare_session_handler.time.sleep')
-    @patch('builtins.open', new_callable=mock_open,
-        read_data='{"UUID": "12345", "median_lat": 40.7128, "median_long": -74.0060}')
-    @patch('prepare_session_handler.os.remove')
-    def test_new_session(self, mock_remove, mock_listdir, mock_path_exists):
+    @patch('prepare_session_handler.session_queue.session_done')
+    @patch('prepare_session_handler.session_queue.get_session')
+    def test_new_session(self, mock_get_session, mock_session_done):
         """ 
         Test the new_session method of the PrepareSessionHandler class.
         """
-        # Mock the existence of the directory and files
-        mock_path_exists.return_value = True
-        mock_listdir.side_effect = [['session.json'], ['session.json'], []]
+        # Mock a session waiting in the queue
+        mock_get_session.return_value = {
+            "UUID": "12345", "median_lat": 40.7128, "median_long": -74.0060,
+            "mean_abs_diff_ts": 1.0, "mean_abs_diff_am": 2.0,
+            "median_targetIP": "192.168.1.1", "median_destIP": "192.168.1.2"}
 
         # Initialize the handler
         handler = PrepareSessionHandler()
@@ -37,44 +34,37 @@ class TestPrepareSessionHandler(unittest.TestCase):
         self.assertTrue(result)
         self.assertEqual(handler.uuid, "12345")
         self.assertEqual(handler.median_coordinates, [40.7128, -74.0060])
+        self.assertEqual(handler.mean_target_ip, "192.168.1.1")
 
-        # Check if the file was removed
-        mock_remove.assert_called_once_with(
-            os.path.join(os.path.dirname(__file__), 'session', 'session.json'))
+        # Check if the spooled copy is kept until the label is sent
+        mock_get_session.assert_called_once_with(None)
+        mock_session_done.assert_not_called()
 
-    @patch('prepare_session_handler.os.path.exists')
-    @patch('prepare_session_handler.os.listdir')
-    @patch('prepare_session_handler.time.sleep')
-    def test_new_session_no_files(self, mock_listdir, mock_path_exists):
+    @patch('prepare_session_handler.session_queue.get_session')
+    def test_new_session_no_session(self, mock_get_session):
         """     
-        Test the new_session method of the PrepareSessionHandler class when no files are present.
+        Test the new_session method of the PrepareSessionHandler class when no session arrives in time.
         """
-        # Mock the existence of the directory but no files
-        mock_path_exists.return_value = True
-        mock_listdir.return_value = []
+        # Mock an empty queue
+        mock_get_session.return_value = None
 
         # Initialize the handler
         handler = PrepareSessionHandler()
 
         # Call the new_session method
-        result = handler.new_session()
+        result = handler.new_session(timeout=0.1)
 
         # Check if the session was not processed
         self.assertFalse(result)
         self.assertIsNone(handler.uuid)
-        self.assertIsNone(handler.median_coordinates)
+        mock_get_session.assert_called_once_with(0.1)
 
-    @patch('prepare_session_handler.os.path.exists')
-    @patch('prepare_session_handler.os.listdir')
-    @patch('prepare_session_handler.time.sleep')
-    @patch('builtins.open', new_callable=mock_open, read_data='{}')
-    def test_new_session_empty_file(self, mock_listdir, mock_path_exists):
+    @patch('prepare_session_handler.session_queue.get_session')
+    def test_new_session_empty_message(self, mock_get_session):
         """     
-        Test the new_session method of the PrepareSessionHandler class when the file is empty.
+        Test the new_session method of the PrepareSessionHandler class when the message is empty.
         """
-        # Mock the existence of the directory and an empty file
-        mock_path_exists.return_value = True
-        mock_listdir.side_effect = [['session.json'], ['session.json'], []]
+        mock_get_session.return_value = {}
 
         # Initialize the handler
         handler = PrepareSessionHandler()
@@ -85,19 +75,15 @@ class TestPrepareSessionHandler(unittest.TestCase):
         # Check if the session was not processed
         self.assertFalse(result)
         self.assertIsNone(handler.uuid)
-        self.assertIsNone(handler.median_coordinates)
+        self.assertEqual(handler.median_coordinates, [None, None])
 
-    @patch('prepare_session_handler.os.path.exists')
-    @patch('prepare_session_handler.os.listdir')
-    @patch('prepare_session_handler.time.sleep')
-    @patch('builtins.open', new_callable=mock_open, read_data='{"UUID": "12345"}')
-    def test_new_session_missing_coordinates(self, mock_listdir, mock_path_exists):
+    @patch('prepare_session_handler.session_queue.session_done')
+    @patch('prepare_session_handler.session_queue.get_session')
+    def test_new_session_missing_coordinates(self, mock_get_session, mock_session_done):
         """
         Test the new_session method of the PrepareSessionHandler class when coordinates are missing.
         """
-        # Mock the existence of the directory and a file missing coordinates
-        mock_path_exists.return_value = True
-        mock_listdir.side_effect = [['session.json'], ['session.json'], []]
+        mock_get_session.return_value = {"UUID": "12345"}
 
         # Initialize the handler
         handler = PrepareSessionHandler()
@@ -108,7 +94,48 @@ class TestPrepareSessionHandler(unittest.TestCase):
         # Check if the session was not processed
         self.assertFalse(result)
         self.assertEqual(handler.uuid, "12345")
-        self.assertIsNone(handler.median_coordinates)
+        self.assertEqual(handler.median_coordinates, [None, None])
+        # A malformed session is never classified, its spooled copy is released
+        mock_session_done.assert_called_once_with("12345")
+
+    @patch('prepare_session_handler.session_queue.session_done')
+    @patch('prepare_session_handler.session_queue.get_session')
+    def test_new_sessions(self, mock_get_session, mock_session_done):
+        """
+        Test the new_sessions method: collects sessions until the batch is full, skipping malformed ones.
+        """
+        session = {"median_lat": 1.0, "median_long": 2.0, "mean_abs_diff_ts": 3.0,
+                   "mean_abs_diff_am": 4.0, "median_targetIP": "10.0.0.1", "median_destIP": "10.0.0.2"}
+        mock_get_session.side_effect = [dict(session, UUID="1"), {"UUID": "bad"},
+                                        dict(session, UUID="2"), dict(session, UUID="3")]
+
+        handler = PrepareSessionHandler()
+        batch = handler.new_sessions(max_sessions=2, max_wait_ms=1000)
+
+        self.assertEqual([request['uuid'] for request in batch], ["1", "2"])
+        self.assertEqual(batch[1]['median_coordinates'], [1.0, 2.0])
+        self.assertEqual(mock_get_session.call_count, 3)
+        # the first session is waited for, the following ones only until the deadline
+        self.assertEqual(mock_get_session.call_args_list[0], ((),))
+        self.assertLessEqual(mock_get_session.call_args_list[1][0][0], 1.0)
+        # Only the malformed session is released from the spool
+        mock_session_done.assert_called_once_with("bad")
+
+    @patch('prepare_session_handler.session_queue.session_done')
+    @patch('prepare_session_handler.session_queue.get_session')
+    def test_new_sessions_timeout(self, mock_get_session, mock_session_done):
+        """
+        Test the new_sessions method when no more sessions arrive before the deadline.
+        """
+        session = {"UUID": "1", "median_lat": 1.0, "median_long": 2.0, "mean_abs_diff_ts": 3.0,
+                   "mean_abs_diff_am": 4.0, "median_targetIP": "10.0.0.1", "median_destIP": "10.0.0.2"}
+        mock_get_session.side_effect = [session, None]
+
+        handler = PrepareSessionHandler()
+        batch = handler.new_sessions(max_sessions=256, max_wait_ms=10)
+
+        self.assertEqual(len(batch), 1)
+        self.assertEqual(batch[0]['uuid'], "1")
 
     def test_get_data(self):
         """ 
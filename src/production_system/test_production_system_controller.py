@@ -48,9 +48,10 @@ class TestProductionSystemController(unittest.TestCase):
         # Call the method
         controller.handle_prepared_session_reception()
 
-        # Check if the session handler was called correctly
+        # Check that a malformed session is skipped by waiting for the next one, without sleeping
         self.assertEqual(mock_session_handler.new_session.call_count, 2)
-        mock_sleep.assert_called_once_with(1)
+        mock_session_handler.new_session.assert_called_with(timeout=None)
+        mock_sleep.assert_not_called()
 
     @patch('production_system_controller.classifier_model_controller.ClassifierModelController')
     @patch('production_system_controller.prepare_session_handler.PrepareSessionHandler')
@@ -84,8 +85,61 @@ class TestProductionSystemController(unittest.TestCase):
         mock_label_handler.assert_called_once_with(mock_session_handler.uuid, 1)
         self.assertEqual(controller.label, mock_label_handler)
 
+    @patch('production_system_controller.session_queue.session_done')
     @patch('production_system_controller.label_handler.LabelHandler')
-    def test_send_label(self, mock_label_handler):
+    def test_run_classification_batch(self, mock_label_handler, mock_session_done):
+        """
+        Test the run_classification_batch method of the ProductionSystemController class.
+        """
+        controller = ProductionSystemController()
+        controller.classifier = MagicMock()
+        controller.classifier.classify_batch.return_value = [0, 2]
+        mock_label_handler.return_value.send_label.side_effect = [True, False]
+        mock_label_handler.return_value.uuid = '1'
+        requests_batch = [{'uuid': '1'}, {'uuid': '2'}]
+
+        controller.run_classification_batch(requests_batch)
+
+        # One prediction for the whole batch, one label handler for each session
+        controller.classifier.classify_batch.assert_called_once_with(requests_batch)
+        self.assertEqual(mock_label_handler.call_args_list, [(('1', 0),), (('2', 2),)])
+        self.assertEqual(len(controller.labels), 2)
+
+        controller.send_labels()
+        self.assertEqual(mock_label_handler.return_value.send_label.call_count, 2)
+        # The session of the label dropped by the outbox stays in the spool
+        mock_session_done.assert_called_once_with('1')
+
+    @patch('builtins.print')
+    @patch('production_system_controller.session_queue.session_done')
+    @patch('production_system_controller.label_handler.send_timing')
+    @patch('production_system_controller.label_handler.LabelHandler')
+    def test_collect_worker_results(self, mock_label_handler, mock_send_timing, mock_session_done, mock_print):
+        """
+        Test the collect_worker_results method of the ProductionSystemController class.
+        """
+        pool = MagicMock()
+        # A timeout, a failed batch, a classified batch, then stop the loop
+        pool.get_result.side_effect = [None, ([{'uuid': '0'}], None, 1),
+                                       ([{'uuid': '1'}, {'uuid': '2'}], [0, 2], 5), StopIteration]
+
+        controller = ProductionSystemController()
+        with self.assertRaises(StopIteration):
+            controller.collect_worker_results(pool)
+
+        # The workers are checked before waiting for each result
+        self.assertEqual(pool.check_workers.call_count, 4)
+        # The sessions of the failed batch are reported
+        self.assertIn("['0']", mock_print.call_args_list[0].args[0])
+        self.assertEqual(mock_label_handler.call_args_list, [(('1', 0),), (('2', 2),)])
+        self.assertEqual(mock_label_handler.return_value.send_label.call_count, 2)
+        mock_send_timing.assert_called_once_with(5)
+        # Only the sessions whose label reached the outbox leave the spool
+        self.assertEqual(mock_session_done.call_args_list, [(('1',),), (('2',),)])
+
+    @patch('production_system_controller.session_queue.session_done')
+    @patch('production_system_controller.label_handler.LabelHandler')
+    def test_send_label(self, mock_label_handler, mock_session_done):
         """ 
         Test the send_label method of the ProductionSystemController class.
         """
@@ -99,8 +153,9 @@ class TestProductionSystemController(unittest.TestCase):
         # Call the method
         controller.send_label()
 
-        # Check if the label was sent
+        # Check if the label was sent and the session released from the spool
         mock_label_handler.send_label.assert_called_once()
+        mock_session_done.assert_called_once_with(mock_label_handler.uuid)
 
     @patch('production_system_controller.label_handler.LabelHandler')
     def test_send_label_evaluation(self, mock_label_handler):
@@ -120,26 +175,19 @@ class TestProductionSystemController(unittest.TestCase):
         # Check if the label was sent with the evaluation phase
         mock_label_handler.send_label.assert_called_once_with('evaluation')
 
-    @patch('production_system_controller.requests.post')
+    @patch('production_system_controller.production_config.INFERENCE_WORKERS', 0)
+    @patch('production_system_controller.production_config.BATCH_SIZE', 1)
+    @patch('production_system_controller.label_handler.send_timing')
     @patch('production_system_controller.classifier_model_controller.ClassifierModelController')
     @patch('production_system_controller.prepare_session_handler.PrepareSessionHandler')
-    @patch('production_system_controller.time.time_ns', side_effect=[1, 2, 3, 4])
+    @patch('production_system_controller.time.time_ns', side_effect=[1, 2])
     def test_run(
-        self, mock_prepare_session_handler, mock_classifier_model_controller, mock_requests_post):
+        self, mock_time_ns, mock_prepare_session_handler, mock_classifier_model_controller, mock_send_timing):
         """ 
         Test the run method of the ProductionSystemController class.
         """
-        # Mock the classifier model controller
-        mock_classifier = mock_classifier_model_controller.return_value
-
-        # Mock the session handler
-        mock_session_handler = mock_prepare_session_handler.return_value
-        mock_session_handler.new_session.side_effect = [True, False]
-
         # Initialize the controller
         controller = ProductionSystemController()
-        controller.classifier = mock_classifier
-        controller.session = mock_session_handler
 
         # Mock the methods
         controller.handle_classifier_model_deployment = MagicMock()
@@ -147,27 +195,18 @@ class TestProductionSystemController(unittest.TestCase):
         controller.run_classsification_task = MagicMock()
         controller.send_label = MagicMock()
 
-        # Call the method
+        # Call the method: the second classification stops the loop (no more timestamps)
         with self.assertRaises(StopIteration):
             controller.run()
 
         # Check if the methods were called correctly
         controller.handle_classifier_model_deployment.assert_called_once()
-        controller.handle_prepared_session_reception.assert_called_once()
+        self.assertEqual(controller.handle_prepared_session_reception.call_count, 2)
         controller.run_classsification_task.assert_called_once()
         controller.send_label.assert_called_once()
 
-        # Check if the requests were sent correctly
-        mock_requests_post.assert_any_call("192.168.97.2:5555/", json={
-            'system': 'production_system',
-            'time': 1,
-            'end': True
-        }, timeout=10)
-        mock_requests_post.assert_any_call("192.168.97.2:5555/", json={
-            'system': 'production_system',
-            'time': 1,
-            'end': True
-        }, timeout=10)
+        # Check if the timing was queued in the outbox
+        mock_send_timing.assert_called_once_with(1)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+"""
+Unit tests for the session_queue module.
+"""
+# pylint: disable=E0401
+
+import unittest
+from unittest.mock import patch
+import os
+import queue
+import tempfile
+import threading
+import session_queue
+
+class TestSessionQueue(unittest.TestCase):
+    """
+    Unit tests for the in-process session queue.
+    """
+
+    def setUp(self):
+        """
+        Use an empty queue and a temporary spool directory for every test.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        patchers = [
+            patch('session_queue._sessions', queue.Queue()),
+            patch('session_queue.SESSION_DIR', self.tmp_dir.name),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_put_get_session(self):
+        """
+        Test that sessions are returned in arrival order, without touching the filesystem.
+        """
+        session_queue.put_session({'UUID': '1'})
+        session_queue.put_session({'UUID': '2'})
+
+        self.assertEqual(session_queue.pending(), 2)
+        self.assertEqual(session_queue.get_session(), {'UUID': '1'})
+        self.assertEqual(session_queue.get_session(), {'UUID': '2'})
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_get_session_timeout(self):
+        """
+        Test that get_session returns None when no session arrives within the timeout.
+        """
+        self.assertIsNone(session_queue.get_session(timeout=0.01))
+
+    def test_get_session_wakes_up(self):
+        """
+        Test that a waiting get_session returns as soon as a session is put in the queue.
+        """
+        timer = threading.Timer(0.05, session_queue.put_session, args=({'UUID': '1'},))
+        timer.start()
+        self.assertEqual(session_queue.get_session(timeout=5), {'UUID': '1'})
+        timer.join()
+
+    @patch('session_queue.SPOOL_SESSIONS', True)
+    def test_invalid_uuid(self):
+        """
+        Test that a session whose UUID is not a plain name is refused before anything is written.
+        """
+        for uuid in ['../escape', '/tmp/abs', 'a/b', '..', '', 'a.b', 12345, None]:
+            with self.subTest(uuid=uuid):
+                self.assertFalse(session_queue.valid_uuid(uuid))
+                with self.assertRaises(ValueError):
+                    session_queue.put_session({'UUID': uuid})
+        session_queue.session_done('../escape')
+
+        self.assertTrue(session_queue.valid_uuid('a923-45b7-gh12-8902'))
+        self.assertEqual(session_queue.pending(), 0)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    @patch('session_queue.SPOOL_SESSIONS', True)
+    def test_spool_and_recover(self):
+        """
+        Test that spooled sessions are removed when done and recovered otherwise.
+        """
+        session_queue.put_session({'UUID': '1'})
+        session_queue.put_session({'UUID': '2'})
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['1.json', '2.json'])
+
+        session_queue.session_done(session_queue.get_session()['UUID'])
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['2.json'])
+
+        # Simulate a restart: the queue is lost, the spool is not
+        with patch('session_queue._sessions', queue.Queue()):
+            self.assertEqual(session_queue.recover_spool(), 1)
+            self.assertEqual(session_queue.get_session(timeout=0), {'UUID': '2'})
+
+    def test_recover_without_spool(self):
+        """
+        Test that nothing is recovered when the spool is disabled.
+        """
+        self.assertEqual(session_queue.recover_spool(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,12 +8,15 @@ from typing import Callable
 import requests
 from flask_restful import Resource
 from utility import data_folder
+from utility.json_validation import preload_schemas
 from comms import ServerREST
 from comms.json_transfer_api import ReceiveJsonApi
 
 # Define the paths to the input folder and the configuration file
 FILE_PATH = os.path.join(data_folder, 'segregation_system', 'input')
 CONFIG_PATH = os.path.join(data_folder, 'segregation_system', 'config', 'segregation_config.json')
+# Route of the development system receiving the learning sets as a file
+LEARNING_SETS_FILE_ROUTE = '/learning_sets'
 
 class HealthCheckApi(Resource):
     """
@@ -38,6 +41,8 @@ class CommunicationController:
             self.ip_address = config["segregationSystemIpAddress"]
             self.port = config["segregationSystemPort"]
             self.development_system_url = config["developmentSystemEndpoint"]
+            # format of the learning sets: JSON, or NumPy arrays with JSON as fallback
+            self.learning_sets_format = config.get("learningSetsFormat", "json")
             self.server = None
             self.check = config["checkServerEndpoint"]
 
@@ -63,6 +68,10 @@ class CommunicationController:
         :return: None
         """
 
+        # Compile the schema now, so that validating the received JSON does not read it from disk
+        if json_schema_path is not None:
+            preload_schemas(json_schema_path)
+
         # Initialize the REST server
         self.server = ServerREST()
 
@@ -107,15 +116,15 @@ class CommunicationController:
         :param learning_sets: path to the learning sets file.
         """
 
-        # try to open the learning sets file and send the data to the development system
+        # try to open the learning sets file and send the data to the development system;
+        # the file is already JSON, so it is streamed as it is instead of being loaded in memory
         try:
-            with open(learning_sets, 'r', encoding="UTF-8") as file:
-                data = json.load(file)
-
-            response = requests.post(
-                self.development_system_url, json=data,
-                timeout=20
-            )
+            with open(learning_sets, 'rb') as file:
+                response = requests.post(
+                    self.development_system_url, data=file,
+                    headers={'Content-Type': 'application/json'},
+                    timeout=20
+                )
 
             # print an error message if the request fails
             if not response.ok:
@@ -126,3 +135,25 @@ class CommunicationController:
         except requests.exceptions.RequestException as ex:
             # print an error message if the request fails
             print(f'Error during the send of the learning sets: {ex}')
+
+    def send_learning_sets_file(self, learning_sets) -> bool:
+        """
+        Function used to send the learning sets to the development system as a file (NumPy arrays).
+        A development system that does not accept the file refuses it, and the learning sets
+        have to be sent as JSON.
+        :param learning_sets: path to the learning sets file.
+        :return: True if the development system has received the learning sets, False otherwise.
+        """
+        url = self.development_system_url.rstrip('/') + LEARNING_SETS_FILE_ROUTE
+        try:
+            with open(learning_sets, 'rb') as file:
+                response = requests.post(url, files={'file': file}, timeout=20)
+        except requests.exceptions.RequestException as ex:
+            print(f'Error during the send of the learning sets file: {ex}')
+            return False
+
+        if not response.ok:
+            print(f'Learning sets file refused ({response.status_code}), sending them as JSON')
+            return False
+        print("Learning sets sent as NumPy arrays")
+        return True
@@ -57,6 +57,20 @@ class DataExtractor:
         data = self.db.read_sql(fquery)
         return data
 
+    def extract_columns(self):
+        """
+        This method extracts all the data from the database with a single query, column by column.
+        :return: data: dictionary with the name of each column and the NumPy array of its values
+        """
+        cquery = """
+        SELECT * FROM prepared_sessions WHERE to_process = 1;
+        """
+
+        data = self.db.fetch_columns(cquery)
+        data.pop('to_process', None)
+
+        return data
+
     def extract_all(self):
         """
         This method extracts all the data from the database.
@@ -1,26 +1,29 @@
 """
 This module is responsible for generating the learning sets for the development system.
 """
-import ipaddress
 import json
 import os
-import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 from utility import data_folder
+from utility.ip_codec import ips_to_float
 from segregation_system.DataExtractor import DataExtractor
 
 # Path to the parameters file and the output file
 PARAMETERS_PATH = os.path.join(data_folder, 'segregation_system', 'config', 'learning_sets_parameters.json')
 FILE_PATH = os.path.join(data_folder, 'segregation_system', 'sets', 'all_sets.json')
-
-def ip_to_float(ip_string):
-    """
-    Convert an IP address string to a normalized float.
-    """
-    try:
-        return float(int(ipaddress.ip_address(ip_string))) / float(int(ipaddress.ip_address("255.255.255.255")))
-    except ValueError:
-        return 0.0  # Return 0.0 if the IP is invalid
+NPZ_FILE_PATH = os.path.join(data_folder, 'segregation_system', 'sets', 'all_sets.npz')
+
+# Numerical value of each label
+LABEL_MAPPING = {
+    "normal": 0,
+    "moderate": 1,
+    "high": 2
+}
+# Number of sessions converted to JSON at a time when the learning sets are saved
+CHUNK_SIZE = 10000
+# Compact JSON, without spaces after the separators
+SEPARATORS = (',', ':')
 
 class LearningSetsParameters:
     """
@@ -52,14 +55,19 @@ class LearningSetsParameters:
 class LearningSet:
     """
     This class is responsible for storing the learning sets.
+    The sessions are stored only once, each set is an array with the indices of its sessions.
     """
-    def __init__(self, training_set, validation_set, test_set):
+    def __init__(self, features, labels, training_set, validation_set, test_set):
         """
         Constructor for the LearningSet class.
-        :param training_set: data structure that stores the training set
-        :param validation_set: data structure that stores the validation set
-        :param test_set: data structure that stores the test set
+        :param features: dictionary with the name of each feature and the array of its values
+        :param labels: array with the numerical label of each session
+        :param training_set: indices of the sessions of the training set
+        :param validation_set: indices of the sessions of the validation set
+        :param test_set: indices of the sessions of the test set
         """
+        self.features = features
+        self.labels = labels
         self.training_set = training_set
         self.validation_set = validation_set
         self.test_set = test_set
@@ -83,14 +91,14 @@ class LearningSetsController:
     def _process_ip_columns(self, data):
         """
         Detects IP-related columns, converts them to normalized floats.
-        :param data: Input dataframe with potential IP columns.
-        :return: Processed dataframe with normalized IP values.
+        :param data: Input dataframe (or dictionary of columns) with potential IP columns.
+        :return: Processed data with normalized IP values.
         """
-        ip_columns = [col for col in data.columns if 'ip' in col.lower()]
+        ip_columns = [col for col in data if 'ip' in col.lower()]
 
         for col in ip_columns:
-            # Convert IP addresses to normalized floats using the ip_to_float function
-            data[col] = data[col].apply(ip_to_float)
+            # Convert IP addresses to normalized floats, parsing each distinct address once
+            data[col] = ips_to_float(data[col])
 
         return data
 
@@ -100,73 +108,99 @@ class LearningSetsController:
         :return: learning sets
         """
 
-        # Extract the data and the labels from the database.
-        input_data = self.data_extractor.extract_all()
-        input_labels = self.data_extractor.extract_labels()
+        # Extract the data and the labels from the database, with a single query.
+        input_data = self.data_extractor.extract_columns()
+        input_labels = input_data.pop('label')
 
-        # Convert the labels to numerical values.
-        label_mapping = {
-            "normal": 0,
-            "moderate": 1,
-            "high": 2
-        }
-        input_labels = input_labels.replace(label_mapping)
+        # Convert the labels to numerical values, mapping each distinct label once.
+        uniques, inverse = np.unique(input_labels.astype(str), return_inverse=True)
+        input_labels = np.array([LABEL_MAPPING.get(label, label) for label in uniques], dtype=object)[inverse]
         input_data = self._process_ip_columns(input_data)
 
         # Generate the training set and the temporary set that will be split into the validation and test sets.
+        # Only the indices of the sessions are split, the data is not copied.
         test_length = 1.0 - self.parameters.train_percentage
-        x_train, x_tmp, y_train, y_tmp = train_test_split(
-            input_data, input_labels, stratify=input_labels, test_size=test_length
+        train_indices, tmp_indices = train_test_split(
+            np.arange(len(input_labels)), stratify=input_labels, test_size=test_length
         )
 
         # Split the temporary set into the validation and test sets.
-        x_validation = x_tmp[:len(x_tmp) // 3]
-        x_test = x_tmp[len(x_tmp) // 3:]
-        y_validation = y_tmp[:len(y_tmp) // 3]
-        y_test = y_tmp[len(y_tmp) // 3:]
-
-        # Combine features and labels for the training set
-        training_set = pd.DataFrame(x_train)
-        training_set['label'] = y_train
+        validation_indices = tmp_indices[:len(tmp_indices) // 3]
+        test_indices = tmp_indices[len(tmp_indices) // 3:]
 
-        # Combine features and labels for the validation set
-        validation_set = pd.DataFrame(x_validation)
-        validation_set['label'] = y_validation
+        # Return the learning sets
+        return LearningSet(input_data, input_labels, train_indices, validation_indices, test_indices)
 
-        # Combine features and labels for the test set
-        test_set = pd.DataFrame(x_test)
-        test_set['label'] = y_test
+    @staticmethod
+    def _feature_names(sets):
+        """
+        Returns the names of the features of the learning sets ('uuid' and 'label' are not features).
+        :param sets: learning sets
+        :return: list of names
+        """
+        return [name for name in sets.features if name not in ('uuid', 'label')]
 
-        # Return the learning sets
-        return LearningSet(training_set, validation_set, test_set)
+    @staticmethod
+    def _set_indices(sets):
+        """
+        Returns the name and the indices of the sessions of each learning set.
+        :param sets: learning sets
+        :return: list of (name, indices)
+        """
+        return [("training_set", sets.training_set),
+                ("validation_set", sets.validation_set),
+                ("test_set", sets.test_set)]
 
-    def save_sets(self):
+    def save_sets(self, sets=None):
         """
         This method is responsible for saving the learning sets to a JSON file.
+        The file is written a chunk of sessions at a time, without building the whole JSON in memory.
+        :param sets: learning sets to save, generated if not given
         """
-        sets = self.generate_sets()
-
-        # Drop 'uuid' and 'label' from features
-        training_features = sets.training_set.drop(columns=['uuid', 'label'], errors='ignore')
-        validation_features = sets.validation_set.drop(columns=['uuid', 'label'], errors='ignore')
-        test_features = sets.test_set.drop(columns=['uuid', 'label'], errors='ignore')
-
-        # Create a dictionary to store all sets
-        all_sets = {
-            "training_set": {
-                "features": training_features.to_dict(orient='records'),
-                "labels": sets.training_set['label'].to_list()
-            },
-            "validation_set": {
-                "features": validation_features.to_dict(orient='records'),
-                "labels": sets.validation_set['label'].to_list()
-            },
-            "test_set": {
-                "features": test_features.to_dict(orient='records'),
-                "labels": sets.test_set['label'].to_list()
-            }
-        }
-
-        # Save the dictionary as a single JSON file
+        if sets is None:
+            sets = self.generate_sets()
+
+        feature_names = self._feature_names(sets)
+
         with open(FILE_PATH, 'w', encoding="UTF-8") as f:
-            json.dump(all_sets, f, indent='\t')
+            f.write('{')
+            for i, (set_name, indices) in enumerate(self._set_indices(sets)):
+                if i > 0:
+                    f.write(',')
+                f.write(json.dumps(set_name) + ':{"features":[')
+                for start in range(0, len(indices), CHUNK_SIZE):
+                    chunk = indices[start:start + CHUNK_SIZE]
+                    columns = [sets.features[name][chunk].tolist() for name in feature_names]
+                    records = [dict(zip(feature_names, values)) for values in zip(*columns)]
+                    if start > 0:
+                        f.write(',')
+                    # the records of the chunk, without the brackets of the list
+                    f.write(json.dumps(records, separators=SEPARATORS)[1:-1])
+                f.write('],"labels":')
+                f.write(json.dumps(sets.labels[indices].tolist(), separators=SEPARATORS))
+                f.write('}')
+            f.write('}')
+
+    def save_sets_npz(self, sets=None):
+        """
+        This method is responsible for saving the learning sets to a NumPy .npz file,
+        a compact alternative to the JSON file: the names of the features and, for each set,
+        the features as a float32 matrix (a row for each session) and the labels as int8.
+        :param sets: learning sets to save, generated if not given
+        :raise ValueError: if a feature or a label is not numerical
+        """
+        if sets is None:
+            sets = self.generate_sets()
+
+        feature_names = self._feature_names(sets)
+        arrays = {'feature_names': np.array(feature_names, dtype=str)}
+        for set_name, indices in self._set_indices(sets):
+            features = np.empty((len(indices), len(feature_names)), dtype=np.float32)
+            for column, name in enumerate(feature_names):
+                features[:, column] = sets.features[name][indices]
+            arrays[f'{set_name}_features'] = features
+            arrays[f'{set_name}_labels'] = np.array(sets.labels[indices].tolist(), dtype=np.int8)
+
+        # a file object keeps np.savez from appending a second .npz extension
+        with open(NPZ_FILE_PATH, 'wb') as f:
+            np.savez(f, **arrays)
@@ -5,7 +5,6 @@ coming from the preparation system.
 
 import json
 import os
-import pandas as pd
 from db_sqlite3 import DatabaseController
 from utility.json_validation import validate_json_data_file
 from utility import data_folder, project_root
@@ -14,6 +13,9 @@ DATABASE_PATH = os.path.join(project_root, 'src', 'segregation_system', 'segrega
 SCHEMA_PATH = os.path.join(data_folder,
                            'segregation_system', 'schemas', 'prepared_session_schema.json'
                           )
+# Fields of a prepared session, in the order of the columns of the prepared_sessions table
+SESSION_FIELDS = ["UUID", "label", "mean_abs_diff_ts", "mean_abs_diff_am",
+                  "median_long", "median_lat", "median_targetIP", "median_destIP"]
 
 
 class PreparedSessionController:
@@ -35,25 +37,85 @@ class PreparedSessionController:
         SELECT COUNT(*) FROM prepared_sessions WHERE to_process = 1;
         """
 
-        return self.db.read_sql(query).iloc[0, 0]
+        return self.db.fetch_scalar(query, default=0)
 
     def store(self, path, to_process):
         """
         Store a prepared session in the database.
         :param path: the path of the json file that contain the prepared session to store
         :param to_process: a boolean that indicates if the session is to process or not
+        :return: False if any error has occurred, True otherwise
         """
         # Load the json file
         with open(path, "r", encoding="UTF-8") as f:
             sessions = json.load(f)
 
-        # Validate the json file
-        if not validate_json_data_file(sessions, SCHEMA_PATH):
-            return False
+        return self.store_many([sessions], to_process) >= 0
 
-        # Create a dataframe from the json file
-        df = pd.DataFrame([sessions])
-        df["to_process"] = to_process
+    def create_tables(self):
+        """
+        Create (if they do not exist) the table of the prepared sessions
+        and the table with the collection state of the segregation system.
+        :return: False if any error has occurred, True otherwise
+        """
+        create_table_query = """
+                CREATE TABLE IF NOT EXISTS prepared_sessions (
+                    uuid TEXT PRIMARY KEY,
+                    label TEXT,
+                    mean_abs_diff_ts REAL,
+                    mean_abs_diff_am REAL,
+                    median_long REAL,
+                    median_lat REAL,
+                    median_targetIP TEXT,
+                    median_destIP TEXT,
+                    to_process BOOLEAN
+                );
+                """
+        # a single row: 1 while the system is collecting sessions (wait_sessions), 0 otherwise
+        create_state_query = """
+                CREATE TABLE IF NOT EXISTS segregation_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    collecting BOOLEAN
+                );
+                """
+        return self.db.create_table(create_table_query, []) and \
+            self.db.create_table(create_state_query, [])
+
+    def set_collecting(self, collecting):
+        """
+        Store whether the system is collecting sessions: the sessions received meanwhile
+        are stored as to process, the others are processed in the next collection.
+        :param collecting: True if the system is waiting for sessions
+        :return: False if any error has occurred, True otherwise
+        """
+        query = "INSERT OR REPLACE INTO segregation_state (id, collecting) VALUES (0, ?);"
+        return self.db.execute_many(query, [[int(collecting)]])
+
+    def store_many(self, sessions, to_process=None, validate=True):
+        """
+        Store many prepared sessions in the database, in a single transaction.
+        A session whose UUID is already stored is ignored.
+        :param sessions: list of prepared sessions
+        :param to_process: a boolean that indicates if the sessions are to process or not;
+                           if None it is decided when the sessions are stored,
+                           from the collection state of the system
+        :param validate: validate the sessions against the schema (False if they have already been validated)
+        :return: the number of sessions stored (the ones already stored are not counted),
+                 -1 if any error has occurred or no session is valid
+        """
+        # Validate the sessions (the validator is compiled only once)
+        if validate:
+            sessions = [session for session in sessions
+                        if validate_json_data_file(session, SCHEMA_PATH)]
+            if not sessions:
+                return -1
 
-        # Insert the dataframe in the database
-        return self.db.insert_dataframe(df, "prepared_sessions")
+        # Insert all the sessions with a single executemany; the collection state is read
+        # by the same statement, so it cannot change between reading it and storing the sessions
+        to_process_value = "COALESCE((SELECT collecting FROM segregation_state WHERE id = 0), 1)" \
+            if to_process is None else "?"
+        query = f"INSERT OR IGNORE INTO prepared_sessions ({', '.join(SESSION_FIELDS)}, to_process) " \
+                f"VALUES ({', '.join('?' * len(SESSION_FIELDS))}, {to_process_value})"
+        rows = [[session[field] for field in SESSION_FIELDS] + ([] if to_process is None else [to_process])
+                for session in sessions]
+        return self.db.execute_many_count(query, rows)
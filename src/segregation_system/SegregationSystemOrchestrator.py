@@ -17,11 +17,11 @@ from segregation_system.ClassBalancing import BalancingReport
 from segregation_system.InputCoverage import CheckInputCoverage, ViewInputCoverage
 from segregation_system.InputCoverage import CoverageReport
 from segregation_system.PreparedSession import PreparedSessionController
-from segregation_system.LearningSetsController import LearningSetsController
+from segregation_system.LearningSetsController import LearningSetsController, NPZ_FILE_PATH
 from segregation_system.CommunicationController import CommunicationController
 
 # Define the paths of the configuration file, the json files, the sets file,
-# the input file, the schema file and the URL of the development system
+# the schema file and the URL of the development system
 CONFIG_PATH = os.path.join(data_folder, 'segregation_system', 'config', 'segregation_config.json')
 JSON_BALANCING_PATH = os.path.join(
     data_folder, 'segregation_system', 'outcomes', 'balancing_outcome.json'
@@ -30,13 +30,16 @@ JSON_COVERAGE_PATH = os.path.join(
     data_folder, 'segregation_system', 'outcomes', 'coverage_outcome.json'
 )
 SET_PATH = os.path.join(data_folder, 'segregation_system', 'sets', 'all_sets.json')
-FILE_PATH = os.path.join(data_folder, 'segregation_system', 'input')
+# a prepared session, or an array of prepared sessions
 SCHEMA_PATH = os.path.join(
-    data_folder, 'segregation_system', 'schemas', 'prepared_session_schema.json'
+    data_folder, 'segregation_system', 'schemas', 'prepared_sessions_schema.json'
 )
 DATABASE_PATH = os.path.join(project_root, 'src', 'segregation_system', 'segregationDB.db')
 # put it in the config file
 URL = "http://192.168.97.2:5555/"
+# Seconds after which the session count is read from the database if the REST server has not
+# signalled: only for a server started by a previous run, which does not share the count and the event
+SESSIONS_WAIT_TIMEOUT = 10
 
 
 class SegregationSystemOrchestrator:
@@ -89,30 +92,60 @@ class SegregationSystemOrchestrator:
         # Initialize the server
         self.server = None
 
+        # Event set by the REST server process when the minimum number of sessions is stored
+        self.sessions_ready = multiprocessing.Event()
+
+        # Number of sessions to process, counted by the REST server process as it stores them;
+        # its lock also guards the collection state, so each session is counted only if
+        # it is stored as to process
+        self.sessions_to_process = multiprocessing.Value('q', 0)
+        self.collecting = multiprocessing.Value('b', 0, lock=False)
+
         # Initialize the timestamp variables
         self.timestamp_begin = None
         self.timestamp_end = None
 
-    def receive(self, received_json: dict):
+    def receive(self, received_json):
         """
         Method that receives the prepared sessions from the preparation system.
-        It waits for the file to appear in the data folder
-        and then stores the sessions in the database.
-        :return: file path of the received file
+        It runs in the REST server process and stores the sessions, already validated,
+        in the database with a single atomic insert; the sessions received while the system
+        is collecting are stored as to process, the others in the next collection.
+        The sessions to process are counted in shared memory: when the minimum number of
+        sessions is reached, it wakes up the orchestrator.
+        :param received_json: a prepared session, or a list of prepared sessions
         """
+        if isinstance(received_json, dict):
+            received_json = [received_json]
 
-        with open(os.path.join(FILE_PATH, "prepared_sessions.json"), 'w', encoding='UTF-8') as f:
-            json.dump(received_json, f, indent='\t')
-
-        if self.segregation_config["operation_mode"] == "wait_sessions":
-            to_process = 1
-        else:
-            to_process = 0
+        with self.sessions_to_process.get_lock():
+            stored = self.sessions.store_many(received_json, validate=False)
+            if stored > 0 and self.collecting.value:
+                self.sessions_to_process.value += stored
+            to_process = self.sessions_to_process.value
 
-        if self.sessions.store(os.path.join(FILE_PATH, "prepared_sessions.json"), to_process):
-            print("Sessions stored successfully")
-        else:
+        if stored < 0:
             print("ERROR> Error storing sessions")
+            return
+        print("Sessions stored successfully")
+        if to_process >= self.segregation_config["minimum_session_number"]:
+            self.sessions_ready.set()
+
+    def set_operation_mode(self, operation_mode):
+        """
+        Change the operation mode, and store whether the system is collecting sessions
+        (read by the REST server when it stores the received sessions).
+        When a collection starts, the sessions to process are counted once in the database;
+        the REST server then keeps the count up to date.
+        :param operation_mode: the new operation mode
+        """
+        self.segregation_config["operation_mode"] = operation_mode
+        collecting = operation_mode == "wait_sessions"
+        with self.sessions_to_process.get_lock():
+            self.sessions.set_collecting(collecting)
+            self.collecting.value = collecting
+            if collecting:
+                self.sessions_to_process.value = self.sessions.sessions_count()
 
     def run(self, service_flag):
         """
@@ -126,6 +159,16 @@ class SegregationSystemOrchestrator:
         if response:
             print("Server already running...")
         else:
+            # Delete the database (and its WAL files) before the REST server
+            # process can open a connection to it
+            self.db.drop_database()
+
+        # Create the tables of the prepared sessions and of the collection state
+        # in the database if they do not exist, before the REST server stores any session
+        self.sessions.create_tables()
+        self.set_operation_mode(self.segregation_config["operation_mode"])
+
+        if not response:
             # Start the REST server in a separate thread
             flask_thread = multiprocessing.Process(
                 target=self.communication_controller.start_server,
@@ -133,10 +176,8 @@ class SegregationSystemOrchestrator:
             )
             flask_thread.daemon = False
             flask_thread.start()
-
-            # Check if the database file exists and delete it
-            if os.path.exists(DATABASE_PATH):
-                os.remove(DATABASE_PATH)
+        # Only a REST server started by this process shares the session count and the event
+        own_server = not response
 
         # Initialize the class balancing check
         balancing_check = CheckClassBalancing()
@@ -144,46 +185,29 @@ class SegregationSystemOrchestrator:
         # Initialize the input coverage check
         coverage_check = CheckInputCoverage()
 
-        # Create the table of prepared sessions in the database if
-        # it does not exist
-        create_table_query = """
-                CREATE TABLE IF NOT EXISTS prepared_sessions (
-                    uuid TEXT PRIMARY KEY,
-                    label TEXT,
-                    mean_abs_diff_ts REAL,
-                    mean_abs_diff_am REAL,
-                    median_long REAL,
-                    median_lat REAL,
-                    median_targetIP TEXT,
-                    median_destIP TEXT,
-                    to_process BOOLEAN
-                );
-                """
-        self.db.create_table(create_table_query, [])
-
         # The system is in a loop until the learning sets are generated and sent
         # to the development system
         while True:
             # The system starts by waiting for the minimum number of sessions to be collected
             if self.segregation_config["operation_mode"] == "wait_sessions":
-                # Receive the prepared sessions file from the preparation system and
-                # store the sessions in the database
-                # while the FILE_PATH directory does not contain any files
-                if not os.listdir(FILE_PATH):
-                    continue
-
-                # Check if the minimum number of sessions has been collected
+                # The REST server stores the prepared sessions received from the preparation system
+                # in the database and counts them: while the minimum number of sessions has not been
+                # collected, the system waits (without using the CPU) for the REST server to signal.
+                # The event is cleared before reading the count, so a signal is never lost
                 to_collect = self.segregation_config["minimum_session_number"]
-                collected = self.sessions.sessions_count()
-
-                if collected < to_collect:
+                self.sessions_ready.clear()
+                if self.sessions_to_process.value < to_collect:
+                    if not self.sessions_ready.wait(SESSIONS_WAIT_TIMEOUT) and not own_server:
+                        # the REST server of a previous run does not share the count
+                        with self.sessions_to_process.get_lock():
+                            self.sessions_to_process.value = self.sessions.sessions_count()
                     continue
 
                 if service_flag:
                     self.timestamp_begin = time.time_ns()
 
                 # Go to the class balancing check
-                self.segregation_config["operation_mode"] = "check_balancing"
+                self.set_operation_mode("check_balancing")
 
             # The system checks the risk class balancing by generating a plot of the risk classes
             # and prompting the user to approve the balancing. If the balancing is approved, the
@@ -233,7 +257,7 @@ class SegregationSystemOrchestrator:
                             json.dump(data, json_file, indent=4)
 
                     # we change the operation mode to generate the outcome of the balancing
-                    self.segregation_config["operation_mode"] = "generate_balancing_outcome"
+                    self.set_operation_mode("generate_balancing_outcome")
                 else:
                     # if we are not in testing phase, the system is shut down and the data analyst
                     # needs to check the balancing before restarting the system
@@ -253,7 +277,7 @@ class SegregationSystemOrchestrator:
                 balancing_report = BalancingReport()
 
                 if balancing_report.approved:
-                    self.segregation_config["operation_mode"] = "check_coverage"
+                    self.set_operation_mode("check_coverage")
                 else:
                     # if we are in the testing phase, we send the timestamp to the client-side system
                     # to tell them that the system is shutting down, but for testing purposes
@@ -275,7 +299,7 @@ class SegregationSystemOrchestrator:
                         self.db.update(query, [])
 
                         # we change the operation mode to wait sessions
-                        self.segregation_config["operation_mode"] = "wait_sessions"
+                        self.set_operation_mode("wait_sessions")
                     else:
                         # if we are not in testing phase, the system is shut down and the data analyst
                         # needs to wait for more samples before restarting the system
@@ -329,7 +353,7 @@ class SegregationSystemOrchestrator:
                         json.dump(data, json_file, indent=4)
 
                     # we change the operation mode to generate the outcome of the coverage
-                    self.segregation_config["operation_mode"] = "generate_coverage_outcome"
+                    self.set_operation_mode("generate_coverage_outcome")
                 else:
                     # if we are not in testing phase, the system is shut down and the data analyst
                     # needs to check the coverage before restarting the system
@@ -350,7 +374,7 @@ class SegregationSystemOrchestrator:
                 coverage_report = CoverageReport()
 
                 if coverage_report.approved:
-                    self.segregation_config["operation_mode"] = "generate_sets"
+                    self.set_operation_mode("generate_sets")
                 else:
                     # if we are in the testing phase, we send the timestamp to the client-side system
                     # to tell them that the system is shutting down, but for testing purposes
@@ -376,7 +400,7 @@ class SegregationSystemOrchestrator:
                         self.db.update(query, [])
 
                         # we change the operation mode to wait sessions
-                        self.segregation_config["operation_mode"] = "wait_sessions"
+                        self.set_operation_mode("wait_sessions")
                     else:
                         # if we are not in testing phase, the system is shut down and the data analyst
                         # needs to wait for more samples before restarting the system
@@ -399,7 +423,19 @@ class SegregationSystemOrchestrator:
             if self.segregation_config["operation_mode"] == "generate_sets":
                 # Initialize the learning sets controller and generate the learning sets
                 learning_sets_controller = LearningSetsController()
-                learning_sets_controller.save_sets()
+                learning_sets = learning_sets_controller.generate_sets()
+
+                # Save the learning sets as NumPy arrays if enabled, otherwise (or if the
+                # features or the labels are not numerical) as JSON
+                saved_npz = False
+                if self.communication_controller.learning_sets_format == "npz":
+                    try:
+                        learning_sets_controller.save_sets_npz(learning_sets)
+                        saved_npz = True
+                    except ValueError as e:
+                        print("ERROR> Learning sets cannot be saved as NumPy arrays: ", e)
+                if not saved_npz:
+                    learning_sets_controller.save_sets(learning_sets)
 
                 # if we are in the testing phase, we send the timestamp to the client-side system
                 # to tell them that the system is shutting down because the learning sets have been
@@ -416,8 +452,13 @@ class SegregationSystemOrchestrator:
 
                     requests.post(URL, json=sending_data, timeout=20)
 
-                # Send the learning sets to the development system
-                self.communication_controller.send_learning_sets(SET_PATH)
+                # Send the learning sets to the development system; if it does not accept
+                # the NumPy arrays, they are sent as JSON
+                if not saved_npz or \
+                        not self.communication_controller.send_learning_sets_file(NPZ_FILE_PATH):
+                    if saved_npz:
+                        learning_sets_controller.save_sets(learning_sets)
+                    self.communication_controller.send_learning_sets(SET_PATH)
 
                 # Drop the rows of prepared sessions in the database that have been processed
                 query = """
@@ -434,7 +475,7 @@ class SegregationSystemOrchestrator:
 
                 # if we are in testing phase, we change the operation mode to wait sessions
                 if service_flag:
-                    self.segregation_config["operation_mode"] = "wait_sessions"
+                    self.set_operation_mode("wait_sessions")
                 else:
                     # if we are not in testing phase, the system is shut down and the data analyst
                     # needs to wait for more samples before restarting the system
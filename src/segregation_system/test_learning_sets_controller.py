@@ -0,0 +1,171 @@
+"""
+Unit tests for the saving of the learning sets.
+"""
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+import pandas as pd
+
+from segregation_system.LearningSetsController import LearningSetsController, LearningSet
+from segregation_system.CommunicationController import CommunicationController
+from development_system.learning_sets_loader import is_learning_sets_npz, load_learning_sets_npz, \
+    load_learning_sets_json, SET_NAMES
+
+NUM_SESSIONS = 11
+
+
+def learning_set():
+    """
+    Returns learning sets of NUM_SESSIONS sessions, with the columns read from the database.
+    """
+    sessions = np.arange(NUM_SESSIONS)
+    features = {
+        "uuid": np.array([f"uuid-{i}" for i in sessions], dtype=object),
+        "mean_abs_diff_ts": sessions * 0.1,
+        "mean_abs_diff_am": sessions / 3,
+        "median_long": 9.0 + sessions * 0.25,
+        "median_lat": 45.0 - sessions * 0.5,
+        "median_targetIP": sessions / 4294967295,
+        "median_destIP": np.full(NUM_SESSIONS, 0.5),
+    }
+    labels = np.array([int(i) % 3 for i in sessions], dtype=object)
+    return LearningSet(features, labels, np.array([3, 0, 7, 10, 5, 1]), np.array([8, 2]), np.array([4, 9, 6]))
+
+
+def old_save_sets(sets):
+    """
+    The learning sets as they were saved before the chunked saving: a DataFrame for each set,
+    converted to records without 'uuid' and 'label'.
+    """
+    data = pd.DataFrame(sets.features)
+    all_sets = {}
+    for set_name, indices in [("training_set", sets.training_set),
+                              ("validation_set", sets.validation_set),
+                              ("test_set", sets.test_set)]:
+        learning_set_df = data.iloc[indices].copy()
+        learning_set_df["label"] = pd.Series(sets.labels[indices].tolist(), index=learning_set_df.index)
+        all_sets[set_name] = {
+            "features": learning_set_df.drop(columns=["uuid", "label"], errors="ignore").to_dict(orient="records"),
+            "labels": learning_set_df["label"].to_list()
+        }
+    return all_sets
+
+
+class TestSaveSets(unittest.TestCase):
+    """
+    Unit tests for the JSON file of the learning sets.
+    """
+
+    def setUp(self):
+        """
+        Save the learning sets in a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, "all_sets.json")
+        patcher = patch("segregation_system.LearningSetsController.FILE_PATH", self.file_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.controller = LearningSetsController()
+
+    def test_same_as_old_output(self):
+        """
+        Test that the file written a chunk at a time has the same content as the old one,
+        whatever the size of the chunks.
+        """
+        sets = learning_set()
+        expected = json.loads(json.dumps(old_save_sets(sets)))
+
+        for chunk_size in (1, 2, 4, 10000):
+            with self.subTest(chunk_size=chunk_size), \
+                    patch("segregation_system.LearningSetsController.CHUNK_SIZE", chunk_size):
+                self.controller.save_sets(sets)
+                with open(self.file_path, "r", encoding="UTF-8") as file:
+                    self.assertEqual(json.load(file), expected)
+
+    def test_empty_set(self):
+        """
+        Test that an empty learning set is saved as empty lists.
+        """
+        sets = learning_set()
+        sets.validation_set = np.array([], dtype=int)
+
+        self.controller.save_sets(sets)
+
+        with open(self.file_path, "r", encoding="UTF-8") as file:
+            self.assertEqual(json.load(file)["validation_set"], {"features": [], "labels": []})
+
+
+class TestSaveSetsNpz(unittest.TestCase):
+    """
+    Unit tests for the learning sets sent as NumPy arrays, with JSON as fallback.
+    """
+
+    def setUp(self):
+        """
+        Save the learning sets in a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.file_path = os.path.join(self.tmp_dir.name, "all_sets.json")
+        self.npz_path = os.path.join(self.tmp_dir.name, "all_sets.npz")
+        patchers = [patch("segregation_system.LearningSetsController.FILE_PATH", self.file_path),
+                    patch("segregation_system.LearningSetsController.NPZ_FILE_PATH", self.npz_path)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.controller = LearningSetsController()
+
+    def test_round_trip(self):
+        """
+        Test that the development system loads from the .npz file the same learning sets as from JSON.
+        """
+        sets = learning_set()
+        self.controller.save_sets(sets)
+        self.controller.save_sets_npz(sets)
+
+        self.assertTrue(is_learning_sets_npz(self.npz_path))
+        from_npz = load_learning_sets_npz(self.npz_path)
+        from_json = load_learning_sets_json(self.file_path)
+        for set_name in SET_NAMES:
+            with self.subTest(set_name=set_name):
+                self.assertEqual(from_npz[set_name]["labels"].tolist(), from_json[set_name]["labels"])
+                # the features are sent as float32
+                pd.testing.assert_frame_equal(from_npz[set_name]["features"],
+                                              from_json[set_name]["features"].astype(np.float32))
+
+    def test_not_numerical(self):
+        """
+        Test that learning sets with a label which is not numerical cannot be saved as NumPy arrays,
+        but can still be saved as JSON.
+        """
+        sets = learning_set()
+        sets.labels[0] = "unknown"
+
+        with self.assertRaises(ValueError):
+            self.controller.save_sets_npz(sets)
+        self.controller.save_sets(sets)
+
+        self.assertEqual(load_learning_sets_json(self.file_path)["training_set"]["labels"][1], "unknown")
+
+    @patch("segregation_system.CommunicationController.requests.post")
+    def test_file_refused(self, mock_post):
+        """
+        Test that a learning sets file refused by the development system has to be sent as JSON.
+        """
+        self.controller.save_sets_npz(learning_set())
+        communication_controller = CommunicationController()
+
+        mock_post.return_value = MagicMock(ok=False, status_code=400)
+        self.assertFalse(communication_controller.send_learning_sets_file(self.npz_path))
+        mock_post.return_value = MagicMock(ok=True, status_code=200)
+        self.assertTrue(communication_controller.send_learning_sets_file(self.npz_path))
+        self.assertTrue(mock_post.call_args.args[0].endswith("/learning_sets"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Unit tests for the PreparedSessionController class.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from segregation_system.PreparedSession import PreparedSessionController, SESSION_FIELDS
+
+
+def prepared_session(uuid, label="normal"):
+    """
+    Returns a valid prepared session.
+    """
+    return {"UUID": uuid, "label": label, "mean_abs_diff_ts": 1.5, "mean_abs_diff_am": 2.5,
+            "median_long": 9.2, "median_lat": 45.5,
+            "median_targetIP": "10.0.0.1", "median_destIP": "10.0.0.2"}
+
+
+class TestPreparedSessionController(unittest.TestCase):
+    """
+    Unit tests for the storing of the prepared sessions.
+    """
+
+    def setUp(self):
+        """
+        Create the tables in a database file of a temporary directory.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        with patch("segregation_system.PreparedSession.DATABASE_PATH",
+                   os.path.join(self.tmp_dir.name, "segregationDB.db")):
+            self.sessions = PreparedSessionController()
+        self.addCleanup(self.sessions.db.close)
+        self.assertTrue(self.sessions.create_tables())
+
+    def stored(self):
+        """
+        Returns the stored sessions as {uuid: (label, to_process)}.
+        """
+        rows = self.sessions.db.fetch_rows("SELECT uuid, label, to_process FROM prepared_sessions")
+        return {uuid: (label, to_process) for uuid, label, to_process in rows}
+
+    def test_store_many(self):
+        """
+        Test that all the fields are stored and the sessions already stored are ignored and not counted.
+        """
+        self.assertEqual(self.sessions.store_many([prepared_session("1"), prepared_session("2")], True), 2)
+        self.assertEqual(self.sessions.store_many([prepared_session("2", "high"), prepared_session("3")],
+                                                  True), 1)
+
+        self.assertEqual(self.stored(), {"1": ("normal", 1), "2": ("normal", 1), "3": ("normal", 1)})
+        row = self.sessions.db.fetch_rows(f"SELECT {', '.join(SESSION_FIELDS)} FROM prepared_sessions "
+                                          "WHERE uuid = '1'")[0]
+        self.assertEqual(dict(zip(SESSION_FIELDS, row)), prepared_session("1"))
+
+    def test_store_many_validation(self):
+        """
+        Test that the invalid sessions are discarded, and -1 is returned if none is valid.
+        """
+        invalid = prepared_session("2")
+        del invalid["label"]
+
+        self.assertEqual(self.sessions.store_many([prepared_session("1"), invalid], True), 1)
+        self.assertEqual(self.sessions.store_many([invalid], True), -1)
+        self.assertEqual(list(self.stored()), ["1"])
+
+    def test_to_process_from_collection_state(self):
+        """
+        Test that, when not given, to_process is read from the collection state when storing.
+        """
+        self.sessions.store_many([prepared_session("1")])
+        self.sessions.set_collecting(False)
+        self.sessions.store_many([prepared_session("2")])
+        self.sessions.set_collecting(True)
+        self.sessions.store_many([prepared_session("3")])
+        self.sessions.store_many([prepared_session("4")], to_process=False)
+
+        self.assertEqual({uuid: to_process for uuid, (_, to_process) in self.stored().items()},
+                         {"1": 1, "2": 0, "3": 1, "4": 0})
+        self.assertEqual(self.sessions.sessions_count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
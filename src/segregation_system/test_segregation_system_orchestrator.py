@@ -0,0 +1,82 @@
+"""
+Unit tests for the session count shared by the REST server process and the orchestrator.
+"""
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from segregation_system.SegregationSystemOrchestrator import SegregationSystemOrchestrator
+from segregation_system.test_prepared_session import prepared_session
+
+
+class TestSessionsToProcess(unittest.TestCase):
+    """
+    Unit tests for the count of the sessions to process and the event waking up the orchestrator.
+    """
+
+    def setUp(self):
+        """
+        Create the orchestrator with the database in a temporary directory, collecting sessions.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        database_path = os.path.join(self.tmp_dir.name, "segregationDB.db")
+        with patch("segregation_system.PreparedSession.DATABASE_PATH", database_path), \
+                patch("segregation_system.SegregationSystemOrchestrator.DATABASE_PATH", database_path):
+            self.orchestrator = SegregationSystemOrchestrator()
+        self.addCleanup(self.orchestrator.sessions.db.close)
+        self.orchestrator.segregation_config["minimum_session_number"] = 3
+        self.orchestrator.sessions.create_tables()
+        self.orchestrator.set_operation_mode("wait_sessions")
+
+    def test_count_and_event(self):
+        """
+        Test that only new sessions are counted, and the event is set at the minimum number.
+        """
+        self.orchestrator.receive(prepared_session("1"))
+        self.orchestrator.receive([prepared_session("1"), prepared_session("2")])
+
+        self.assertEqual(self.orchestrator.sessions_to_process.value, 2)
+        self.assertFalse(self.orchestrator.sessions_ready.is_set())
+
+        self.orchestrator.receive([prepared_session("3")])
+
+        self.assertEqual(self.orchestrator.sessions_to_process.value, 3)
+        self.assertTrue(self.orchestrator.sessions_ready.is_set())
+
+    def test_not_collecting(self):
+        """
+        Test that the sessions received while not collecting are counted in the next collection.
+        """
+        self.orchestrator.set_operation_mode("check_balancing")
+        self.orchestrator.receive([prepared_session("1"), prepared_session("2")])
+        self.assertEqual(self.orchestrator.sessions_to_process.value, 0)
+        self.assertEqual(self.orchestrator.sessions.sessions_count(), 0)
+
+        # the processed sessions are deleted, the others are set as to process
+        self.orchestrator.sessions.db.update("UPDATE prepared_sessions SET to_process = 1", [])
+        self.orchestrator.set_operation_mode("wait_sessions")
+
+        self.assertEqual(self.orchestrator.sessions_to_process.value, 2)
+
+    def test_rest_server_process(self):
+        """
+        Test that the count and the event are shared with the REST server process.
+        """
+        # the REST server process opens its own connections
+        self.orchestrator.sessions.db.close()
+        sessions = [prepared_session(str(uuid)) for uuid in range(3)]
+        server = multiprocessing.Process(target=self.orchestrator.receive, args=(sessions,))
+        server.start()
+
+        self.assertTrue(self.orchestrator.sessions_ready.wait(10))
+        server.join(10)
+        self.assertEqual(server.exitcode, 0)
+        self.assertEqual(self.orchestrator.sessions_to_process.value, 3)
+        self.assertEqual(self.orchestrator.sessions.sessions_count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Module for fast conversion of IP addresses between dotted-quad strings, integers and normalized floats.
+Scalar conversions are cached, array conversions parse each distinct address only once.
+"""
+import ipaddress
+from functools import lru_cache
+import numpy as np
+
+IPV4_MAX = float(int(ipaddress.ip_address("255.255.255.255")))
+INVALID_IP = -1
+CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_ipv4(ip_string: str) -> int:
+    """
+    Parse a dotted-quad string with the same rules as ipaddress.IPv4Address
+    (four decimal octets in 0..255, no leading zeros).
+    :param ip_string: address to parse
+    :return: the address as integer, INVALID_IP if it is not a valid IPv4 address
+    """
+    octets = ip_string.split(".")
+    if len(octets) != 4:
+        return INVALID_IP
+    value = 0
+    for octet in octets:
+        if not octet.isascii() or not octet.isdigit() or len(octet) > 3 \
+                or (len(octet) > 1 and octet[0] == "0"):
+            return INVALID_IP
+        octet = int(octet)
+        if octet > 255:
+            return INVALID_IP
+        value = (value << 8) | octet
+    return value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_ip_to_float(ip_string: str) -> float:
+    value = _parse_ipv4(ip_string)
+    if value != INVALID_IP:
+        return float(value) / IPV4_MAX
+    try:
+        # not a dotted quad (e.g. IPv6): same result as the original ipaddress based conversion
+        return float(int(ipaddress.ip_address(ip_string))) / IPV4_MAX
+    except ValueError:
+        return 0.0
+
+
+def ip_to_int(ip_string) -> int:
+    """
+    Convert an IPv4 address string to its integer value.
+    :param ip_string: dotted-quad address
+    :return: the address as integer, INVALID_IP if the address is not a valid IPv4 address
+    """
+    if not isinstance(ip_string, str):
+        return INVALID_IP
+    return _parse_ipv4(ip_string)
+
+
+def int_to_ip(value: int) -> str:
+    """
+    Convert an integer to the dotted-quad IPv4 address string.
+    :param value: integer in 0..2**32-1
+    :return: the address as string
+    """
+    value = int(value)
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+def ip_to_float(ip_string) -> float:
+    """
+    Convert an IP address string to a normalized float.
+    :param ip_string: address to convert
+    :return: the address divided by 255.255.255.255, 0.0 if the IP is invalid
+    """
+    if isinstance(ip_string, str):
+        return _cached_ip_to_float(ip_string)
+    try:
+        return float(int(ipaddress.ip_address(ip_string))) / IPV4_MAX
+    except ValueError:
+        return 0.0
+
+
+def _unique(values):
+    """
+    Distinct values of an array of addresses and the indices to rebuild the array from them.
+    Values which are not strings (e.g. None, NaN or integers) are kept as they are, not converted to str,
+    so they get the same result as the scalar conversions.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind == "U":
+        uniques, inverse = np.unique(values, return_inverse=True)
+        return uniques, inverse.ravel()
+    index = {}
+    inverse = np.fromiter((index.setdefault(value, len(index)) for value in values.ravel()),
+                          dtype=np.intp, count=values.size)
+    return list(index), inverse
+
+
+def ips_to_int(values) -> np.ndarray:
+    """
+    Convert an array (or pandas column) of IPv4 address strings to integers,
+    with the same result as applying ip_to_int to each element.
+    :param values: array-like of dotted-quad addresses
+    :return: int64 array, INVALID_IP for the invalid addresses (and for the values which are not strings)
+    """
+    uniques, inverse = _unique(values)
+    converted = np.fromiter((ip_to_int(ip) for ip in uniques), dtype=np.int64, count=len(uniques))
+    return converted[inverse].reshape(np.shape(values))
+
+
+def ips_to_uint32(values) -> np.ndarray:
+    """
+    Convert an array of IPv4 address strings to uint32, raising ValueError if one of them is invalid.
+    :param values: array-like of dotted-quad addresses
+    :return: uint32 array
+    """
+    converted = ips_to_int(values)
+    if (converted == INVALID_IP).any():
+        raise ValueError("invalid IPv4 address")
+    return converted.astype(np.uint32)
+
+
+def ips_to_float(values) -> np.ndarray:
+    """
+    Convert an array (or pandas column) of IP address strings to normalized floats,
+    with the same result as applying ip_to_float to each element.
+    :param values: array-like of addresses
+    :return: float64 array, 0.0 for the invalid addresses
+    """
+    uniques, inverse = _unique(values)
+    converted = np.fromiter((ip_to_float(ip) for ip in uniques), dtype=np.float64, count=len(uniques))
+    return converted[inverse].reshape(np.shape(values))
+
+
+def ints_to_ip(values) -> np.ndarray:
+    """
+    Convert an array of integers to dotted-quad IPv4 address strings.
+    :param values: array-like of integers in 0..2**32-1
+    :return: object array of strings
+    """
+    values = np.asarray(values, dtype=np.int64)
+    octets = [(values >> shift & 255).astype(str) for shift in (24, 16, 8, 0)]
+    result = octets[0]
+    for octet in octets[1:]:
+        result = np.char.add(np.char.add(result, "."), octet)
+    return result.astype(object)
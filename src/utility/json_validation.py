@@ -1,12 +1,80 @@
 import json
 import logging
 import os
+import threading
 import utility
 import jsonschema
 
 
 # see : https://linkml.io/linkml/_modules/linkml/validator/plugins/jsonschema_validation_plugin.html
 
+# If True, every validation checks the modification time of the schema file and reloads it when changed.
+# Off by default: once loaded, validating a json does not touch the disk.
+CHECK_SCHEMA_MTIME = False
+
+# schema path -> (schema file mtime, compiled validator)
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def _load_validator(schema_path: str):
+    """
+    Load a json schema from file, check it and compile it into a validator of its draft
+    (Draft7Validator if the schema does not declare one).
+    :param schema_path: absolute path to the json schema file
+    :return: the validator
+    """
+    with open(schema_path, "r", encoding="UTF-8") as file:
+        json_schema = json.load(file)
+    validator_class = jsonschema.validators.validator_for(json_schema, default=jsonschema.Draft7Validator)
+    validator_class.check_schema(json_schema)
+    return validator_class(json_schema)
+
+
+def get_validator(schema_filename: str, check_mtime: bool = None):
+    """
+    Return the compiled validator of a json schema file, loading it only the first time.
+    :param schema_filename: path to the json schema file !!! <relative to the data folder>
+    :param check_mtime: reload the schema if the file has been modified since it was loaded
+                        (default CHECK_SCHEMA_MTIME)
+    :return: the validator
+    """
+    schema_path = os.path.join(utility.data_folder, schema_filename)
+    if check_mtime is None:
+        check_mtime = CHECK_SCHEMA_MTIME
+    cached = _validators.get(schema_path)
+    if cached is not None and not check_mtime:
+        return cached[1]
+
+    mtime = os.path.getmtime(schema_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _validators_lock:
+        cached = _validators.get(schema_path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, _load_validator(schema_path))
+            _validators[schema_path] = cached
+    return cached[1]
+
+
+def preload_schemas(*schema_filenames: str) -> None:
+    """
+    Load and compile the given json schemas, so that the first validation does not read them from disk.
+    :param schema_filenames: paths to the json schema files !!! <relative to the data folder>
+    """
+    for schema_filename in schema_filenames:
+        get_validator(schema_filename)
+
+
+def _validate_with(validator, json_data) -> bool:
+    """
+    Validate a json object with a compiled validator, logging the most relevant error as jsonschema.validate.
+    """
+    if validator.is_valid(json_data):
+        return True
+    logging.error(jsonschema.exceptions.best_match(validator.iter_errors(json_data)))
+    return False
+
 
 def validate_json(json_data: dict, schema: dict) -> bool:
     """
@@ -31,10 +99,7 @@ def validate_json_data_file(json_data: dict, schema_filename: str) -> bool:
     :param schema_filename: path to the json schema file !!! <relative to the data folder>
     :return: False if any error occurs, otherwise True
     """
-    schema_path = os.path.join(utility.data_folder, schema_filename)
-    with open(schema_path, "r", encoding="UTF-8") as file:
-        json_schema = json.load(file)
-    return validate_json(json_data, json_schema)
+    return _validate_with(get_validator(schema_filename), json_data)
 
 
 def validate_json_file_file(json_filename: str, schema_filename: str) -> bool:
@@ -47,6 +112,4 @@ def validate_json_file_file(json_filename: str, schema_filename: str) -> bool:
     json_path = os.path.join(utility.data_folder, json_filename)
     with open(json_path, "r", encoding="UTF-8") as jFile:
         json_data = json.load(jFile)
-    with open(json_path, "r", encoding="UTF-8") as jSchema:
-        json_schema = json.load(jSchema)
-    return validate_json(json_data, json_schema)
+    return validate_json_data_file(json_data, schema_filename)
@@ -0,0 +1,66 @@
+"""
+Unit tests for the ip_codec module.
+"""
+# pylint: disable=E0401
+
+import unittest
+import numpy as np
+from utility.ip_codec import ip_to_int, int_to_ip, ip_to_float, ips_to_int, ints_to_ip, \
+    ips_to_float, ips_to_uint32, INVALID_IP, IPV4_MAX
+
+INVALID = ["", "1.2.3", "1.2.3.4.5", "256.0.0.1", "01.2.3.4", "1.2.3.-4", "a.b.c.d", "1.2.3.４"]
+
+
+class TestIpCodec(unittest.TestCase):
+    """
+    Unit tests for the scalar and the array conversions of the IP addresses.
+    """
+
+    def test_round_trip(self):
+        """
+        Test that valid addresses are converted to integers and back.
+        """
+        ips = ["0.0.0.0", "10.0.0.1", "192.168.1.254", "255.255.255.255"]
+        ints = ips_to_int(ips)
+
+        self.assertEqual(ints.tolist(), [0, 167772161, 3232236030, 4294967295])
+        self.assertEqual(ints_to_ip(ints).tolist(), ips)
+        self.assertEqual([ip_to_int(ip) for ip in ips], ints.tolist())
+        self.assertEqual([int_to_ip(value) for value in ints], ips)
+        self.assertEqual(ips_to_uint32(ips).dtype, np.uint32)
+
+    def test_invalid_strings(self):
+        """
+        Test that invalid addresses are converted to INVALID_IP, and to 0.0 as floats.
+        """
+        self.assertEqual(ips_to_int(INVALID).tolist(), [INVALID_IP] * len(INVALID))
+        self.assertEqual([ip_to_int(ip) for ip in INVALID], [INVALID_IP] * len(INVALID))
+        self.assertEqual(ips_to_float(INVALID).tolist(), [0.0] * len(INVALID))
+        with self.assertRaises(ValueError):
+            ips_to_uint32(["1.2.3.4", "1.2.3"])
+
+    def test_none_and_non_strings(self):
+        """
+        Test that None, NaN and integers get the same result from the array and the scalar conversions.
+        """
+        values = np.array(["10.0.0.1", None, np.nan, 167772161, "10.0.0.1"], dtype=object)
+
+        self.assertEqual(ips_to_int(values).tolist(),
+                         [167772161, INVALID_IP, INVALID_IP, INVALID_IP, 167772161])
+        self.assertEqual(ips_to_float(values).tolist(), [ip_to_float(value) for value in values])
+        self.assertEqual(ips_to_float(values)[3], 167772161 / IPV4_MAX)
+        self.assertEqual(ips_to_float([None]).tolist(), [0.0])
+
+    def test_shape(self):
+        """
+        Test that the array conversions keep the shape of their input.
+        """
+        ips = np.array([["1.2.3.4", "5.6.7.8"], ["1.2.3.4", "bad"]])
+
+        self.assertEqual(ips_to_int(ips).shape, (2, 2))
+        self.assertEqual(ips_to_int(ips)[1].tolist(), [16909060, INVALID_IP])
+        self.assertEqual(ips_to_float(ips.astype(object)).shape, (2, 2))
+        self.assertEqual(ips_to_int([]).tolist(), [])
+
+if __name__ == '__main__':
+    unittest.main()
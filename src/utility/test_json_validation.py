@@ -0,0 +1,114 @@
+"""
+Unit tests for the json_validation module.
+"""
+# pylint: disable=E0401
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from utility import json_validation
+from utility.json_validation import validate_json_file_file, validate_json_data_file, preload_schemas
+
+FLAGS_PATH = "evaluation_system/configs/eval_ambient_flags.json"
+FLAGS_SCHEMA_PATH = "evaluation_system/schemas/eval_ambient_flags_schema.json"
+
+
+class TestValidateJsonFileFile(unittest.TestCase):
+    """
+    Unit tests for the validate_json_file_file function.
+    """
+
+    def setUp(self):
+        """
+        Use a temporary directory for the json files written by the tests.
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write_json(self, json_data):
+        """
+        Writes json_data to a temporary file and returns its (absolute) path.
+        """
+        path = os.path.join(self.tmp_dir.name, 'data.json')
+        with open(path, 'w', encoding='UTF-8') as file:
+            json.dump(json_data, file)
+        return path
+
+    def test_valid_file(self):
+        """
+        Test that a json file matching the schema is valid.
+        """
+        self.assertTrue(validate_json_file_file(FLAGS_PATH, FLAGS_SCHEMA_PATH))
+
+    def test_invalid_file(self):
+        """
+        Test that the json file is validated against the schema file, not against itself.
+        """
+        path = self.write_json({"db_name": "evaluationDB.db", "testing": False})
+        with self.assertLogs(level='ERROR'):
+            self.assertFalse(validate_json_file_file(path, FLAGS_SCHEMA_PATH))
+
+
+class TestValidatorCache(unittest.TestCase):
+    """
+    Unit tests for the cache of the compiled validators.
+    """
+
+    def setUp(self):
+        """
+        Start every test with an empty cache, counting the schema compilations and the disk accesses.
+        """
+        # pylint: disable=W0212
+        patcher = patch.dict(json_validation._validators, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('utility.json_validation._load_validator', wraps=json_validation._load_validator)
+        self.load_validator = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('utility.json_validation.os.path.getmtime', wraps=os.path.getmtime)
+        self.getmtime = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_validator_reused(self):
+        """
+        Test that each schema is compiled once, and the following validations do not touch the disk.
+        """
+        flags = {"db_name": "evaluationDB.db", "testing": "False", "timing": "True",
+                 "delete_db_on_load": "True", "print_labels": "True"}
+        preload_schemas(FLAGS_SCHEMA_PATH)
+        self.assertEqual(self.load_validator.call_count, 1)
+
+        with patch('builtins.open', side_effect=AssertionError("schema read from disk")):
+            for _ in range(3):
+                self.assertTrue(validate_json_data_file(flags, FLAGS_SCHEMA_PATH))
+            with self.assertLogs(level='ERROR'):
+                self.assertFalse(validate_json_data_file({"db_name": 1}, FLAGS_SCHEMA_PATH))
+
+        self.assertEqual(self.load_validator.call_count, 1)
+        self.assertEqual(self.getmtime.call_count, 1)
+
+    def test_check_mtime(self):
+        """
+        Test that, with check_mtime, a schema is reloaded only when its file has been modified.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'schema.json')
+            with open(path, 'w', encoding='UTF-8') as file:
+                json.dump({"type": "string"}, file)
+
+            validator = json_validation.get_validator(path, check_mtime=True)
+            self.assertIs(json_validation.get_validator(path, check_mtime=True), validator)
+            self.assertEqual(self.load_validator.call_count, 1)
+
+            with open(path, 'w', encoding='UTF-8') as file:
+                json.dump({"type": "integer"}, file)
+            os.utime(path, (0, os.path.getmtime(path) + 1))
+
+            self.assertTrue(json_validation.get_validator(path, check_mtime=True).is_valid(1))
+            self.assertEqual(self.load_validator.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()